@@ -0,0 +1,230 @@
+import gzip
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional, Tuple
+
+try:  # brotli is optional; gzip is always available.
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript")
+
+
+@dataclass(frozen=True)
+class CompressionPolicy:
+    minimum_size: int = 1024
+    gzip_level: int = 6
+    brotli_quality: int = 4
+
+
+def available_encodings() -> Tuple[str, ...]:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick the best supported coding from an Accept-Encoding header, or None."""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name] = weight
+
+    best: Optional[str] = None
+    best_weight = 0.0
+    # Ties go to the first entry, so brotli wins over gzip when both are accepted.
+    for encoding in available_encodings():
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def etag_for_encoding(etag: bytes, encoding: str) -> bytes:
+    """Tag a strong ETag with the coding, since the encoded bytes differ."""
+    if etag.startswith(b"W/") or not etag.endswith(b'"'):
+        return etag
+    return etag[:-1] + b"-" + encoding.encode() + b'"'
+
+
+def strip_etag_encoding(etag: str) -> str:
+    """Undo ``etag_for_encoding`` so conditional requests match either form."""
+    for encoding in ("br", "gzip"):
+        suffix = f'-{encoding}"'
+        if etag.endswith(suffix):
+            return etag[: -len(suffix)] + '"'
+    return etag
+
+
+def compress(body: bytes, encoding: str, policy: CompressionPolicy) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=policy.brotli_quality)
+    return gzip.compress(body, compresslevel=policy.gzip_level, mtime=0)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing buffered responses the client can decode.
+
+    ``routes`` maps path prefixes to a ``CompressionPolicy``, or to None to
+    turn compression off; the longest matching prefix wins. Bodies below
+    the policy's ``minimum_size`` and streamed responses are sent unchanged.
+    Bodies of at least ``offload_threshold`` bytes are compressed through
+    ``offload`` (a thread-pool runner); if that fails, they go out
+    uncompressed rather than blocking the event loop.
+    """
+
+    def __init__(
+        self,
+        app: Any,
+        *,
+        default_policy: CompressionPolicy = CompressionPolicy(),
+        routes: Optional[Mapping[str, Optional[CompressionPolicy]]] = None,
+        offload_threshold: int = 64 * 1024,
+        offload: Optional[Callable[..., Awaitable[bytes]]] = None,
+    ) -> None:
+        self.app = app
+        self.default_policy = default_policy
+        self.routes = sorted((routes or {}).items(), key=lambda item: len(item[0]), reverse=True)
+        self.offload_threshold = offload_threshold
+        self.offload = offload
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        policy = self._policy_for(scope["path"])
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_vary(message: Dict[str, Any]) -> None:
+            # Every response on a compressible route varies by coding, including
+            # identity ones, or a shared cache could hand them to gzip clients.
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": _with_vary(message.get("headers", []))}
+            await send(message)
+
+        accept = dict(scope.get("headers") or []).get(b"accept-encoding", b"")
+        encoding = negotiate_encoding(accept.decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send_with_vary)
+            return
+
+        responder = _CompressingResponder(send_with_vary, encoding, policy, self)
+        await self.app(scope, receive, responder)
+
+    def _policy_for(self, path: str) -> Optional[CompressionPolicy]:
+        for prefix, policy in self.routes:
+            if path.startswith(prefix):
+                return policy
+        return self.default_policy
+
+
+class _CompressingResponder:
+    def __init__(
+        self,
+        send: Any,
+        encoding: str,
+        policy: CompressionPolicy,
+        middleware: CompressionMiddleware,
+    ) -> None:
+        self._send = send
+        self._encoding = encoding
+        self._policy = policy
+        self._middleware = middleware
+        self._start: Optional[Dict[str, Any]] = None
+        self._passthrough = False
+
+    async def __call__(self, message: Dict[str, Any]) -> None:
+        if self._passthrough:
+            await self._send(message)
+            return
+
+        if message["type"] == "http.response.start":
+            headers = {key.lower(): value for key, value in message.get("headers", [])}
+            content_type = headers.get(b"content-type", b"").decode("latin-1")
+            if b"content-encoding" in headers or not content_type.startswith(
+                COMPRESSIBLE_TYPES
+            ):
+                self._passthrough = True
+                await self._send(message)
+                return
+            self._start = message
+            return
+
+        if message["type"] != "http.response.body" or self._start is None:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        if message.get("more_body", False) or len(body) < self._policy.minimum_size:
+            # Streaming bodies and small payloads are not worth buffering or compressing.
+            self._passthrough = True
+            await self._send(self._start)
+            await self._send(message)
+            return
+
+        compressed = await self._compress(body)
+        if compressed is None or len(compressed) >= len(body):
+            await self._send(self._start)
+            await self._send(message)
+            return
+
+        await self._send(self._with_encoding_headers(len(compressed)))
+        await self._send({"type": "http.response.body", "body": compressed})
+
+    async def _compress(self, body: bytes) -> Optional[bytes]:
+        middleware = self._middleware
+        if len(body) < middleware.offload_threshold or middleware.offload is None:
+            return compress(body, self._encoding, self._policy)
+        try:
+            return await middleware.offload(compress, body, self._encoding, self._policy)
+        except Exception as exc:
+            logger.warning("Sending %s-byte response uncompressed: %s", len(body), exc)
+            return None
+
+    def _with_encoding_headers(self, length: int) -> Dict[str, Any]:
+        assert self._start is not None
+        headers: List[Tuple[bytes, bytes]] = []
+        for key, value in self._start.get("headers", []):
+            lowered = key.lower()
+            if lowered == b"content-length":
+                continue
+            if lowered == b"etag":
+                value = etag_for_encoding(value, self._encoding)
+            headers.append((key, value))
+        headers.extend(
+            [
+                (b"content-encoding", self._encoding.encode()),
+                (b"content-length", str(length).encode()),
+            ]
+        )
+        return {**self._start, "headers": headers}
+
+
+def _with_vary(headers: Any) -> List[Tuple[bytes, bytes]]:
+    """Merge ``Accept-Encoding`` into the response's Vary header."""
+    merged: List[Tuple[bytes, bytes]] = []
+    vary: List[bytes] = []
+    for key, value in headers:
+        if key.lower() == b"vary":
+            vary.append(value)
+        else:
+            merged.append((key, value))
+    fields = {field.strip().lower() for value in vary for field in value.split(b",")}
+    if b"accept-encoding" not in fields and b"*" not in fields:
+        vary.append(b"Accept-Encoding")
+    merged.append((b"vary", b", ".join(vary)))
+    return merged
@@ -24,6 +24,12 @@ def _to_int(value: str | None, default: int) -> int:
         return default
 
 
+def _to_bool(value: str | None, default: bool) -> bool:
+    if value is None or value.strip() == "":
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
 _load_backend_env()
 
 
@@ -34,6 +40,10 @@ class Settings:
 
     api_host: str = os.getenv("API_HOST", "0.0.0.0")
     api_port: int = _to_int(os.getenv("PORT") or os.getenv("API_PORT"), 10000)
+    web_concurrency: int = _to_int(os.getenv("WEB_CONCURRENCY"), 0)
+    worker_graceful_timeout_seconds: int = _to_int(
+        os.getenv("WORKER_GRACEFUL_TIMEOUT_SECONDS"), 30
+    )
 
     cors_allow_origins_raw: str = os.getenv(
         "CORS_ALLOW_ORIGINS",
@@ -43,17 +53,129 @@ class Settings:
     mongo_url: str = os.getenv("MONGO_URL", "")
     mongo_database: str = "smart_health_advisor_ai"
     mongo_server_selection_timeout_ms: int = 5000
+    mongo_reconnect_initial_delay_ms: int = _to_int(
+        os.getenv("MONGO_RECONNECT_INITIAL_DELAY_MS"), 500
+    )
+    mongo_reconnect_max_delay_seconds: int = _to_int(
+        os.getenv("MONGO_RECONNECT_MAX_DELAY_SECONDS"), 30
+    )
+    mongo_transactions_enabled: bool = _to_bool(
+        os.getenv("MONGO_TRANSACTIONS_ENABLED"), True
+    )
+    mongo_command_monitoring: bool = _to_bool(
+        os.getenv("MONGO_COMMAND_MONITORING"), True
+    )
+    mongo_slow_operation_ms: int = _to_int(os.getenv("MONGO_SLOW_OPERATION_MS"), 100)
+    mongo_explain_sampling: bool = _to_bool(os.getenv("MONGO_EXPLAIN_SAMPLING"), False)
 
     google_client_id: str = os.getenv("GOOGLE_CLIENT_ID", "")
+    google_jwks_url: str = os.getenv(
+        "GOOGLE_JWKS_URL", "https://www.googleapis.com/oauth2/v3/certs"
+    )
+    google_jwks_enabled: bool = _to_bool(os.getenv("GOOGLE_JWKS_ENABLED"), True)
+    google_jwks_default_ttl_seconds: int = _to_int(
+        os.getenv("GOOGLE_JWKS_DEFAULT_TTL_SECONDS"), 3600
+    )
+    google_tokeninfo_fallback: bool = _to_bool(
+        os.getenv("GOOGLE_TOKENINFO_FALLBACK"), True
+    )
 
     jwt_secret_key: str = os.getenv(
         "JWT_SECRET_KEY", "change-me-in-production"
     )
     jwt_algorithm: str = "HS256"
     jwt_expiration_minutes: int = 10080
+    access_token_cache_ttl_seconds: int = _to_int(
+        os.getenv("ACCESS_TOKEN_CACHE_TTL_SECONDS"), 300
+    )
+    access_token_cache_max_entries: int = _to_int(
+        os.getenv("ACCESS_TOKEN_CACHE_MAX_ENTRIES"), 10000
+    )
 
     initial_credits: int = 5
+    credit_lease_ttl_seconds: int = _to_int(os.getenv("CREDIT_LEASE_TTL_SECONDS"), 120)
+    user_cache_ttl_seconds: int = _to_int(os.getenv("USER_CACHE_TTL_SECONDS"), 30)
+    user_cache_max_entries: int = _to_int(os.getenv("USER_CACHE_MAX_ENTRIES"), 10000)
+    analysis_view_cache_ttl_seconds: int = _to_int(
+        os.getenv("ANALYSIS_VIEW_CACHE_TTL_SECONDS"), 60
+    )
+    analysis_view_cache_max_entries: int = _to_int(
+        os.getenv("ANALYSIS_VIEW_CACHE_MAX_ENTRIES"), 5000
+    )
     max_analysis_history: int = 50
+    history_max_page_size: int = _to_int(os.getenv("HISTORY_MAX_PAGE_SIZE"), 200)
+
+    analysis_write_behind_enabled: bool = _to_bool(
+        os.getenv("ANALYSIS_WRITE_BEHIND_ENABLED"), False
+    )
+    write_behind_max_queue_size: int = _to_int(
+        os.getenv("WRITE_BEHIND_MAX_QUEUE_SIZE"), 1000
+    )
+    write_behind_batch_size: int = _to_int(os.getenv("WRITE_BEHIND_BATCH_SIZE"), 100)
+    write_behind_flush_interval_ms: int = _to_int(
+        os.getenv("WRITE_BEHIND_FLUSH_INTERVAL_MS"), 50
+    )
+    write_behind_enqueue_timeout_ms: int = 500
+    write_behind_drain_timeout_seconds: int = 30
+    analysis_stats_enabled: bool = _to_bool(
+        os.getenv("ANALYSIS_STATS_ENABLED"), True
+    )
+
+    blocking_pool_size: int = _to_int(os.getenv("BLOCKING_POOL_SIZE"), 16)
+    blocking_queue_limit: int = _to_int(os.getenv("BLOCKING_QUEUE_LIMIT"), 64)
+
+    compression_enabled: bool = _to_bool(os.getenv("COMPRESSION_ENABLED"), True)
+    compression_minimum_size: int = _to_int(os.getenv("COMPRESSION_MINIMUM_SIZE"), 1024)
+    compression_gzip_level: int = _to_int(os.getenv("COMPRESSION_GZIP_LEVEL"), 6)
+    compression_brotli_quality: int = _to_int(os.getenv("COMPRESSION_BROTLI_QUALITY"), 4)
+    compression_offload_threshold_bytes: int = _to_int(
+        os.getenv("COMPRESSION_OFFLOAD_THRESHOLD_BYTES"), 65536
+    )
+
+    rate_limit_enabled: bool = _to_bool(os.getenv("RATE_LIMIT_ENABLED"), True)
+    rate_limit_storage: str = os.getenv("RATE_LIMIT_STORAGE", "memory")
+    rate_limit_trust_forwarded_for: bool = _to_bool(
+        os.getenv("RATE_LIMIT_TRUST_FORWARDED_FOR"), False
+    )
+    rate_limit_default_per_minute: int = _to_int(
+        os.getenv("RATE_LIMIT_DEFAULT_PER_MINUTE"), 120
+    )
+    rate_limit_search_per_minute: int = _to_int(
+        os.getenv("RATE_LIMIT_SEARCH_PER_MINUTE"), 10
+    )
+    rate_limit_analyze_per_minute: int = _to_int(
+        os.getenv("RATE_LIMIT_ANALYZE_PER_MINUTE"), 10
+    )
+    rate_limit_login_per_minute: int = _to_int(
+        os.getenv("RATE_LIMIT_LOGIN_PER_MINUTE"), 20
+    )
+
+    metrics_enabled: bool = _to_bool(os.getenv("METRICS_ENABLED"), True)
+    metrics_loop_lag_interval_ms: int = _to_int(
+        os.getenv("METRICS_LOOP_LAG_INTERVAL_MS"), 500
+    )
+    # Empty keeps /metrics disabled: scrapes must send it as a bearer token.
+    metrics_token: str = os.getenv("METRICS_TOKEN", "")
+    # 0 serves metrics only on the API port; otherwise worker N also listens
+    # on METRICS_PORT + N.
+    metrics_port: int = _to_int(os.getenv("METRICS_PORT"), 0)
+
+    # 0 leaves the event-loop stall watchdog off.
+    loop_stall_threshold_ms: int = _to_int(os.getenv("LOOP_STALL_THRESHOLD_MS"), 0)
+
+    tracing_enabled: bool = _to_bool(os.getenv("TRACING_ENABLED"), True)
+    tracing_exporter: str = os.getenv("TRACING_EXPORTER", "none")
+    tracing_collector_url: str = os.getenv("TRACING_COLLECTOR_URL", "")
+    tracing_server_timing: bool = _to_bool(os.getenv("TRACING_SERVER_TIMING"), True)
+
+    # Empty disables the profiling endpoints and the X-Profile header.
+    profiling_admin_token: str = os.getenv("PROFILING_ADMIN_TOKEN", "")
+    profiling_sampler_interval_ms: int = _to_int(
+        os.getenv("PROFILING_SAMPLER_INTERVAL_MS"), 0
+    )
+    profiling_max_capture_seconds: int = _to_int(
+        os.getenv("PROFILING_MAX_CAPTURE_SECONDS"), 60
+    )
 
     pubmed_base_url: str = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
     pubmed_tool_name: str = "smart-health-advisor-ai"
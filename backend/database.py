@@ -1,9 +1,14 @@
+import asyncio
 import logging
+import os
+import random
+from datetime import datetime, timedelta, timezone
 from typing import Any, Optional
 
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 
 from backend.config import settings
+from backend.mongo_monitoring import command_monitor
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +22,20 @@ class DatabaseManager:
         self._client: Optional[AsyncIOMotorClient] = None
         self._database: Optional[AsyncIOMotorDatabase] = None
         self._last_error: str = ""
+        self._supports_transactions: bool = False
+        self._indexes_ensured: bool = False
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._reconnect_attempts: int = 0
+        self._next_attempt_at: Optional[datetime] = None
+
+    @property
+    def reconnecting(self) -> bool:
+        return self._reconnect_task is not None and not self._reconnect_task.done()
+
+    @property
+    def supports_transactions(self) -> bool:
+        """True when connected to a replica set member or mongos."""
+        return self._database is not None and self._supports_transactions
 
     @property
     def client(self) -> AsyncIOMotorClient:
@@ -54,14 +73,26 @@ class DatabaseManager:
                 settings.mongo_server_selection_timeout_ms
             ),
             uuidRepresentation="standard",
+            tz_aware=True,
+            event_listeners=(
+                [command_monitor] if settings.mongo_command_monitoring else []
+            ),
         )
 
         try:
             await candidate_client.admin.command("ping")
+            hello = await candidate_client.admin.command("hello")
+            self._supports_transactions = bool(
+                hello.get("setName") or hello.get("msg") == "isdbgrid"
+            )
             self._client = candidate_client
             self._database = candidate_client[settings.mongo_database]
+            if settings.mongo_command_monitoring:
+                command_monitor.attach(candidate_client.delegate)
 
-            await self._ensure_indexes()
+            if not self._indexes_ensured:
+                await self._ensure_indexes()
+                self._indexes_ensured = True
         except Exception as exc:
             candidate_client.close()
             self._client = None
@@ -75,20 +106,106 @@ class DatabaseManager:
         logger.info("MongoDB connection established successfully")
         return self._database
 
+    def start_reconnect(self) -> None:
+        """Start the background reconnect supervisor if it is not already running.
+
+        Only one task ever tries to reach MongoDB; callers fail fast meanwhile.
+        """
+        if self._database is not None or self.reconnecting:
+            return
+        if not settings.mongo_url.strip():
+            return
+        self._reconnect_attempts = 0
+        self._schedule_next_attempt()
+        self._reconnect_task = asyncio.create_task(
+            self._reconnect_loop(), name="mongo-reconnect"
+        )
+
+    async def stop_reconnect(self) -> None:
+        task = self._reconnect_task
+        self._reconnect_task = None
+        self._next_attempt_at = None
+        if task is None or task.done():
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    def _schedule_next_attempt(self) -> None:
+        delay = self._reconnect_delay()
+        self._next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+
+    def _reconnect_delay(self) -> float:
+        """Exponential backoff with full jitter."""
+        ceiling = min(
+            settings.mongo_reconnect_max_delay_seconds,
+            settings.mongo_reconnect_initial_delay_ms
+            / 1000
+            # Cap the exponent: a long outage would otherwise overflow the float.
+            * (2 ** min(self._reconnect_attempts, 30)),
+        )
+        return random.uniform(0, ceiling)
+
+    async def _reconnect_loop(self) -> None:
+        while self._database is None:
+            if self._next_attempt_at is not None:
+                remaining = self._next_attempt_at - datetime.now(timezone.utc)
+                await asyncio.sleep(max(0.0, remaining.total_seconds()))
+            self._reconnect_attempts += 1
+            try:
+                await self.connect()
+            except DatabaseUnavailableError:
+                logger.info(
+                    "MongoDB reconnect attempt %s failed", self._reconnect_attempts
+                )
+                self._schedule_next_attempt()
+        self._next_attempt_at = None
+        logger.info(
+            "MongoDB reconnected after %s attempt(s)", self._reconnect_attempts
+        )
+
     async def disconnect(self) -> None:
+        await self.stop_reconnect()
         if self._client is not None:
             logger.info("Closing MongoDB connection")
+            command_monitor.detach()
             self._client.close()
 
         self._client = None
         self._database = None
         self._last_error = ""
+        self._supports_transactions = False
+
+    def reset_after_fork(self) -> None:
+        """Forget the parent's client; MongoClient must not be shared across fork()."""
+        self._client = None
+        self._database = None
+        self._supports_transactions = False
+        self._reconnect_task = None
+        self._reconnect_attempts = 0
+        self._next_attempt_at = None
 
     def health_snapshot(self) -> dict[str, Any]:
         return {
             "available": self._database is not None,
             "database": settings.mongo_database,
             "error": self._last_error or None,
+            "transactions": self.supports_transactions,
+            "reconnect": {
+                "state": (
+                    "connected"
+                    if self._database is not None
+                    else "reconnecting" if self.reconnecting else "idle"
+                ),
+                "attempts": self._reconnect_attempts,
+                "next_attempt_at": (
+                    self._next_attempt_at.isoformat()
+                    if self._next_attempt_at is not None and self.reconnecting
+                    else None
+                ),
+            },
         }
 
     async def _ensure_indexes(self) -> None:
@@ -105,13 +222,23 @@ class DatabaseManager:
             [("user_id", 1), ("created_at", -1)],
             name="idx_user_created_at",
         )
+        # Covers the keyset-paginated history sort, including the _id tiebreak.
+        await db.symptom_analyses.create_index(
+            [("user_id", 1), ("created_at", -1), ("_id", -1)],
+            name="idx_user_created_id",
+        )
         await db.symptom_analyses.create_index(
             [("symptom", 1), ("created_at", -1)],
             name="idx_symptom_created_at",
         )
 
+        await db.rate_limits.create_index(
+            "expires_at", expireAfterSeconds=0, name="ttl_rate_limit_expires_at"
+        )
+
 
 database_manager = DatabaseManager()
+os.register_at_fork(after_in_child=database_manager.reset_after_fork)
 
 
 async def connect_to_mongo() -> AsyncIOMotorDatabase:
@@ -122,9 +249,17 @@ async def close_mongo_connection() -> None:
     await database_manager.disconnect()
 
 
+def start_background_reconnect() -> None:
+    database_manager.start_reconnect()
+
+
 def get_database() -> AsyncIOMotorDatabase:
     return database_manager.database
 
 
 def get_database_health() -> dict[str, Any]:
     return database_manager.health_snapshot()
+
+
+def transactions_supported() -> bool:
+    return database_manager.supports_transactions
@@ -0,0 +1,162 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from backend.config import settings
+from backend.profiling import profiled
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """Raised when the blocking-call queue is full and the call was not started."""
+
+
+class BlockingExecutor:
+    """Bounded thread pool for synchronous calls made from async handlers.
+
+    At most ``max_workers`` calls run at once and at most ``max_queue_size``
+    wait for a thread; further calls are rejected with
+    ``ExecutorSaturatedError`` instead of piling up behind slow integrations.
+    Calls run in a copy of the caller's context, so context variables set by
+    the request are visible inside the thread.
+    """
+
+    def __init__(self, max_workers: int, max_queue_size: int) -> None:
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+        self._active = 0
+        self._queued = 0
+        self._peak_queued = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._wait_total_ms = 0.0
+        self._wait_max_ms = 0.0
+        self._run_total_ms = 0.0
+        self._run_max_ms = 0.0
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        with self._lock:
+            if self._queued >= self.max_queue_size and self._active >= self.max_workers:
+                self._rejected += 1
+                raise ExecutorSaturatedError(
+                    f"Blocking executor saturated ({self._active} running, "
+                    f"{self._queued} queued)."
+                )
+            self._queued += 1
+            self._peak_queued = max(self._peak_queued, self._queued)
+            self._submitted += 1
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="blocking"
+                )
+            pool = self._pool
+
+        # Joins the caller's request profile when one is being taken.
+        call = profiled(functools.partial(func, *args, **kwargs))
+        context = contextvars.copy_context()
+        submitted_at = time.perf_counter()
+        future = pool.submit(self._instrumented, context, call, submitted_at)
+        future.add_done_callback(self._release_if_cancelled)
+        return await asyncio.wrap_future(future)
+
+    def _release_if_cancelled(self, future: "Future[Any]") -> None:
+        # A call cancelled while still queued never reaches _instrumented, so
+        # its queue slot is given back here. A running call cannot be cancelled.
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+
+    def _instrumented(
+        self,
+        context: contextvars.Context,
+        call: Callable[[], T],
+        submitted_at: float,
+    ) -> T:
+        started = time.perf_counter()
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+            waited_ms = (started - submitted_at) * 1000
+            self._wait_total_ms += waited_ms
+            self._wait_max_ms = max(self._wait_max_ms, waited_ms)
+
+        failed = False
+        try:
+            return context.run(call)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self._active -= 1
+                self._completed += 1
+                self._failed += int(failed)
+                self._run_total_ms += elapsed_ms
+                self._run_max_ms = max(self._run_max_ms, elapsed_ms)
+
+    def reset_after_fork(self) -> None:
+        # Worker threads do not survive fork(); a held lock would never be released.
+        self._lock = threading.Lock()
+        self._pool = None
+        self._active = 0
+        self._queued = 0
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            completed = self._completed
+            started = self._submitted - self._queued - self._rejected
+            return {
+                "pool_size": self.max_workers,
+                "queue_limit": self.max_queue_size,
+                "active": self._active,
+                "queued": self._queued,
+                "peak_queued": self._peak_queued,
+                "saturation": round(self._active / self.max_workers, 3)
+                if self.max_workers
+                else 0.0,
+                "submitted": self._submitted,
+                "completed": completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "queue_wait_avg_ms": round(self._wait_total_ms / started, 3)
+                if started > 0
+                else 0.0,
+                "queue_wait_max_ms": round(self._wait_max_ms, 3),
+                "run_avg_ms": round(self._run_total_ms / completed, 3)
+                if completed
+                else 0.0,
+                "run_max_ms": round(self._run_max_ms, 3),
+            }
+
+
+blocking_executor = BlockingExecutor(
+    max_workers=settings.blocking_pool_size,
+    max_queue_size=settings.blocking_queue_limit,
+)
+os.register_at_fork(after_in_child=blocking_executor.reset_after_fork)
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a synchronous call on the shared bounded pool and await its result."""
+    return await blocking_executor.run(func, *args, **kwargs)
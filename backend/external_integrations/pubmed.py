@@ -1,15 +1,41 @@
 from __future__ import annotations
 
 import logging
+import os
+import time
 from typing import Any, Dict, List, Optional
 from urllib.parse import quote_plus
 
 import requests
 
 from backend.config import settings
+from backend.metrics import PUBMED_REQUEST_DURATION
+from backend.tracing import span, traced
 
 logger = logging.getLogger(__name__)
 
+_session: Optional[requests.Session] = None
+
+
+def _http_session() -> requests.Session:
+    """Keep-alive session for E-utilities, created lazily in each worker process."""
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=settings.blocking_pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _session = session
+    return _session
+
+
+def _reset_session_after_fork() -> None:
+    global _session
+    _session = None
+
+
+os.register_at_fork(after_in_child=_reset_session_after_fork)
+
 
 class PubMedIntegrationError(Exception):
     """Raised when PubMed integration fails in a non-recoverable way."""
@@ -60,9 +86,23 @@ def build_pubmed_query(
 
 
 def _request_json(url: str, params: Dict[str, Any]) -> Dict[str, Any]:
-    response = requests.get(url, params=params, timeout=settings.pubmed_timeout_seconds)
-    response.raise_for_status()
-    return response.json()
+    # "esearch.fcgi" -> "esearch"
+    endpoint = url.rsplit("/", 1)[-1].split(".", 1)[0]
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        with span(f"pubmed.{endpoint}"):
+            response = _http_session().get(
+                url, params=params, timeout=settings.pubmed_timeout_seconds
+            )
+            response.raise_for_status()
+            payload = response.json()
+        outcome = "ok"
+        return payload
+    finally:
+        PUBMED_REQUEST_DURATION.labels(endpoint, outcome).observe(
+            time.perf_counter() - started
+        )
 
 
 def _pubmed_endpoint(path: str) -> str:
@@ -164,6 +204,7 @@ def fetch_pubmed_summaries(
     return summaries
 
 
+@traced("pubmed")
 def get_pubmed_research(
     symptom: str,
     age: Optional[int] = None,
@@ -0,0 +1,245 @@
+"""Production entry point running several uvicorn workers on one listening socket.
+
+    python -m backend.launcher [--workers N] [--host HOST] [--port PORT]
+
+The supervisor binds the socket once and starts ``--workers`` processes
+(default ``WEB_CONCURRENCY``, else one per CPU core). Workers are started with
+the ``spawn`` method, so each one imports the app and builds its own MongoDB
+client, HTTP sessions, thread pool and caches. Nothing is shared except the
+socket.
+
+Signals sent to the supervisor:
+    SIGHUP           rolling restart: each worker is replaced by a fresh one,
+                     which must finish startup before the old one is drained.
+                     A replacement that fails to start aborts the reload and
+                     the old workers keep serving.
+    SIGTERM, SIGINT  graceful shutdown: workers finish in-flight requests
+Workers that exit unexpectedly are restarted after an exponential backoff
+(0.5 s doubling up to 30 s), which resets once a worker has stayed up for 30 s.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from dataclasses import dataclass
+from multiprocessing.context import SpawnProcess
+from multiprocessing.synchronize import Event
+from typing import List, Optional
+
+import uvicorn
+
+from backend.config import settings
+
+logger = logging.getLogger("backend.launcher")
+
+APP = "backend.server:app"
+
+_spawn = multiprocessing.get_context("spawn")
+
+CRASH_BACKOFF_MAX_SECONDS = 30.0
+# A worker that ran this long after startup is not crash looping.
+STABLE_UPTIME_SECONDS = 30.0
+
+
+def default_worker_count() -> int:
+    return settings.web_concurrency or os.cpu_count() or 1
+
+
+class _WorkerServer(uvicorn.Server):
+    def __init__(self, config: uvicorn.Config, ready: Event) -> None:
+        super().__init__(config)
+        self._ready = ready
+
+    async def startup(self, sockets: Optional[List[socket.socket]] = None) -> None:
+        await super().startup(sockets=sockets)
+        # uvicorn reports a failed lifespan startup through should_exit.
+        if not self.should_exit:
+            self._ready.set()
+
+
+def _run_worker(
+    config: uvicorn.Config, sock: socket.socket, ready: Event, index: int
+) -> None:
+    # The supervisor handles SIGHUP; a worker only ever drains on SIGTERM.
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    # Read by the app to pick this worker's METRICS_PORT offset.
+    os.environ["API_WORKER_INDEX"] = str(index)
+    _WorkerServer(config, ready).run(sockets=[sock])
+
+
+@dataclass
+class _Worker:
+    process: SpawnProcess
+    # Held for the worker's lifetime: the semaphore vanishes if the parent drops it.
+    ready: Event
+    started_at: float
+    # Consecutive crashes of this slot, and when its next replacement may start.
+    failures: int = 0
+    restart_at: Optional[float] = None
+
+
+def crash_backoff_seconds(failures: int) -> float:
+    """Delay before restarting a slot whose workers crashed ``failures`` times in a row."""
+    return min(0.5 * 2 ** min(max(failures - 1, 0), 10), CRASH_BACKOFF_MAX_SECONDS)
+
+
+class WorkerSupervisor:
+    def __init__(
+        self,
+        config: uvicorn.Config,
+        workers: int,
+        *,
+        graceful_timeout_seconds: float = 30.0,
+        startup_timeout_seconds: float = 60.0,
+    ) -> None:
+        self.config = config
+        self.workers = max(workers, 1)
+        self.graceful_timeout_seconds = graceful_timeout_seconds
+        self.startup_timeout_seconds = startup_timeout_seconds
+        self._workers: List[_Worker] = []
+        self._socket: Optional[socket.socket] = None
+        self._reload_requested = False
+        self._stop_requested = False
+
+    def run(self) -> None:
+        self._socket = self.config.bind_socket()
+        signal.signal(signal.SIGHUP, self._request_reload)
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+        logger.info(
+            "Starting %s worker(s) on http://%s:%s",
+            self.workers,
+            self.config.host,
+            self.config.port,
+        )
+
+        try:
+            self._workers = [self._spawn_worker(index) for index in range(self.workers)]
+            while not self._stop_requested:
+                time.sleep(0.5)
+                if self._reload_requested:
+                    self._reload_requested = False
+                    self._rolling_restart()
+                self._replace_dead_workers()
+        finally:
+            for worker in self._workers:
+                self._drain(worker)
+            self._socket.close()
+            logger.info("All workers stopped")
+
+    def _request_reload(self, *_args: object) -> None:
+        self._reload_requested = True
+
+    def _request_stop(self, *_args: object) -> None:
+        self._stop_requested = True
+
+    def _spawn_worker(self, index: int) -> _Worker:
+        ready = _spawn.Event()
+        process = _spawn.Process(
+            target=_run_worker,
+            args=(self.config, self._socket, ready, index),
+            name="api-worker",
+        )
+        process.start()
+        logger.info("Started worker %s", process.pid)
+        return _Worker(process, ready, started_at=time.monotonic())
+
+    def _wait_until_ready(self, worker: _Worker) -> bool:
+        """Wait for startup to finish; False if the worker died or timed out first."""
+        deadline = time.monotonic() + self.startup_timeout_seconds
+        while not worker.ready.wait(0.2):
+            if (
+                not worker.process.is_alive()
+                or self._stop_requested
+                or time.monotonic() >= deadline
+            ):
+                return False
+        return worker.process.is_alive()
+
+    def _drain(self, worker: _Worker) -> None:
+        process = worker.process
+        if process.is_alive():
+            process.terminate()
+        process.join(self.graceful_timeout_seconds)
+        if process.is_alive():
+            logger.warning("Worker %s ignored SIGTERM; killing it", process.pid)
+            process.kill()
+            process.join()
+
+    def _rolling_restart(self) -> None:
+        logger.info("Reloading %s worker(s)", len(self._workers))
+        for index, old in enumerate(list(self._workers)):
+            if self._stop_requested:
+                return
+            replacement = self._spawn_worker(index)
+            if not self._wait_until_ready(replacement):
+                logger.warning(
+                    "Replacement worker %s did not start; aborting the reload and "
+                    "keeping worker %s",
+                    replacement.process.pid,
+                    old.process.pid,
+                )
+                self._drain(replacement)
+                return
+            self._workers[index] = replacement
+            self._drain(old)
+
+    def _replace_dead_workers(self) -> None:
+        now = time.monotonic()
+        for index, worker in enumerate(self._workers):
+            process = worker.process
+            if process.is_alive() or self._stop_requested:
+                continue
+            if worker.restart_at is None:
+                process.join()
+                stable = (
+                    worker.ready.is_set() and now - worker.started_at >= STABLE_UPTIME_SECONDS
+                )
+                worker.failures = (0 if stable else worker.failures) + 1
+                delay = crash_backoff_seconds(worker.failures)
+                worker.restart_at = now + delay
+                logger.warning(
+                    "Worker %s exited with code %s; restarting it in %.1f s",
+                    process.pid,
+                    process.exitcode,
+                    delay,
+                )
+            if now >= worker.restart_at:
+                replacement = self._spawn_worker(index)
+                replacement.failures = worker.failures
+                self._workers[index] = replacement
+
+
+def build_config(host: str, port: int) -> uvicorn.Config:
+    return uvicorn.Config(
+        APP,
+        host=host,
+        port=port,
+        proxy_headers=True,
+        timeout_graceful_shutdown=settings.worker_graceful_timeout_seconds,
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m backend.launcher")
+    parser.add_argument("--workers", type=int, default=default_worker_count())
+    parser.add_argument("--host", default=settings.api_host)
+    parser.add_argument("--port", type=int, default=settings.api_port)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    WorkerSupervisor(
+        build_config(args.host, args.port),
+        args.workers,
+        graceful_timeout_seconds=settings.worker_graceful_timeout_seconds,
+    ).run()
+
+
+if __name__ == "__main__":
+    main()
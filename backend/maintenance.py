@@ -0,0 +1,95 @@
+"""Operational maintenance commands.
+
+Usage:
+    python -m backend.maintenance rebuild-stats [--user-id USER_ID]
+    python -m backend.maintenance migrate-timestamps [--batch-size N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+from typing import Optional, Sequence
+
+from backend.database import close_mongo_connection, connect_to_mongo
+from backend.repositories import AnalysisRepository, AnalysisStatsRepository
+
+logger = logging.getLogger(__name__)
+
+
+async def rebuild_stats(user_id: Optional[str] = None) -> int:
+    db = await connect_to_mongo()
+    repository = AnalysisRepository(
+        db.symptom_analyses,
+        stats=AnalysisStatsRepository(db.user_analysis_stats),
+    )
+
+    user_ids = [user_id] if user_id else await db.symptom_analyses.distinct("user_id")
+    for current_user_id in user_ids:
+        stats = await repository.rebuild_stats(str(current_user_id))
+        logger.info(
+            "Rebuilt analysis stats for user %s (%s analyses)",
+            current_user_id,
+            (stats or {}).get("analysis_count", 0),
+        )
+    return len(user_ids)
+
+
+async def migrate_timestamps(batch_size: int = 500) -> dict:
+    db = await connect_to_mongo()
+    repository = AnalysisRepository(
+        db.symptom_analyses,
+        stats=AnalysisStatsRepository(db.user_analysis_stats),
+    )
+
+    result = await repository.migrate_timestamps(batch_size=batch_size)
+    # The stats documents still carry the old strings in their recent entries,
+    # and left the analyses they could not bucket by day out of ``daily``.
+    for user_id in result["user_ids"]:
+        await repository.rebuild_stats(user_id)
+    if result["unparseable"]:
+        logger.warning(
+            "%s analysis timestamp(s) could not be parsed and were left unchanged",
+            result["unparseable"],
+        )
+    return result
+
+
+async def _run(args: argparse.Namespace) -> None:
+    try:
+        if args.command == "rebuild-stats":
+            count = await rebuild_stats(args.user_id)
+            print(f"Rebuilt analysis stats for {count} user(s).")
+        elif args.command == "migrate-timestamps":
+            result = await migrate_timestamps(args.batch_size)
+            print(
+                f"Converted {result['migrated']} analysis timestamp(s) for "
+                f"{len(result['user_ids'])} user(s)."
+            )
+    finally:
+        await close_mongo_connection()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m backend.maintenance")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = subcommands.add_parser(
+        "rebuild-stats",
+        help="Regenerate per-user dashboard aggregates from raw analysis history.",
+    )
+    rebuild.add_argument("--user-id", default=None)
+
+    migrate = subcommands.add_parser(
+        "migrate-timestamps",
+        help="Convert string created_at values on analyses to native dates.",
+    )
+    migrate.add_argument("--batch-size", type=int, default=500)
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,510 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Every thread records into its own value array, so the hot path takes no lock
+and never contends with other threads; ``/metrics`` sums the arrays when it
+is scraped. Histograms use fixed buckets chosen at definition time.
+
+Counts are per process. Renders carry a ``worker`` label, and
+``MetricsServer`` gives each worker its own scrape port, so Prometheus sees
+one monotonic series per worker instead of whichever worker answered.
+"""
+
+import asyncio
+import bisect
+import functools
+import inspect
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from starlette.routing import Match
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+LabelValues = Tuple[str, ...]
+
+
+class _ThreadShards:
+    """Per-thread value arrays; a thread only ever writes its own."""
+
+    def __init__(self, size: int) -> None:
+        self._size = size
+        self._local = threading.local()
+        self._shards: List[List[float]] = []
+        self._lock = threading.Lock()
+
+    def values(self) -> List[float]:
+        values = getattr(self._local, "values", None)
+        if values is None:
+            values = [0.0] * self._size
+            with self._lock:
+                self._shards.append(values)
+            self._local.values = values
+        return values
+
+    def totals(self) -> List[float]:
+        with self._lock:
+            shards = list(self._shards)
+        totals = [0.0] * self._size
+        for shard in shards:
+            for index, value in enumerate(shard):
+                totals[index] += value
+        return totals
+
+    def reset_after_fork(self) -> None:
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+
+class _CounterChild:
+    def __init__(self) -> None:
+        self._shards = _ThreadShards(1)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._shards.values()[0] += amount
+
+    def samples(self, name: str, labels: Dict[str, str]) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        yield name, labels, self._shards.totals()[0]
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self._buckets = buckets
+        # One slot per bucket, one for +Inf, then the running sum.
+        self._shards = _ThreadShards(len(buckets) + 2)
+
+    def observe(self, value: float) -> None:
+        values = self._shards.values()
+        values[bisect.bisect_left(self._buckets, value)] += 1
+        values[-1] += value
+
+    def samples(self, name: str, labels: Dict[str, str]) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        totals = self._shards.totals()
+        cumulative = 0.0
+        for bound, count in zip([*self._buckets, math.inf], totals[:-1]):
+            cumulative += count
+            yield f"{name}_bucket", {**labels, "le": _format_value(bound)}, cumulative
+        yield f"{name}_sum", labels, totals[-1]
+        yield f"{name}_count", labels, cumulative
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, Any] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str) -> Any:
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def collect(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        for values, child in list(self._children.items()):
+            yield from child.samples(self.name, dict(zip(self.labelnames, values)))
+
+    def reset_after_fork(self) -> None:
+        self._lock = threading.Lock()
+        for child in self._children.values():
+            child._shards.reset_after_fork()
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+
+class CallbackMetric:
+    """A gauge or counter whose samples are read from ``callback`` at scrape time."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        callback: Callable[[], Iterable[Tuple[LabelValues, float]]],
+        *,
+        type_name: str = "gauge",
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self.type_name = type_name
+
+    def collect(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        for values, value in self.callback():
+            yield self.name, dict(zip(self.labelnames, values)), value
+
+    def reset_after_fork(self) -> None:
+        return None
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Any] = {}
+
+    def register(self, metric: Any) -> Any:
+        """Add ``metric``; registering a name again replaces the earlier metric."""
+        self._metrics[metric.name] = metric
+        return metric
+
+    def unregister(self, name: str) -> None:
+        self._metrics.pop(name, None)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self, extra_labels: Optional[Dict[str, str]] = None) -> str:
+        """Render every metric, adding ``extra_labels`` to each sample."""
+        extra_labels = extra_labels or {}
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {_escape_help(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            try:
+                samples = list(metric.collect())
+            except Exception:
+                # A broken callback must not take the other metrics down with it.
+                continue
+            for name, labels, value in samples:
+                labels = {**labels, **extra_labels}
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def reset_after_fork(self) -> None:
+        # Counts recorded by the parent belong to the parent.
+        for metric in self._metrics.values():
+            metric.reset_after_fork()
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    rendered = ",".join(
+        '{}="{}"'.format(
+            key,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for key, value in labels.items()
+    )
+    return "{" + rendered + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if math.isnan(value):
+        return "NaN"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def worker_index() -> int:
+    """This worker's launcher slot; a single uvicorn process is slot 0."""
+    return int(os.getenv("API_WORKER_INDEX", "0"))
+
+
+def worker_labels() -> Dict[str, str]:
+    # The slot, not the pid: a restarted worker continues the same series.
+    return {"worker": str(worker_index())}
+
+
+registry = MetricsRegistry()
+os.register_at_fork(after_in_child=registry.reset_after_fork)
+
+HTTP_REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds",
+    "Time to answer an HTTP request, by route template and status.",
+    ("method", "route", "status"),
+)
+PUBMED_REQUEST_DURATION = registry.histogram(
+    "pubmed_request_duration_seconds",
+    "Latency of NCBI E-utilities calls.",
+    ("endpoint", "outcome"),
+)
+MONGO_OPERATION_DURATION = registry.histogram(
+    "mongo_operation_duration_seconds",
+    "Latency of repository methods backed by MongoDB.",
+    ("repository", "method", "outcome"),
+)
+MONGO_COMMAND_DURATION = registry.histogram(
+    "mongo_command_duration_seconds",
+    "Latency of MongoDB wire commands, by command and collection.",
+    ("command", "collection"),
+)
+CREDIT_OPERATIONS = registry.counter(
+    "credit_operations_total",
+    "Credit reservations, charges, releases and refunds by outcome.",
+    ("outcome",),
+)
+EVENT_LOOP_STALLS = registry.counter(
+    "event_loop_stalls_total",
+    "Event-loop stalls over the watchdog threshold, by blocking call site.",
+    ("site",),
+)
+EVENT_LOOP_STALL_DURATION = registry.histogram(
+    "event_loop_stall_seconds",
+    "Duration of event-loop stalls over the watchdog threshold.",
+    buckets=LOOP_LAG_BUCKETS,
+)
+EVENT_LOOP_LAG = registry.histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop woke a periodic probe.",
+    buckets=LOOP_LAG_BUCKETS,
+)
+
+
+def instrument_repository(cls: type) -> type:
+    """Time every public coroutine method of a repository class."""
+    for name, member in list(vars(cls).items()):
+        if name.startswith("_") or not inspect.iscoroutinefunction(member):
+            continue
+        setattr(cls, name, _timed(member, cls.__name__, name))
+    return cls
+
+
+def _timed(method: Callable[..., Any], repository: str, name: str) -> Callable[..., Any]:
+    succeeded = MONGO_OPERATION_DURATION.labels(repository, name, "ok")
+    failed = MONGO_OPERATION_DURATION.labels(repository, name, "error")
+
+    @functools.wraps(method)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        outcome = failed
+        try:
+            result = await method(*args, **kwargs)
+            outcome = succeeded
+            return result
+        finally:
+            outcome.observe(time.perf_counter() - started)
+
+    return wrapper
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency by route template and status.
+
+    Requests that never reach a route (404s, or requests rejected by an outer
+    middleware) are matched against ``routes`` so they are still labelled by
+    template; anything else is reported as ``unmatched`` to bound cardinality.
+    """
+
+    def __init__(
+        self,
+        app: Any,
+        *,
+        routes: Sequence[Any] = (),
+        histogram: Histogram = HTTP_REQUEST_DURATION,
+    ) -> None:
+        self.app = app
+        self.routes = routes
+        self.histogram = histogram
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.histogram.labels(
+                scope["method"], self._route_template(scope), str(status)
+            ).observe(time.perf_counter() - started)
+
+    def _route_template(self, scope: Dict[str, Any]) -> str:
+        route = scope.get("route")
+        if route is not None:
+            return route.path
+        for candidate in self.routes:
+            match, _ = candidate.matches(scope)
+            if match != Match.NONE:
+                return candidate.path
+        return "unmatched"
+
+
+class EventLoopLagMonitor:
+    """Periodically sleeps and records how much later than asked it woke up."""
+
+    def __init__(
+        self,
+        interval_seconds: float,
+        *,
+        histogram: Histogram = EVENT_LOOP_LAG,
+        clock: Callable[[], float] = time.perf_counter,
+    ) -> None:
+        self.interval_seconds = interval_seconds
+        self.histogram = histogram
+        self._clock = clock
+        self._task: Optional[asyncio.Task] = None
+        self.last_lag_seconds = 0.0
+
+    async def run(self) -> None:
+        while True:
+            started = self._clock()
+            await asyncio.sleep(self.interval_seconds)
+            lag = max(self._clock() - started - self.interval_seconds, 0.0)
+            self.last_lag_seconds = lag
+            self.histogram.observe(lag)
+
+    def start(self) -> None:
+        if self.interval_seconds > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self.run(), name="event-loop-lag")
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
+class MetricsServer:
+    """Serves one worker's metrics on a port of its own from a daemon thread.
+
+    Workers share the API socket, so a scrape there reaches an arbitrary
+    worker. ``authorize`` receives the Authorization header. Binding is
+    retried while the port is still held, for example by the worker this one
+    replaces during a rolling restart.
+    """
+
+    def __init__(
+        self,
+        render: Callable[[], str],
+        authorize: Callable[[Optional[str]], bool],
+        *,
+        host: str,
+        port: int,
+        retry_seconds: float = 1.0,
+    ) -> None:
+        self.render = render
+        self.authorize = authorize
+        self.host = host
+        self.port = port
+        self.retry_seconds = retry_seconds
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="metrics-server", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        thread, self._thread = self._thread, None
+        self._stopping.set()
+        if thread is not None:
+            thread.join(self.retry_seconds + 1)
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                server = HTTPServer((self.host, self.port), self._handler())
+            except OSError:
+                self._stopping.wait(self.retry_seconds)
+                continue
+            # handle_request() returns after ``timeout`` so stop() is noticed.
+            server.timeout = 0.2
+            with server:
+                while not self._stopping.is_set():
+                    server.handle_request()
+            return
+
+    def _handler(self) -> type:
+        metrics_server = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self._reply(404, b"Not Found")
+                elif not metrics_server.authorize(self.headers.get("Authorization")):
+                    self._reply(403, b"Invalid metrics token.")
+                else:
+                    self._reply(200, metrics_server.render().encode(), CONTENT_TYPE)
+
+            def _reply(
+                self, status: int, body: bytes, content_type: str = "text/plain"
+            ) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *_args: Any) -> None:
+                return None
+
+        return _Handler
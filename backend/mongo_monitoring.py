@@ -0,0 +1,387 @@
+"""MongoDB command monitoring: per-shape latency, a slow log and explain sampling.
+
+``CommandMonitor`` is a pymongo command listener. Each command's filter, sort
+and pipeline are reduced to a *query shape*: every literal is replaced by
+``"?"``, so calls that differ only in their values share one entry and shapes
+never carry user data. Durations are aggregated per (command, collection,
+shape). Commands over the slow threshold are logged with their shape.
+
+With explain sampling on, the first occurrence of every read or write shape is
+explained once (``queryPlanner`` verbosity, so nothing is executed) from a
+daemon thread. Winning plans that scan the whole collection are flagged as
+``COLLSCAN``.
+"""
+
+import copy
+import json
+import logging
+import os
+import queue
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+from pymongo.errors import PyMongoError
+
+from backend.config import settings
+from backend.metrics import MONGO_COMMAND_DURATION
+
+logger = logging.getLogger(__name__)
+
+OTHER_SHAPE = "other"
+
+# Handshake, health and our own explain commands say nothing about the data path.
+IGNORED_COMMANDS = frozenset(
+    {"ping", "hello", "isMaster", "ismaster", "buildInfo", "endSessions", "explain"}
+)
+EXPLAINABLE_COMMANDS = frozenset(
+    {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+)
+_LOGICAL_OPERATORS = frozenset({"$or", "$and", "$nor"})
+# Session and transaction fields that explain rejects or must not replay.
+_EXPLAIN_EXCLUDED_FIELDS = frozenset(
+    {
+        "lsid",
+        "txnNumber",
+        "autocommit",
+        "startTransaction",
+        "readConcern",
+        "writeConcern",
+        "apiVersion",
+        "apiStrict",
+        "apiDeprecationErrors",
+    }
+)
+
+CommandKey = Tuple[str, str, str]
+
+
+def query_shape(value: Any) -> Any:
+    """Replace every literal in a filter with ``"?"``, keeping its structure."""
+    if isinstance(value, dict):
+        return {
+            key: (
+                [query_shape(clause) for clause in item]
+                if key in _LOGICAL_OPERATORS and isinstance(item, list)
+                else query_shape(item)
+            )
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        # ``$in`` lists and array literals: the length is a value too.
+        return ["?"]
+    return "?"
+
+
+def _pipeline_shape(pipeline: Any) -> List[Any]:
+    if not isinstance(pipeline, list):
+        return []
+    shaped: List[Any] = []
+    for stage in pipeline:
+        if not isinstance(stage, dict):
+            continue
+        shaped.append(
+            {
+                # Sort keys and directions are structure, not values.
+                name: body if name == "$sort" else query_shape(body)
+                for name, body in stage.items()
+            }
+        )
+    return shaped
+
+
+def command_shape(command_name: str, command: Dict[str, Any]) -> str:
+    """Render the shape of a command's query parts as compact JSON."""
+    shape: Dict[str, Any] = {}
+    if command_name == "find":
+        shape["filter"] = query_shape(command.get("filter", {}))
+        if command.get("sort"):
+            shape["sort"] = command["sort"]
+    elif command_name == "aggregate":
+        shape["pipeline"] = _pipeline_shape(command.get("pipeline"))
+    elif command_name == "findAndModify":
+        shape["query"] = query_shape(command.get("query", {}))
+        if command.get("sort"):
+            shape["sort"] = command["sort"]
+    elif command_name in {"count", "distinct"}:
+        shape["query"] = query_shape(command.get("query", {}))
+        if command_name == "distinct":
+            shape["key"] = command.get("key")
+    elif command_name in {"update", "delete"}:
+        statements = command.get(f"{command_name}s") or [{}]
+        # A batch is almost always one statement shape repeated.
+        shape["q"] = query_shape(statements[0].get("q", {}))
+    return json.dumps(shape, separators=(",", ":"), default=str)
+
+
+def _command_collection(command_name: str, command: Dict[str, Any]) -> str:
+    target = command.get("collection") if command_name == "getMore" else command.get(command_name)
+    return target if isinstance(target, str) else ""
+
+
+def winning_plan_stages(explain: Any) -> List[str]:
+    """Every ``stage`` in the winning plan(s) of an explain reply, outermost first."""
+    stages: List[str] = []
+
+    def walk(node: Any, in_plan: bool) -> None:
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key == "rejectedPlans":
+                    continue
+                if in_plan and key == "stage" and isinstance(value, str):
+                    stages.append(value)
+                walk(value, in_plan or key == "winningPlan")
+        elif isinstance(node, list):
+            for item in node:
+                walk(item, in_plan)
+
+    walk(explain, False)
+    return stages
+
+
+@dataclass
+class QueryShapeStats:
+    command: str
+    collection: str
+    shape: str
+    count: int = 0
+    errors: int = 0
+    slow: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    plan: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "command": self.command,
+            "collection": self.collection,
+            "shape": self.shape,
+            "count": self.count,
+            "errors": self.errors,
+            "slow": self.slow,
+            "total_ms": round(self.total_seconds * 1000, 1),
+            "mean_ms": round(self.total_seconds * 1000 / self.count, 2) if self.count else 0.0,
+            "max_ms": round(self.max_seconds * 1000, 1),
+            "plan": self.plan,
+            "collscan": "COLLSCAN" in self.plan,
+        }
+
+
+class ExplainSampler:
+    """Explains queued commands on a daemon thread with the synchronous client.
+
+    ``submit`` only enqueues; when the queue is full or no client is
+    attached, the command is dropped rather than slowing the caller down.
+    """
+
+    def __init__(self, *, max_queue_size: int = 100) -> None:
+        self.client: Any = None
+        self.dropped = 0
+        self.max_queue_size = max_queue_size
+        self._queue: "queue.Queue[Optional[Tuple[str, Dict[str, Any], QueryShapeStats]]]" = (
+            queue.Queue(max_queue_size)
+        )
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, database: str, command: Dict[str, Any], stats: QueryShapeStats) -> None:
+        if self.client is None:
+            return
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="mongo-explain", daemon=True
+            )
+            self._thread.start()
+        explained = {
+            key: value
+            for key, value in command.items()
+            if not key.startswith("$") and key not in _EXPLAIN_EXCLUDED_FIELDS
+        }
+        try:
+            self._queue.put_nowait((database, copy.deepcopy(explained), stats))
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self) -> None:
+        thread, self._thread = self._thread, None
+        self.client = None
+        if thread is not None:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                # The thread exits at its next item once the client is gone.
+                pass
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            client = self.client
+            if item is None or client is None:
+                return
+            self.explain(client, *item)
+
+    def explain(
+        self, client: Any, database: str, command: Dict[str, Any], stats: QueryShapeStats
+    ) -> None:
+        try:
+            reply = client[database].command(
+                {"explain": command, "verbosity": "queryPlanner"}
+            )
+        except PyMongoError as exc:
+            logger.info("Could not explain %s on %s: %s", stats.command, stats.collection, exc)
+            return
+        stats.plan = winning_plan_stages(reply)
+        if "COLLSCAN" in stats.plan:
+            logger.warning(
+                "MongoDB %s on %s scans the whole collection; shape %s",
+                stats.command,
+                stats.collection,
+                stats.shape,
+            )
+
+    def reset_after_fork(self) -> None:
+        # The explain thread does not survive fork(); the child starts idle.
+        self.client = None
+        self._thread = None
+        self._queue = queue.Queue(self.max_queue_size)
+
+
+class CommandMonitor(monitoring.CommandListener):
+    """Aggregates command latency by query shape and logs slow commands.
+
+    pymongo calls the listener from whichever thread runs the command, so the
+    shape table is guarded by a lock; in-flight commands are keyed by
+    connection and request id.
+    """
+
+    def __init__(
+        self,
+        slow_threshold_seconds: float,
+        *,
+        explain_sampling: bool = False,
+        max_shapes: int = 500,
+    ) -> None:
+        self.slow_threshold_seconds = slow_threshold_seconds
+        self.explain_sampling = explain_sampling
+        self.max_shapes = max_shapes
+        self.explainer = ExplainSampler()
+        self.shapes: Dict[CommandKey, QueryShapeStats] = {}
+        self.commands = 0
+        self._in_flight: Dict[Tuple[Any, int], Tuple[str, str, str, str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def attach(self, client: Any) -> None:
+        """Use ``client`` (a synchronous ``MongoClient``) for explain sampling."""
+        if self.explain_sampling:
+            self.explainer.client = client
+
+    def detach(self) -> None:
+        self.explainer.stop()
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        name = event.command_name
+        if name in IGNORED_COMMANDS:
+            return
+        command = event.command
+        explainable = self.explain_sampling and name in EXPLAINABLE_COMMANDS
+        # dict assignment and pop are atomic, so in-flight tracking needs no lock.
+        self._in_flight[(event.connection_id, event.request_id)] = (
+            name,
+            _command_collection(name, command),
+            command_shape(name, command),
+            event.database_name,
+            command if explainable else None,
+        )
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finish(event, failed=False)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finish(event, failed=True)
+
+    def _finish(self, event: Any, *, failed: bool) -> None:
+        pending = self._in_flight.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        name, collection, shape, database, command = pending
+        self.record(
+            name,
+            collection,
+            shape,
+            event.duration_micros / 1_000_000,
+            failed=failed,
+            database=database,
+            command=command,
+        )
+
+    def record(
+        self,
+        name: str,
+        collection: str,
+        shape: str,
+        seconds: float,
+        *,
+        failed: bool = False,
+        database: str = "",
+        command: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        slow = seconds >= self.slow_threshold_seconds
+        with self._lock:
+            key = (name, collection, shape)
+            stats = self.shapes.get(key)
+            is_new = stats is None
+            if stats is None:
+                if len(self.shapes) >= self.max_shapes:
+                    key = (name, collection, OTHER_SHAPE)
+                    stats = self.shapes.get(key)
+                    is_new = False
+                if stats is None:
+                    stats = self.shapes[key] = QueryShapeStats(name, collection, key[2])
+            stats.count += 1
+            stats.errors += int(failed)
+            stats.slow += int(slow)
+            stats.total_seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            self.commands += 1
+        MONGO_COMMAND_DURATION.labels(name, collection).observe(seconds)
+        if slow:
+            logger.warning(
+                "Slow MongoDB %s on %s took %.1f ms; shape %s",
+                name,
+                collection or database,
+                seconds * 1000,
+                shape,
+            )
+        if is_new and command is not None:
+            self.explainer.submit(database, command, stats)
+
+    def report(self, limit: int = 20, order_by: str = "total") -> List[Dict[str, Any]]:
+        """The ``limit`` worst shapes by total, mean or max duration."""
+        sort_keys = {
+            "total": lambda item: item.total_seconds,
+            "mean": lambda item: item.total_seconds / item.count if item.count else 0.0,
+            "max": lambda item: item.max_seconds,
+        }
+        with self._lock:
+            shapes = list(self.shapes.values())
+        shapes.sort(key=sort_keys[order_by], reverse=True)
+        return [stats.to_dict() for stats in shapes[:limit]]
+
+    def reset(self) -> None:
+        with self._lock:
+            self.shapes.clear()
+            self.commands = 0
+
+    def reset_after_fork(self) -> None:
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.shapes = {}
+        self.commands = 0
+        self.explainer.reset_after_fork()
+
+
+command_monitor = CommandMonitor(
+    settings.mongo_slow_operation_ms / 1000,
+    explain_sampling=settings.mongo_explain_sampling,
+)
+os.register_at_fork(after_in_child=command_monitor.reset_after_fork)
@@ -0,0 +1,277 @@
+"""Profiling hooks that are safe to leave installed on a production worker.
+
+Three tools, all per worker process:
+
+- ``ProfilingMiddleware`` runs one request under ``cProfile`` when it carries
+  ``X-Profile`` and a valid admin token. Calls the request sends to the
+  blocking thread pool are profiled in their thread and merged in.
+- ``StackSampler`` is a background thread that periodically records every
+  thread's stack and renders the counts as collapsed stacks, the input
+  format of flamegraph tools.
+- ``capture_stacks`` runs a sampler for a bounded number of seconds.
+
+Nothing is recorded unless asked for, so an idle hook costs one header
+lookup per request.
+"""
+
+import asyncio
+import contextvars
+import cProfile
+import hmac
+import io
+import itertools
+import os
+import pstats
+import sys
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+from backend.config import settings
+
+T = TypeVar("T")
+
+PROFILE_HEADER = b"x-profile"
+ADMIN_TOKEN_HEADER = b"x-admin-token"
+
+
+class ProfilerBusyError(RuntimeError):
+    """Raised when a profile is requested while another one is running."""
+
+
+def admin_token_matches(expected: str, supplied: Optional[str]) -> bool:
+    if not expected or not supplied:
+        return False
+    return hmac.compare_digest(expected.encode(), supplied.encode())
+
+
+class RequestProfile:
+    def __init__(self, profile_id: str, method: str, path: str) -> None:
+        self.profile_id = profile_id
+        self.method = method
+        self.path = path
+        self.loop_profile = cProfile.Profile()
+        self.thread_profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def run_in_thread(self, call: Callable[[], T]) -> T:
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            return call()
+        finally:
+            profile.disable()
+            with self._lock:
+                self.thread_profiles.append(profile)
+
+    def report(self, limit: int = 60) -> str:
+        output = io.StringIO()
+        stats = pstats.Stats(self.loop_profile, stream=output)
+        for profile in self.thread_profiles:
+            stats.add(profile)
+        output.write(
+            f"{self.method} {self.path}: event loop plus "
+            f"{len(self.thread_profiles)} blocking call(s)\n"
+        )
+        stats.sort_stats("cumulative").print_stats(limit)
+        return output.getvalue()
+
+
+_active_profile: contextvars.ContextVar[Optional[RequestProfile]] = contextvars.ContextVar(
+    "active_request_profile", default=None
+)
+
+
+def profiled(call: Callable[[], T]) -> Callable[[], T]:
+    """Wrap a blocking-pool call so it joins the current request's profile."""
+    profile = _active_profile.get()
+    if profile is None:
+        return call
+    return lambda: profile.run_in_thread(call)
+
+
+class ProfileStore:
+    """The most recent request profiles of this worker, by id."""
+
+    def __init__(self, max_profiles: int = 20) -> None:
+        self.max_profiles = max_profiles
+        self._reports: "OrderedDict[str, str]" = OrderedDict()
+        self._ids = itertools.count(1)
+
+    def next_id(self) -> str:
+        return f"{os.getpid()}-{next(self._ids)}"
+
+    def add(self, profile_id: str, report: str) -> None:
+        self._reports[profile_id] = report
+        while len(self._reports) > self.max_profiles:
+            self._reports.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[str]:
+        return self._reports.get(profile_id)
+
+    def ids(self) -> List[str]:
+        return list(self._reports)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling single requests on demand.
+
+    A request is profiled when it sends ``X-Profile: 1`` and the admin token in
+    ``X-Admin-Token``; the response then carries ``X-Profile-Id``. Only one
+    request is profiled at a time. The profile covers everything the event
+    loop ran while the request was in flight, so take it on a quiet worker.
+    """
+
+    def __init__(self, app: Any, *, admin_token: str, store: ProfileStore) -> None:
+        self.app = app
+        self.admin_token = admin_token
+        self.store = store
+        self._busy = False
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or not self.admin_token:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        if PROFILE_HEADER not in headers:
+            await self.app(scope, receive, send)
+            return
+        supplied = headers.get(ADMIN_TOKEN_HEADER, b"").decode("latin-1")
+        if not admin_token_matches(self.admin_token, supplied):
+            await self.app(scope, receive, send)
+            return
+
+        if self._busy:
+            await self.app(scope, receive, _with_header(send, b"x-profile-status", b"busy"))
+            return
+
+        profile = RequestProfile(self.store.next_id(), scope["method"], scope["path"])
+        self._busy = True
+        token = _active_profile.set(profile)
+        profile.loop_profile.enable()
+        try:
+            await self.app(
+                scope,
+                receive,
+                _with_header(send, b"x-profile-id", profile.profile_id.encode()),
+            )
+        finally:
+            profile.loop_profile.disable()
+            _active_profile.reset(token)
+            self._busy = False
+            self.store.add(profile.profile_id, profile.report())
+
+
+def _with_header(send: Any, name: bytes, value: bytes) -> Callable[[Dict[str, Any]], Any]:
+    async def wrapped(message: Dict[str, Any]) -> None:
+        if message["type"] == "http.response.start":
+            message = {**message, "headers": [*message.get("headers", []), (name, value)]}
+        await send(message)
+
+    return wrapped
+
+
+class StackSampler:
+    """Statistical profiler sampling every thread's stack from a daemon thread.
+
+    Each sample walks every live thread's frames, so the cost grows with the
+    thread count and stack depth rather than with the request rate.
+    """
+
+    def __init__(self, interval_seconds: float = 0.01, max_depth: int = 128) -> None:
+        self.interval_seconds = interval_seconds
+        self.max_depth = max_depth
+        self.samples = 0
+        self._counts: Counter[str] = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="stack-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts.clear()
+            self.samples = 0
+
+    def collapsed(self) -> str:
+        """Render ``thread;outer;...;inner count`` lines, heaviest first."""
+        with self._lock:
+            counts = self._counts.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in counts)
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval_seconds):
+            self.sample(skip_thread_id=own_id)
+
+    def sample(self, skip_thread_id: Optional[int] = None) -> None:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks: List[str] = []
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == skip_thread_id:
+                continue
+            frames: List[str] = []
+            while frame is not None and len(frames) < self.max_depth:
+                code = frame.f_code
+                frames.append(
+                    f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                )
+                frame = frame.f_back
+            # Pool threads are numbered; group them under one root.
+            root = names.get(thread_id, "thread").rstrip("_0123456789") or "thread"
+            stacks.append(";".join([root, *reversed(frames)]))
+        with self._lock:
+            self._counts.update(stacks)
+            self.samples += 1
+
+    def reset_after_fork(self) -> None:
+        # The sampling thread does not survive fork(); the child starts idle.
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self.samples = 0
+
+
+_capture_running = False
+
+
+async def capture_stacks(seconds: float, interval_seconds: float = 0.005) -> str:
+    """Sample the whole worker for ``seconds`` and return collapsed stacks."""
+    global _capture_running
+    if _capture_running:
+        raise ProfilerBusyError("A capture is already running on this worker.")
+    _capture_running = True
+    sampler = StackSampler(interval_seconds)
+    sampler.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        await asyncio.to_thread(sampler.stop)
+        _capture_running = False
+    return sampler.collapsed()
+
+
+profile_store = ProfileStore()
+# 0 only means "do not start at boot"; a sampler started later samples every 10 ms.
+stack_sampler = StackSampler((settings.profiling_sampler_interval_ms or 10) / 1000)
+os.register_at_fork(after_in_child=stack_sampler.reset_after_fork)
@@ -0,0 +1,335 @@
+import json
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    """``limit`` requests per ``window_seconds``, counted per user or per client IP.
+
+    ``key="user"`` counts signed-in requests against the JWT ``sub`` and
+    anonymous ones against the client IP; ``key="ip"`` always uses the IP.
+    """
+
+    name: str
+    limit: int
+    window_seconds: int = 60
+    key: str = "user"
+
+
+@dataclass(frozen=True)
+class RateLimitDecision:
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after_seconds: int = 0
+
+
+def sliding_window_decision(
+    policy: RateLimitPolicy,
+    previous: int,
+    current: int,
+    elapsed_fraction: float,
+) -> RateLimitDecision:
+    """Decide a request from the previous and current fixed-window counts.
+
+    The previous window is weighted by the share of it that still overlaps
+    the last ``window_seconds``. ``current`` excludes the request being decided.
+    """
+    estimate = previous * (1.0 - elapsed_fraction) + current
+    if estimate + 1 <= policy.limit:
+        return RateLimitDecision(
+            allowed=True,
+            limit=policy.limit,
+            remaining=max(int(policy.limit - estimate - 1), 0),
+        )
+
+    if current + 1 <= policy.limit and previous > 0:
+        # Wait for enough of the previous window to slide out.
+        target = 1.0 - (policy.limit - current - 1) / previous
+        wait = target - elapsed_fraction
+    else:
+        # Wait for the next window, where this window's count is the previous one.
+        target = 1.0 - (policy.limit - 1) / current if current else 0.0
+        wait = 1.0 - elapsed_fraction + max(target, 0.0)
+    return RateLimitDecision(
+        allowed=False,
+        limit=policy.limit,
+        remaining=0,
+        retry_after_seconds=max(math.ceil(round(wait * policy.window_seconds, 6)), 1),
+    )
+
+
+class MemoryRateLimitStore:
+    """Sliding-window counters held in the memory of the current process.
+
+    Suitable for a single worker. With several workers, each one enforces the
+    limit on its own share of the traffic.
+    """
+
+    def __init__(
+        self,
+        *,
+        clock: Callable[[], float] = time.time,
+        prune_every: int = 10000,
+    ) -> None:
+        self._clock = clock
+        self._prune_every = prune_every
+        # (policy, key) -> [window index, previous count, current count]
+        self._counters: Dict[Tuple[str, str], list] = {}
+        self._windows: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+
+    async def hit(self, policy: RateLimitPolicy, key: str) -> RateLimitDecision:
+        return self.hit_now(policy, key)
+
+    def hit_now(self, policy: RateLimitPolicy, key: str) -> RateLimitDecision:
+        now = self._clock()
+        index, elapsed = divmod(now, policy.window_seconds)
+        index = int(index)
+
+        with self._lock:
+            counter = self._counters.get((policy.name, key))
+            if counter is None:
+                counter = [index, 0, 0]
+                self._counters[(policy.name, key)] = counter
+                self._windows[policy.name] = policy.window_seconds
+            elif counter[0] != index:
+                counter[1] = counter[2] if counter[0] == index - 1 else 0
+                counter[2] = 0
+                counter[0] = index
+
+            decision = sliding_window_decision(
+                policy, counter[1], counter[2], elapsed / policy.window_seconds
+            )
+            if decision.allowed:
+                counter[2] += 1
+
+            self._hits += 1
+            if self._hits % self._prune_every == 0:
+                self._prune(now)
+        return decision
+
+    def _prune(self, now: float) -> None:
+        # A counter more than one window old no longer affects any decision.
+        self._counters = {
+            name_key: counter
+            for name_key, counter in self._counters.items()
+            if now // self._windows[name_key[0]] - counter[0] <= 1
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counters.clear()
+
+    def __len__(self) -> int:
+        return len(self._counters)
+
+
+class MongoRateLimitStore:
+    """Sliding-window counters shared by every worker through MongoDB.
+
+    Each (policy, key, window) is one document whose ``count`` of admitted
+    requests is incremented atomically, and only while it is under the cap.
+    Closed windows are cached in-process, so a request, admitted or not,
+    normally costs a single round trip. Documents expire through a TTL index on
+    ``expires_at``. While MongoDB is unreachable, limits fall back to this
+    worker's memory.
+    """
+
+    def __init__(
+        self,
+        get_collection: Callable[[], Any],
+        *,
+        clock: Callable[[], float] = time.time,
+        fallback: Optional[MemoryRateLimitStore] = None,
+    ) -> None:
+        self._get_collection = get_collection
+        self._clock = clock
+        self.fallback = fallback or MemoryRateLimitStore(clock=clock)
+        self._closed_windows: Dict[str, int] = {}
+
+    async def hit(self, policy: RateLimitPolicy, key: str) -> RateLimitDecision:
+        now = self._clock()
+        index, elapsed = divmod(now, policy.window_seconds)
+        index = int(index)
+        elapsed_fraction = elapsed / policy.window_seconds
+        expires_at = datetime.fromtimestamp(
+            (index + 2) * policy.window_seconds, timezone.utc
+        ) + timedelta(seconds=1)
+
+        try:
+            collection = self._get_collection()
+            previous = await self._previous_count(
+                collection, f"{policy.name}:{key}:{index - 1}"
+            )
+            # The largest current count that still admits one more request.
+            # Counting only admitted requests keeps rejections to this single
+            # round trip, with nothing to undo.
+            cap = math.floor(policy.limit - 1 - previous * (1.0 - elapsed_fraction))
+            current_id = f"{policy.name}:{key}:{index}"
+            try:
+                document = await self._increment(collection, current_id, cap, expires_at)
+            except DuplicateKeyError:
+                # A concurrent first hit upserted the window; it exists now.
+                document = await self._increment(collection, current_id, cap, expires_at)
+        except Exception as exc:
+            logger.warning("Rate limit store unavailable, using local counters: %s", exc)
+            return self.fallback.hit_now(policy, key)
+
+        current = int(document["count"]) if document else 0
+        return sliding_window_decision(policy, previous, current, elapsed_fraction)
+
+    async def _increment(
+        self, collection: Any, current_id: str, cap: int, expires_at: datetime
+    ) -> Optional[Dict[str, Any]]:
+        """Count one admitted request if ``count <= cap``; returns the prior document."""
+        count = {"$ifNull": ["$count", 0]}
+        return await collection.find_one_and_update(
+            {"_id": current_id},
+            [
+                {
+                    "$set": {
+                        "count": {
+                            "$cond": [{"$lte": [count, cap]}, {"$add": [count, 1]}, count]
+                        },
+                        "expires_at": {"$ifNull": ["$expires_at", expires_at]},
+                    }
+                }
+            ],
+            upsert=True,
+            return_document=ReturnDocument.BEFORE,
+            projection={"count": 1},
+        )
+
+    async def _previous_count(self, collection: Any, previous_id: str) -> int:
+        cached = self._closed_windows.get(previous_id)
+        if cached is not None:
+            return cached
+
+        document = await collection.find_one({"_id": previous_id}, {"count": 1})
+        count = int(document["count"]) if document else 0
+        if len(self._closed_windows) >= 10000:
+            self._closed_windows.clear()
+        self._closed_windows[previous_id] = count
+        return count
+
+    def clear(self) -> None:
+        self._closed_windows.clear()
+        self.fallback.clear()
+
+
+class RateLimitMiddleware:
+    """ASGI middleware enforcing per-route rate limit policies.
+
+    ``policies`` maps exact request paths to a policy; other paths under
+    ``default_prefix`` use ``default_policy``, and ``exempt_paths`` are never
+    limited. ``identify_user`` turns the Authorization header into a user id,
+    or None for anonymous requests. Rejected requests get a 429 with a
+    ``Retry-After`` header.
+    """
+
+    def __init__(
+        self,
+        app: Any,
+        *,
+        store: Any,
+        policies: Mapping[str, RateLimitPolicy],
+        identify_user: Callable[[str], Optional[str]],
+        default_policy: Optional[RateLimitPolicy] = None,
+        default_prefix: str = "/api/",
+        exempt_paths: Tuple[str, ...] = (),
+        trust_forwarded_for: bool = False,
+    ) -> None:
+        self.app = app
+        self.store = store
+        self.policies = dict(policies)
+        self.identify_user = identify_user
+        self.default_policy = default_policy
+        self.default_prefix = default_prefix
+        self.exempt_paths = frozenset(exempt_paths)
+        self.trust_forwarded_for = trust_forwarded_for
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        policy = self._policy_for(scope["path"])
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+
+        decision = await self.store.hit(policy, self._client_key(scope, policy))
+        if not decision.allowed:
+            await self._reject(send, decision)
+            return
+
+        limit_headers = [
+            (b"x-ratelimit-limit", str(decision.limit).encode()),
+            (b"x-ratelimit-remaining", str(decision.remaining).encode()),
+        ]
+
+        async def send_with_headers(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + limit_headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+    def _policy_for(self, path: str) -> Optional[RateLimitPolicy]:
+        policy = self.policies.get(path)
+        if policy is not None:
+            return policy
+        if path in self.exempt_paths or not path.startswith(self.default_prefix):
+            return None
+        return self.default_policy
+
+    def _client_key(self, scope: Dict[str, Any], policy: RateLimitPolicy) -> str:
+        headers = dict(scope.get("headers") or [])
+        if policy.key == "user":
+            authorization = headers.get(b"authorization")
+            if authorization:
+                user_id = self.identify_user(authorization.decode("latin-1"))
+                if user_id:
+                    return f"user:{user_id}"
+
+        forwarded = headers.get(b"x-forwarded-for") if self.trust_forwarded_for else None
+        if forwarded:
+            # The right-most entry was added by our own proxy and cannot be spoofed.
+            return "ip:" + forwarded.decode("latin-1").split(",")[-1].strip()
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    async def _reject(self, send: Any, decision: RateLimitDecision) -> None:
+        body = json.dumps(
+            {
+                "detail": "Rate limit exceeded. Try again in "
+                f"{decision.retry_after_seconds} second(s)."
+            }
+        ).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(decision.retry_after_seconds).encode()),
+                    (b"x-ratelimit-limit", str(decision.limit).encode()),
+                    (b"x-ratelimit-remaining", b"0"),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
@@ -1,12 +1,32 @@
 from __future__ import annotations
 
-from datetime import datetime, timezone
+import base64
+import binascii
+import copy
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+import hashlib
+import json
 import logging
 from typing import Any, Dict, List, Optional
-
-from pymongo import ReturnDocument
-
+from urllib.parse import quote, unquote
+import zlib
+
+from bson import Binary, ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import (
+    BulkWriteError,
+    DuplicateKeyError,
+    OperationFailure,
+    PyMongoError,
+)
+
+from backend.caching import TTLCache
+from backend.metrics import CREDIT_OPERATIONS, instrument_repository
+from backend.tracing import traced
 from backend.services.analysis import severity_label_to_score
+from backend.write_behind import WriteBehindQueue
 
 
 logger = logging.getLogger(__name__)
@@ -21,14 +41,336 @@ def to_iso(dt: Optional[datetime] = None) -> str:
     return value.astimezone(timezone.utc).isoformat()
 
 
+def bson_utc_now() -> datetime:
+    """Current UTC time truncated to the millisecond precision of BSON dates."""
+    value = utc_now()
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+
+def parse_timestamp(value: Any) -> Optional[datetime]:
+    """Read a stored timestamp (BSON date or legacy ISO string) as aware UTC."""
+    if isinstance(value, datetime):
+        parsed = value
+    elif isinstance(value, str) and value.strip():
+        try:
+            parsed = datetime.fromisoformat(value.strip())
+        except ValueError:
+            return None
+    else:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def start_of_day(value: datetime) -> datetime:
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def day_key(value: Any) -> Optional[str]:
+    """UTC calendar day (``YYYY-MM-DD``) of a stored timestamp, if it parses."""
+    parsed = parse_timestamp(value)
+    return parsed.date().isoformat() if parsed is not None else None
+
+
+def format_timestamp(value: Any) -> str:
+    """Render a stored timestamp as an ISO 8601 string for API responses."""
+    if isinstance(value, datetime):
+        return to_iso(parse_timestamp(value))
+    return str(value or "")
+
+
+def summarize_text(text: str, limit: int = 180) -> str:
+    return text[:limit] + ("..." if len(text) > limit else "")
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+class InvalidTimeframeError(ValueError):
+    """Raised when a pattern-analysis timeframe cannot be resolved."""
+
+
+# Rolling windows accepted by pattern analysis, in days.
+TIMEFRAME_DAYS = {"week": 7, "month": 30, "quarter": 91, "year": 365}
+
+
+def resolve_timeframe(
+    timeframe: str,
+    *,
+    start: Any = None,
+    end: Any = None,
+    now: Optional[datetime] = None,
+) -> tuple[datetime, datetime]:
+    """Turn a timeframe name into a half-open ``[since, until)`` UTC range.
+
+    Named windows start at UTC midnight, so they line up with the daily
+    buckets of the stats document. ``custom`` requires ``start`` and accepts an
+    optional ``end`` (default now).
+    """
+    until = now or utc_now()
+    if timeframe in TIMEFRAME_DAYS:
+        since = (until - timedelta(days=TIMEFRAME_DAYS[timeframe])).astimezone(timezone.utc)
+        return start_of_day(since), until
+
+    if timeframe != "custom":
+        raise InvalidTimeframeError(
+            "Timeframe must be one of week, month, quarter, year or custom."
+        )
+
+    since = parse_timestamp(start)
+    if since is None:
+        raise InvalidTimeframeError("A custom timeframe requires an ISO 8601 start.")
+    if end is not None:
+        parsed_end = parse_timestamp(end)
+        if parsed_end is None:
+            raise InvalidTimeframeError("Custom timeframe end must be ISO 8601.")
+        until = parsed_end
+    if since >= until:
+        raise InvalidTimeframeError("Custom timeframe start must be before its end.")
+    return since, until
+
+
+def encode_history_cursor(item: Dict[str, Any]) -> str:
+    document_id = item.get("_id")
+    created_at = item.get("created_at", "")
+    payload = {
+        "c": format_timestamp(created_at),
+        "d": isinstance(created_at, datetime),
+        "i": str(document_id),
+        "o": isinstance(document_id, ObjectId),
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_history_cursor(cursor: str) -> tuple[Any, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        document_id = ObjectId(payload["i"]) if payload["o"] else payload["i"]
+        created_at = payload["c"]
+        if payload.get("d"):
+            created_at = parse_timestamp(created_at)
+            if created_at is None:
+                raise ValueError("Invalid cursor timestamp.")
+        return created_at, document_id
+    except (binascii.Error, UnicodeError, ValueError, KeyError, TypeError, InvalidId) as exc:
+        raise InvalidCursorError("Invalid history cursor.") from exc
+
+
+PAYLOAD_LAYOUT_SPLIT = "split-v1"
+
+# Server error code returned when transactions are used against a standalone.
+ILLEGAL_OPERATION = 20
+
+# Report sections that are moved out of the per-analysis index document into
+# the content-addressed payload store. Small fields needed by list views
+# (risk assessment, summary, timestamp) stay inline.
+STORED_PAYLOAD_SECTIONS = (
+    "symptom_analysis",
+    "ai_web_research",
+    "diet_plan",
+    "possible_causes",
+    "lifestyle_suggestions",
+    "red_flags",
+    "ai_insights",
+    "personalized_tips",
+    "medical_disclaimer",
+)
+
+# List views never need the bulky parts of legacy inline documents.
+ANALYSIS_LIST_PROJECTION = {
+    "request_payload": 0,
+    **{
+        f"response_payload.{section}": 0
+        for section in STORED_PAYLOAD_SECTIONS
+        if section != "symptom_analysis"
+    },
+}
+
+
+# Number of most recent analyses considered by dashboards and pattern analysis,
+# and therefore kept in each user's stats document.
+ANALYSIS_WINDOW = 50
+DASHBOARD_TREND_WINDOW = 14
+
+# Stats documents written with another layout are rebuilt on their next read.
+STATS_LAYOUT = "daily-v1"
+
+
 class AnalysisPersistenceError(RuntimeError):
     """Raised when credit charging and analysis persistence cannot be reconciled."""
 
 
+def _transaction_failure_message(exc: PyMongoError) -> str:
+    if exc.has_error_label("UnknownTransactionCommitResult"):
+        # The commit may have been applied even though it was never acknowledged.
+        return (
+            "Analysis could not be confirmed as saved. Check your history and "
+            "credits before trying again."
+        )
+    return "Analysis could not be saved. No credit was charged."
+
+
+_SYMPTOM_KEY_EXPR = {"$toLower": {"$trim": {"input": {"$ifNull": ["$symptom", ""]}}}}
+_SEVERITY_EXPR = {"$ifNull": ["$severity_score", 0]}
+
+
+def _symptom_count_stages(limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Top three symptoms, ties broken by the most recently seen."""
+    stages: List[Dict[str, Any]] = [{"$limit": limit}] if limit else []
+    return stages + [
+        {"$project": {"key": _SYMPTOM_KEY_EXPR, "created_at": 1}},
+        {"$match": {"key": {"$ne": ""}}},
+        {
+            "$group": {
+                "_id": "$key",
+                "count": {"$sum": 1},
+                "last_seen": {"$max": "$created_at"},
+            }
+        },
+        {"$sort": {"count": -1, "last_seen": -1}},
+        {"$limit": 3},
+    ]
+
+
+def _severity_stat_stages(limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    stages: List[Dict[str, Any]] = [{"$limit": limit}] if limit else []
+    return stages + [
+        {
+            "$group": {
+                "_id": None,
+                "count": {"$sum": 1},
+                "severity_avg": {"$avg": _SEVERITY_EXPR},
+            }
+        },
+    ]
+
+
+@dataclass
+class CreditLease:
+    """A credit held for one in-flight analysis until it is committed or released."""
+
+    lease_id: str
+    user_id: str
+    credits_before: int
+    credits_after: int
+    expires_at: datetime
+
+
+@dataclass
+class PendingAnalysis:
+    """An analysis whose credit is charged but whose documents are not yet written."""
+
+    document: Dict[str, Any]
+    sections: Optional[Dict[str, Any]] = None
+
+
+@instrument_repository
+class AnalysisPayloadStore:
+    """Compressed, content-addressed storage for bulky report sections.
+
+    Each section is serialized canonically and stored once under its SHA-256
+    digest, so identical rule-engine output and research digests are shared
+    between analyses.
+    """
+
+    encoding = "zlib+json"
+
+    def __init__(self, collection: Any, compression_level: int = 6) -> None:
+        self.collection = collection
+        self.compression_level = compression_level
+
+    @staticmethod
+    def encode_section(value: Any) -> tuple[str, bytes]:
+        raw = json.dumps(
+            value,
+            sort_keys=True,
+            separators=(",", ":"),
+            ensure_ascii=False,
+        ).encode("utf-8")
+        return hashlib.sha256(raw).hexdigest(), raw
+
+    async def put_sections(self, sections: Dict[str, Any]) -> Dict[str, str]:
+        return (await self.put_many([sections]))[0]
+
+    async def put_many(self, section_sets: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """Store several analyses' sections with a single bulk upsert."""
+        all_refs: List[Dict[str, str]] = []
+        operations: Dict[str, UpdateOne] = {}
+
+        for sections in section_sets:
+            refs: Dict[str, str] = {}
+            for name, value in sections.items():
+                digest, raw = self.encode_section(value)
+                refs[name] = digest
+                if digest in operations:
+                    continue
+
+                compressed = zlib.compress(raw, self.compression_level)
+                operations[digest] = UpdateOne(
+                    {"_id": digest},
+                    {
+                        "$setOnInsert": {
+                            "encoding": self.encoding,
+                            "data": Binary(compressed),
+                            "raw_size": len(raw),
+                            "stored_size": len(compressed),
+                            "created_at": to_iso(),
+                        }
+                    },
+                    upsert=True,
+                )
+            all_refs.append(refs)
+
+        if operations:
+            try:
+                await self.collection.bulk_write(
+                    list(operations.values()),
+                    ordered=False,
+                )
+            except BulkWriteError as exc:
+                # Concurrent writers storing the same digest race on _id; the
+                # content is identical, so only non-duplicate errors matter.
+                errors = exc.details.get("writeErrors", [])
+                if any(error.get("code") != 11000 for error in errors):
+                    raise
+
+        return all_refs
+
+    async def load_sections(self, refs: Dict[str, str]) -> Dict[str, Any]:
+        digests = sorted(set(refs.values()))
+        if not digests:
+            return {}
+
+        cursor = self.collection.find({"_id": {"$in": digests}})
+        blobs = {
+            item["_id"]: item for item in await cursor.to_list(length=len(digests))
+        }
+
+        sections: Dict[str, Any] = {}
+        for name, digest in refs.items():
+            blob = blobs.get(digest)
+            if blob is None:
+                logger.warning("Analysis payload section %s (%s) is missing", name, digest)
+                continue
+            sections[name] = json.loads(zlib.decompress(bytes(blob["data"])))
+        return sections
+
+
+@instrument_repository
 class UserRepository:
-    def __init__(self, collection: Any, initial_credits: int = 5) -> None:
+    def __init__(
+        self,
+        collection: Any,
+        initial_credits: int = 5,
+        cache: Optional[TTLCache[Dict[str, Any]]] = None,
+    ) -> None:
         self.collection = collection
         self.initial_credits = initial_credits
+        self.cache = cache
 
     async def create_indexes(self) -> None:
         await self.collection.create_index("user_id", unique=True)
@@ -36,8 +378,56 @@ class UserRepository:
         await self.collection.create_index("email", unique=True)
         await self.collection.create_index("created_at")
 
-    async def get_by_user_id(self, user_id: str) -> Optional[Dict[str, Any]]:
-        return await self.collection.find_one({"user_id": user_id})
+    async def get_by_user_id(
+        self,
+        user_id: str,
+        *,
+        fresh: bool = True,
+    ) -> Optional[Dict[str, Any]]:
+        """Load a user, optionally from the per-process cache.
+
+        Pass ``fresh=False`` when slightly stale credit counters are acceptable
+        (identity checks); this process's own writes keep the cache current.
+        """
+        if not fresh and self.cache is not None:
+            cached = self.cache.get(user_id)
+            if cached is not None:
+                return dict(cached)
+
+        user = await self.collection.find_one({"user_id": user_id})
+        self._remember(user)
+        return user
+
+    async def get_data_version(self, user_id: str) -> Optional[int]:
+        """Read ``data_version`` from MongoDB, bypassing the per-process cache.
+
+        The cached document can lag writes made through other workers, so
+        anything that decides freshness from the version must use this.
+        """
+        user = await self.collection.find_one({"user_id": user_id}, {"data_version": 1})
+        return int(user.get("data_version", 0)) if user else None
+
+    def _remember(self, user: Optional[Dict[str, Any]]) -> None:
+        if self.cache is not None and user is not None and user.get("user_id"):
+            self.cache.set(str(user["user_id"]), dict(user))
+
+    def _forget(self, user_id: str) -> None:
+        if self.cache is not None:
+            self.cache.pop(user_id)
+
+    async def bump_data_version(self, *user_ids: str) -> None:
+        """Mark the users' history and dashboard as changed.
+
+        ``data_version`` is also incremented by every credit update; the API
+        derives ETags from it, so any change makes cached copies revalidate.
+        """
+        if not user_ids:
+            return
+        await self.collection.update_many(
+            {"user_id": {"$in": list(user_ids)}}, {"$inc": {"data_version": 1}}
+        )
+        for user_id in user_ids:
+            self._forget(user_id)
 
     async def get_by_google_sub(self, google_sub: str) -> Optional[Dict[str, Any]]:
         return await self.collection.find_one({"google_sub": google_sub})
@@ -55,49 +445,17 @@ class UserRepository:
         given_name: str = "",
         family_name: str = "",
     ) -> Dict[str, Any]:
+        """Create or refresh a Google account in one atomic upsert.
+
+        Credits and ``created_at`` are only written when the document is
+        inserted. A duplicate-key error means either a concurrent first login
+        for the same account (the retry then matches it) or an existing
+        account holding this email under another Google subject, which is
+        relinked as before.
+        """
         normalized_email = email.lower().strip()
         now_iso = to_iso()
-
-        existing = await self.collection.find_one(
-            {
-                "$or": [
-                    {"google_sub": google_sub},
-                    {"email": normalized_email},
-                ]
-            }
-        )
-
-        if existing:
-            credits_total = int(existing.get("credits_total", self.initial_credits))
-            credits_remaining = int(
-                existing.get("credits_remaining", credits_total)
-            )
-            await self.collection.update_one(
-                {"_id": existing["_id"]},
-                {
-                    "$set": {
-                        "user_id": google_sub,
-                        "google_sub": google_sub,
-                        "email": normalized_email,
-                        "name": name,
-                        "given_name": given_name,
-                        "family_name": family_name,
-                        "picture": picture,
-                        "provider": "google",
-                        "credits_total": credits_total,
-                        "credits_remaining": credits_remaining,
-                        "updated_at": now_iso,
-                        "last_login_at": now_iso,
-                        "is_active": True,
-                    },
-                },
-            )
-            refreshed = await self.collection.find_one({"_id": existing["_id"]})
-            if refreshed is None:
-                raise ValueError("Failed to reload updated user.")
-            return refreshed
-
-        user_doc = {
+        profile = {
             "user_id": google_sub,
             "google_sub": google_sub,
             "email": normalized_email,
@@ -106,21 +464,72 @@ class UserRepository:
             "family_name": family_name,
             "picture": picture,
             "provider": "google",
-            "credits_total": self.initial_credits,
-            "credits_remaining": self.initial_credits,
-            "created_at": now_iso,
             "updated_at": now_iso,
             "last_login_at": now_iso,
             "is_active": True,
         }
-        await self.collection.insert_one(user_doc)
-        return user_doc
+
+        for _ in range(2):
+            try:
+                user = await self.collection.find_one_and_update(
+                    {"google_sub": google_sub},
+                    {
+                        "$set": profile,
+                        "$inc": {"data_version": 1},
+                        "$setOnInsert": {
+                            "credits_total": self.initial_credits,
+                            "credits_remaining": self.initial_credits,
+                            "created_at": now_iso,
+                        },
+                    },
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER,
+                )
+            except DuplicateKeyError:
+                existing = await self.collection.find_one(
+                    {"email": normalized_email}, {"google_sub": 1}
+                )
+                if existing is not None and existing.get("google_sub") != google_sub:
+                    return await self._relink_google_user(normalized_email, profile)
+                continue
+
+            self._remember(user)
+            return user
+
+        raise ValueError("Failed to create or update user.")
+
+    async def _relink_google_user(
+        self,
+        email: str,
+        profile: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        previous = await self.collection.find_one_and_update(
+            {"email": email},
+            {"$set": profile, "$inc": {"data_version": 1}},
+            return_document=ReturnDocument.BEFORE,
+        )
+        if previous is None:
+            raise ValueError("Failed to reload updated user.")
+        if previous.get("user_id") != profile["user_id"]:
+            self._forget(str(previous.get("user_id", "")))
+        user = {
+            **previous,
+            **profile,
+            "data_version": int(previous.get("data_version", 0)) + 1,
+        }
+        self._remember(user)
+        return user
 
     async def decrement_credit(self, user_id: str) -> Dict[str, Any]:
         updated_user, _, _ = await self.consume_credit(user_id)
         return updated_user
 
-    async def consume_credit(self, user_id: str) -> tuple[Dict[str, Any], int, int]:
+    async def consume_credit(
+        self,
+        user_id: str,
+        *,
+        session: Any = None,
+    ) -> tuple[Dict[str, Any], int, int]:
         updated_at = to_iso()
         updated_user = await self.collection.find_one_and_update(
             {
@@ -128,22 +537,143 @@ class UserRepository:
                 "credits_remaining": {"$gt": 0},
             },
             {
-                "$inc": {"credits_remaining": -1},
+                "$inc": {"credits_remaining": -1, "data_version": 1},
                 "$set": {"updated_at": updated_at},
             },
             return_document=ReturnDocument.AFTER,
+            session=session,
         )
 
         if updated_user is None:
-            existing_user = await self.get_by_user_id(user_id)
+            existing_user = await self.collection.find_one(
+                {"user_id": user_id}, session=session
+            )
             if not existing_user:
                 raise ValueError("User not found")
+            self._remember(existing_user)
+            CREDIT_OPERATIONS.labels("no_credits").inc()
             raise ValueError("No credits remaining")
 
+        CREDIT_OPERATIONS.labels("charged").inc()
+        if session is None:
+            self._remember(updated_user)
+        else:
+            # Not visible to others until the transaction commits.
+            self._forget(user_id)
+
         credits_after = int(updated_user.get("credits_remaining", 0))
         credits_before = credits_after + 1
         return updated_user, credits_before, credits_after
 
+    async def reserve_credit(self, user_id: str, *, ttl_seconds: float) -> CreditLease:
+        """Hold one credit for an analysis that has not run yet.
+
+        The credit leaves ``credits_remaining`` immediately, so concurrent
+        requests cannot reserve more credits than the user has. The lease must
+        be committed or released; otherwise it is reclaimed once it expires.
+        """
+        for _ in range(2):
+            lease_id = str(ObjectId())
+            expires_at = bson_utc_now() + timedelta(seconds=ttl_seconds)
+            updated_user = await self.collection.find_one_and_update(
+                {"user_id": user_id, "credits_remaining": {"$gt": 0}},
+                {
+                    "$inc": {"credits_remaining": -1, "data_version": 1},
+                    "$push": {
+                        "credit_leases": {"lease_id": lease_id, "expires_at": expires_at}
+                    },
+                    "$set": {"updated_at": to_iso()},
+                },
+                return_document=ReturnDocument.AFTER,
+            )
+            if updated_user is not None:
+                self._remember(updated_user)
+                CREDIT_OPERATIONS.labels("reserved").inc()
+                credits_after = int(updated_user.get("credits_remaining", 0))
+                return CreditLease(
+                    lease_id=lease_id,
+                    user_id=user_id,
+                    credits_before=credits_after + 1,
+                    credits_after=credits_after,
+                    expires_at=expires_at,
+                )
+            if not await self.reclaim_expired_leases(user_id):
+                break
+
+        existing_user = await self.collection.find_one({"user_id": user_id})
+        if not existing_user:
+            raise ValueError("User not found")
+        self._remember(existing_user)
+        CREDIT_OPERATIONS.labels("no_credits").inc()
+        raise ValueError("No credits remaining")
+
+    async def commit_credit_lease(
+        self,
+        user_id: str,
+        lease_id: str,
+        *,
+        session: Any = None,
+    ) -> tuple[Dict[str, Any], int, int]:
+        """Turn a reservation into a charge; returns the same shape as consume_credit."""
+        updated_user = await self.collection.find_one_and_update(
+            {"user_id": user_id, "credit_leases.lease_id": lease_id},
+            {
+                "$pull": {"credit_leases": {"lease_id": lease_id}},
+                "$inc": {"data_version": 1},
+                "$set": {"updated_at": to_iso()},
+            },
+            return_document=ReturnDocument.AFTER,
+            session=session,
+        )
+        if updated_user is None:
+            # The lease expired and its credit was reclaimed; charge afresh.
+            logger.warning(
+                "Credit lease %s for user %s expired before commit", lease_id, user_id
+            )
+            CREDIT_OPERATIONS.labels("lease_expired").inc()
+            return await self.consume_credit(user_id, session=session)
+
+        CREDIT_OPERATIONS.labels("charged").inc()
+        if session is None:
+            self._remember(updated_user)
+        else:
+            self._forget(user_id)
+
+        credits_after = int(updated_user.get("credits_remaining", 0))
+        return updated_user, credits_after + 1, credits_after
+
+    async def release_credit_lease(self, user_id: str, lease_id: str) -> bool:
+        """Return a reserved credit. Safe to call after a commit or a reclaim."""
+        updated_user = await self.collection.find_one_and_update(
+            {"user_id": user_id, "credit_leases.lease_id": lease_id},
+            {
+                "$pull": {"credit_leases": {"lease_id": lease_id}},
+                "$inc": {"credits_remaining": 1, "data_version": 1},
+                "$set": {"updated_at": to_iso()},
+            },
+            return_document=ReturnDocument.AFTER,
+        )
+        if updated_user is None:
+            return False
+        self._remember(updated_user)
+        CREDIT_OPERATIONS.labels("released").inc()
+        return True
+
+    async def reclaim_expired_leases(self, user_id: str) -> int:
+        user = await self.collection.find_one({"user_id": user_id}, {"credit_leases": 1})
+        now = utc_now()
+        reclaimed = 0
+        for lease in (user or {}).get("credit_leases", []):
+            expires_at = parse_timestamp(lease.get("expires_at"))
+            if expires_at is not None and expires_at <= now:
+                if await self.release_credit_lease(user_id, str(lease["lease_id"])):
+                    reclaimed += 1
+        if reclaimed:
+            logger.info(
+                "Reclaimed %s expired credit lease(s) for user %s", reclaimed, user_id
+            )
+        return reclaimed
+
     async def restore_credit(
         self,
         user_id: str,
@@ -157,12 +687,17 @@ class UserRepository:
         updated_user = await self.collection.find_one_and_update(
             filter_query,
             {
-                "$inc": {"credits_remaining": 1},
+                "$inc": {"credits_remaining": 1, "data_version": 1},
                 "$set": {"updated_at": to_iso()},
             },
             return_document=ReturnDocument.AFTER,
         )
-        return updated_user is not None
+        if updated_user is None:
+            self._forget(user_id)
+            return False
+        self._remember(updated_user)
+        CREDIT_OPERATIONS.labels("refunded").inc()
+        return True
 
     async def get_credit_summary(self, user_id: str) -> Dict[str, Any]:
         user = await self.get_by_user_id(user_id)
@@ -186,14 +721,245 @@ class UserRepository:
         }
 
 
+@instrument_repository
+class AnalysisStatsRepository:
+    """Per-user aggregates maintained incrementally on every analysis write.
+
+    Each document holds running totals over the whole history
+    (``analysis_count``, ``severity_sum`` and ``symptom_frequency``), the same
+    totals per UTC day under ``daily`` for windowed pattern reads, and the last
+    ``ANALYSIS_WINDOW`` analyses in compact form for trend lists. Recording an
+    analysis is a single ``$inc``/``$push`` update.
+    """
+
+    def __init__(self, collection: Any, window: int = ANALYSIS_WINDOW) -> None:
+        self.collection = collection
+        self.window = window
+
+    @staticmethod
+    def frequency_field(symptom_key: str) -> str:
+        # Field names cannot contain "." or start with "$".
+        return quote(symptom_key, safe=" ").replace(".", "%2E")
+
+    @staticmethod
+    def symptom_from_field(field: str) -> str:
+        return unquote(field)
+
+    @staticmethod
+    def entry_from_analysis(document: Dict[str, Any]) -> Dict[str, Any]:
+        summary = document.get("summary")
+        if not summary:
+            text = str(
+                document.get("response_payload", {}).get("symptom_analysis", "")
+            ).strip()
+            summary = summarize_text(text) if text else "No summary available."
+
+        return {
+            "analysis_id": str(document.get("_id", "")),
+            "symptom": str(document.get("symptom", "")).strip(),
+            "severity_score": int(document.get("severity_score", 0)),
+            "severity_label": document.get("severity_label", ""),
+            "duration": document.get("duration", ""),
+            "created_at": document.get("created_at", ""),
+            "summary": summary,
+        }
+
+    async def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"_id": user_id})
+
+    async def record(self, document: Dict[str, Any], *, session: Any = None) -> None:
+        # Only existing aggregates are updated incrementally. A missing document
+        # (new user, legacy history or an invalidated entry) is regenerated from
+        # history on the next read, which then already includes this analysis.
+        await self.collection.update_one(
+            *self._record_update(document),
+            session=session,
+        )
+
+    async def record_many(self, documents: List[Dict[str, Any]]) -> None:
+        if documents:
+            await self.collection.bulk_write(
+                [UpdateOne(*self._record_update(document)) for document in documents],
+                ordered=True,
+            )
+
+    def _record_update(
+        self, document: Dict[str, Any]
+    ) -> tuple[Dict[str, Any], Dict[str, Any]]:
+        entry = self.entry_from_analysis(document)
+        severity = entry["severity_score"]
+        increments: Dict[str, int] = {"analysis_count": 1, "severity_sum": severity}
+        symptom_key = entry["symptom"].lower()
+        field = self.frequency_field(symptom_key) if symptom_key else None
+        if field:
+            increments[f"symptom_frequency.{field}"] = 1
+
+        # Analyses whose timestamp does not parse only count towards the totals,
+        # as they are left out of every time window.
+        day = day_key(entry["created_at"])
+        if day:
+            increments[f"daily.{day}.count"] = 1
+            increments[f"daily.{day}.severity_sum"] = severity
+            if field:
+                increments[f"daily.{day}.symptoms.{field}"] = 1
+
+        return (
+            # Recording the same analysis twice is a no-op, so a rebuild can
+            # replay analyses that raced with it. Documents in an older layout
+            # are left alone until they are rebuilt.
+            {
+                "_id": document["user_id"],
+                "layout": STATS_LAYOUT,
+                "recent.analysis_id": {"$ne": entry["analysis_id"]},
+            },
+            {
+                "$inc": increments,
+                "$push": {
+                    "recent": {
+                        "$each": [entry],
+                        "$position": 0,
+                        "$slice": self.window,
+                    }
+                },
+                "$set": {"updated_at": to_iso()},
+            },
+        )
+
+    async def invalidate(self, user_id: str) -> None:
+        await self.collection.delete_many({"_id": user_id})
+
+    async def rebuild(self, user_id: str, analyses_collection: Any) -> Dict[str, Any]:
+        """Regenerate a user's aggregates from their raw analysis history.
+
+        The totals are grouped by day and symptom on the server, so only one
+        row per (day, symptom) and the latest ``window + 1`` analyses are read.
+        """
+        cursor = analyses_collection.aggregate(self.rebuild_pipeline(user_id))
+        results = await cursor.to_list(length=1)
+        snapshot = results[0] if results else {}
+        documents = snapshot.get("latest", [])
+
+        stats: Dict[str, Any] = {
+            "_id": user_id,
+            "layout": STATS_LAYOUT,
+            "analysis_count": 0,
+            "severity_sum": 0,
+            "symptom_frequency": {},
+            "daily": {},
+            "recent": [self.entry_from_analysis(document) for document in documents][
+                : self.window
+            ],
+        }
+        for group in snapshot.get("totals", []):
+            key = group["_id"]
+            count = int(group.get("count", 0))
+            severity = int(group.get("severity_sum") or 0)
+            field = self.frequency_field(key["symptom"]) if key.get("symptom") else None
+            stats["analysis_count"] += count
+            stats["severity_sum"] += severity
+            if field:
+                frequency = stats["symptom_frequency"]
+                frequency[field] = frequency.get(field, 0) + count
+            if key.get("day"):
+                bucket = stats["daily"].setdefault(key["day"], {})
+                bucket["count"] = bucket.get("count", 0) + count
+                bucket["severity_sum"] = bucket.get("severity_sum", 0) + severity
+                if field:
+                    bucket.setdefault("symptoms", {})[field] = count
+        stats["updated_at"] = to_iso()
+        await self.collection.replace_one({"_id": user_id}, stats, upsert=True)
+
+        # An analysis stored after the read above may have been recorded into
+        # the old document, which the replace just overwrote. Replay anything
+        # newer than the snapshot; record() skips analyses already present.
+        included = {str(document.get("_id", "")) for document in documents}
+        missed = [
+            document
+            for document in await self._latest(user_id, analyses_collection)
+            if str(document.get("_id", "")) not in included
+        ]
+        for document in reversed(missed):
+            await self.record(document)
+        return stats
+
+    def rebuild_pipeline(self, user_id: str) -> List[Dict[str, Any]]:
+        # Both facets see the same input documents, so the totals and the
+        # latest analyses describe one snapshot of the history.
+        created_at = {
+            "$convert": {
+                "input": "$created_at",
+                "to": "date",
+                "onError": None,
+                "onNull": None,
+            }
+        }
+        return [
+            {"$match": {"user_id": user_id}},
+            # Ties are broken like the history pages, newest _id first, so
+            # the replayed order matches the order analyses were recorded in.
+            {"$sort": {"created_at": -1, "_id": -1}},
+            {"$project": ANALYSIS_LIST_PROJECTION},
+            {
+                "$facet": {
+                    "latest": [{"$limit": self.window + 1}],
+                    "totals": [
+                        {
+                            "$group": {
+                                "_id": {
+                                    "day": {
+                                        "$dateToString": {
+                                            "format": "%Y-%m-%d",
+                                            "date": created_at,
+                                        }
+                                    },
+                                    "symptom": _SYMPTOM_KEY_EXPR,
+                                },
+                                "count": {"$sum": 1},
+                                "severity_sum": {"$sum": _SEVERITY_EXPR},
+                            }
+                        }
+                    ],
+                }
+            },
+        ]
+
+    async def _latest(self, user_id: str, analyses_collection: Any) -> List[Dict[str, Any]]:
+        return (
+            await analyses_collection.find({"user_id": user_id}, ANALYSIS_LIST_PROJECTION)
+            .sort([("created_at", -1), ("_id", -1)])
+            .limit(self.window + 1)
+            .to_list(length=None)
+        )
+
+
+@instrument_repository
 class AnalysisRepository:
-    def __init__(self, collection: Any) -> None:
+    def __init__(
+        self,
+        collection: Any,
+        payload_store: Optional[AnalysisPayloadStore] = None,
+        stats: Optional[AnalysisStatsRepository] = None,
+        client: Any = None,
+        use_transactions: bool = False,
+        write_behind: Optional[WriteBehindQueue[PendingAnalysis]] = None,
+        view_cache: Optional[TTLCache[Dict[str, Any]]] = None,
+    ) -> None:
         self.collection = collection
+        self.payload_store = payload_store
+        self.stats = stats
+        self.client = client
+        self.use_transactions = use_transactions and client is not None
+        self.write_behind = write_behind
+        # Rendered dashboards and named-timeframe patterns, keyed per user.
+        self.view_cache = view_cache
 
     async def create_indexes(self) -> None:
         await self.collection.create_index("user_id")
         await self.collection.create_index("created_at")
         await self.collection.create_index([("user_id", 1), ("created_at", -1)])
+        await self.collection.create_index(
+            [("user_id", 1), ("created_at", -1), ("_id", -1)]
+        )
 
     async def create_analysis(
         self,
@@ -204,7 +970,7 @@ class AnalysisRepository:
         credits_before: Optional[int] = None,
         credits_after: Optional[int] = None,
     ) -> Dict[str, Any]:
-        document = self._build_analysis_document(
+        document = await self._prepare_analysis_document(
             user_id=user_id,
             request_payload=request_payload,
             response_payload=response_payload,
@@ -217,6 +983,7 @@ class AnalysisRepository:
             raise ValueError("Failed to persist analysis.")
         return created
 
+    @traced("analysis_store")
     async def create_analysis_with_credit_charge(
         self,
         *,
@@ -224,13 +991,48 @@ class AnalysisRepository:
         user_id: str,
         request_payload: Dict[str, Any],
         response_payload: Dict[str, Any],
+        lease_id: Optional[str] = None,
     ) -> Dict[str, Any]:
-        updated_user, credits_before, credits_after = await user_repository.consume_credit(
-            user_id
+        """Persist an analysis and charge one credit for it.
+
+        With ``lease_id`` the charge commits a credit reserved earlier through
+        ``UserRepository.reserve_credit`` instead of consuming a new one.
+        """
+        if self.write_behind is not None:
+            return await self._create_analysis_write_behind(
+                user_repository=user_repository,
+                user_id=user_id,
+                request_payload=request_payload,
+                response_payload=response_payload,
+                lease_id=lease_id,
+            )
+
+        if self.use_transactions:
+            try:
+                return await self._create_analysis_in_transaction(
+                    user_repository=user_repository,
+                    user_id=user_id,
+                    request_payload=request_payload,
+                    response_payload=response_payload,
+                    lease_id=lease_id,
+                )
+            except OperationFailure as exc:
+                if exc.code != ILLEGAL_OPERATION:
+                    raise AnalysisPersistenceError(_transaction_failure_message(exc)) from exc
+                # Standalone servers reject transactions; nothing was written.
+                logger.warning(
+                    "MongoDB does not support transactions; using compensation path"
+                )
+                self.use_transactions = False
+            except PyMongoError as exc:
+                raise AnalysisPersistenceError(_transaction_failure_message(exc)) from exc
+
+        _, credits_before, credits_after = await self._charge_credit(
+            user_repository, user_id, lease_id
         )
 
         try:
-            return await self.create_analysis(
+            created = await self.create_analysis(
                 user_id=user_id,
                 request_payload=request_payload,
                 response_payload=response_payload,
@@ -238,23 +1040,265 @@ class AnalysisRepository:
                 credits_after=credits_after,
             )
         except Exception as exc:
-            rollback_success = await user_repository.restore_credit(
+            await self._restore_after_failed_persist(
+                user_repository, user_id, credits_after, exc
+            )
+
+        await self._record_stats(created)
+        # The charge bumped the version before the analysis existed; a page
+        # fetched in between must not stay current.
+        await user_repository.bump_data_version(user_id)
+        return created
+
+    @staticmethod
+    async def _charge_credit(
+        user_repository: UserRepository,
+        user_id: str,
+        lease_id: Optional[str],
+        *,
+        session: Any = None,
+    ) -> tuple[Dict[str, Any], int, int]:
+        if lease_id is not None:
+            return await user_repository.commit_credit_lease(
+                user_id, lease_id, session=session
+            )
+        return await user_repository.consume_credit(user_id, session=session)
+
+    async def _restore_after_failed_persist(
+        self,
+        user_repository: UserRepository,
+        user_id: str,
+        credits_after: int,
+        exc: BaseException,
+    ) -> None:
+        rollback_success = await user_repository.restore_credit(
+            user_id,
+            expected_credits_remaining=credits_after,
+        )
+        if not rollback_success:
+            logger.exception(
+                "Analysis persistence failed and credit rollback did not reconcile for user %s",
                 user_id,
-                expected_credits_remaining=credits_after,
             )
-            if not rollback_success:
-                logger.exception(
-                    "Analysis persistence failed and credit rollback did not reconcile for user %s",
+            raise AnalysisPersistenceError(
+                "Analysis could not be saved and the credit rollback did not complete. "
+                "Manual account review is required."
+            ) from exc
+
+        raise AnalysisPersistenceError(
+            "Analysis could not be saved, so your credit was restored automatically."
+        ) from exc
+
+    async def _create_analysis_write_behind(
+        self,
+        *,
+        user_repository: UserRepository,
+        user_id: str,
+        request_payload: Dict[str, Any],
+        response_payload: Dict[str, Any],
+        lease_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        assert self.write_behind is not None
+        _, credits_before, credits_after = await self._charge_credit(
+            user_repository, user_id, lease_id
+        )
+
+        document, sections = self._build_stored_document(
+            user_id=user_id,
+            request_payload=request_payload,
+            response_payload=response_payload,
+            credits_before=credits_before,
+            credits_after=credits_after,
+        )
+        # Assigned up front so the id is known before the batch is flushed and
+        # so retried inserts are recognised as duplicates.
+        document["_id"] = ObjectId()
+
+        try:
+            await self.write_behind.submit(PendingAnalysis(document, sections))
+        except Exception as exc:
+            await self._restore_after_failed_persist(
+                user_repository, user_id, credits_after, exc
+            )
+        return document
+
+    async def persist_pending(self, batch: List[PendingAnalysis]) -> None:
+        """Write a batch of queued analyses; safe to call again after a failure."""
+        with_sections = [item for item in batch if item.sections is not None]
+        if self.payload_store is not None and with_sections:
+            all_refs = await self.payload_store.put_many(
+                [item.sections or {} for item in with_sections]
+            )
+            for item, refs in zip(with_sections, all_refs):
+                item.document["payload_refs"] = refs
+
+        documents = [item.document for item in batch]
+        await self._insert_ordered(documents)
+
+        if self.stats is None:
+            return
+        try:
+            await self.stats.record_many(documents)
+        except Exception:
+            logger.exception("Failed to update analysis stats for a write-behind batch")
+            for user_id in {str(document["user_id"]) for document in documents}:
+                try:
+                    await self.stats.invalidate(user_id)
+                except Exception:
+                    logger.exception("Failed to invalidate analysis stats")
+
+    async def compensate_pending(
+        self,
+        batch: List[PendingAnalysis],
+        user_repository: UserRepository,
+    ) -> None:
+        """Refund the credits of queued analyses that could not be written.
+
+        An ordered insert stops at the first failing document, so part of the
+        batch may already be stored; only the analyses that are missing are
+        refunded.
+        """
+        ids = [item.document.get("_id") for item in batch]
+        stored = {
+            document["_id"]
+            for document in await self.collection.find(
+                {"_id": {"$in": ids}}, {"_id": 1}
+            ).to_list(length=None)
+        }
+        for item in batch:
+            user_id = str(item.document.get("user_id", ""))
+            if item.document.get("_id") in stored:
+                logger.warning(
+                    "Write-behind analysis %s for user %s was stored before the batch failed",
+                    item.document.get("_id"),
                     user_id,
                 )
-                raise AnalysisPersistenceError(
-                    "Analysis could not be saved and the credit rollback did not complete. "
-                    "Manual account review is required."
-                ) from exc
+                continue
+            restored = await user_repository.restore_credit(user_id)
+            logger.error(
+                "Dropped write-behind analysis %s for user %s (credit restored: %s)",
+                item.document.get("_id"),
+                user_id,
+                restored,
+            )
 
-            raise AnalysisPersistenceError(
-                "Analysis could not be saved, so your credit was restored automatically."
-            ) from exc
+    async def _insert_ordered(self, documents: List[Dict[str, Any]]) -> None:
+        remaining = documents
+        while remaining:
+            try:
+                await self.collection.insert_many(remaining, ordered=True)
+                return
+            except BulkWriteError as exc:
+                errors = exc.details.get("writeErrors", [])
+                if not errors or errors[0].get("code") != 11000:
+                    raise
+                # Stored by an earlier attempt; continue after it.
+                remaining = remaining[errors[0]["index"] + 1:]
+
+    async def _create_analysis_in_transaction(
+        self,
+        *,
+        user_repository: UserRepository,
+        user_id: str,
+        request_payload: Dict[str, Any],
+        response_payload: Dict[str, Any],
+        lease_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        # Payload sections are content-addressed and idempotent, so they are
+        # written up front and kept out of the transaction's write set.
+        prepared = await self._prepare_analysis_document(
+            user_id=user_id,
+            request_payload=request_payload,
+            response_payload=response_payload,
+            credits_before=None,
+            credits_after=None,
+        )
+
+        async def charge_and_insert(session: Any) -> Dict[str, Any]:
+            _, credits_before, credits_after = await self._charge_credit(
+                user_repository, user_id, lease_id, session=session
+            )
+            document = dict(prepared)
+            document["credits_before"] = credits_before
+            document["credits_after"] = credits_after
+            await self.collection.insert_one(document, session=session)
+            return document
+
+        async with await self.client.start_session() as session:
+            # with_transaction retries TransientTransactionError and
+            # UnknownTransactionCommitResult until the commit is acknowledged.
+            created = await session.with_transaction(charge_and_insert)
+        # Aggregates are derived data: updated after the commit, as on the
+        # compensation path, so a stats failure cannot abort the save.
+        await self._record_stats(created)
+        return created
+
+    async def _record_stats(self, document: Dict[str, Any]) -> None:
+        if self.stats is None:
+            return
+
+        try:
+            await self.stats.record(document)
+        except Exception:
+            # The analysis itself is stored; drop the aggregates so the next
+            # read regenerates them from history instead of serving drift.
+            logger.exception(
+                "Failed to update analysis stats for user %s", document.get("user_id")
+            )
+            try:
+                await self.stats.invalidate(str(document.get("user_id", "")))
+            except Exception:
+                logger.exception("Failed to invalidate analysis stats")
+
+    async def migrate_timestamps(self, batch_size: int = 500) -> Dict[str, Any]:
+        """Convert legacy ISO-string ``created_at`` values to BSON dates.
+
+        Each update is conditional on the original string, so the migration can
+        run against a live collection and be safely re-run.
+        """
+        migrated = 0
+        unparseable = 0
+        user_ids: set[str] = set()
+        batch: List[UpdateOne] = []
+
+        async def flush() -> int:
+            if not batch:
+                return 0
+            result = await self.collection.bulk_write(list(batch), ordered=False)
+            batch.clear()
+            return int(result.modified_count)
+
+        cursor = self.collection.find(
+            {"created_at": {"$type": "string"}},
+            {"created_at": 1, "user_id": 1},
+        )
+        async for document in cursor:
+            parsed = parse_timestamp(document["created_at"])
+            if parsed is None:
+                unparseable += 1
+                continue
+            parsed = parsed.replace(microsecond=parsed.microsecond // 1000 * 1000)
+            batch.append(
+                UpdateOne(
+                    {"_id": document["_id"], "created_at": document["created_at"]},
+                    {"$set": {"created_at": parsed}},
+                )
+            )
+            user_ids.add(str(document.get("user_id", "")))
+            if len(batch) >= batch_size:
+                migrated += await flush()
+        migrated += await flush()
+
+        return {
+            "migrated": migrated,
+            "unparseable": unparseable,
+            "user_ids": sorted(user_ids),
+        }
+
+    async def rebuild_stats(self, user_id: str) -> Optional[Dict[str, Any]]:
+        if self.stats is None:
+            return None
+        return await self.stats.rebuild(user_id, self.collection)
 
     async def list_user_analyses(
         self,
@@ -262,12 +1306,86 @@ class AnalysisRepository:
         limit: int = 20,
     ) -> List[Dict[str, Any]]:
         cursor = (
-            self.collection.find({"user_id": user_id})
+            self.collection.find({"user_id": user_id}, ANALYSIS_LIST_PROJECTION)
             .sort("created_at", -1)
             .limit(limit)
         )
         return await cursor.to_list(length=limit)
 
+    async def list_user_analyses_page(
+        self,
+        user_id: str,
+        *,
+        limit: int,
+        cursor: Optional[str] = None,
+    ) -> tuple[List[Dict[str, Any]], Optional[str]]:
+        """Return one page of history ordered by (created_at, _id) descending.
+
+        Pages are addressed by an opaque keyset cursor instead of an offset, so
+        every page is a bounded range scan on idx_user_created_id.
+        """
+        query: Dict[str, Any] = {"user_id": user_id}
+        if cursor:
+            created_at, document_id = decode_history_cursor(cursor)
+            query["$or"] = [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "_id": {"$lt": document_id}},
+            ]
+            if isinstance(created_at, datetime):
+                # Unmigrated string timestamps sort after every date when
+                # descending, and range operators never compare across types.
+                query["$or"].append({"created_at": {"$type": "string"}})
+
+        documents = await (
+            self.collection.find(query, ANALYSIS_LIST_PROJECTION)
+            .sort([("created_at", -1), ("_id", -1)])
+            .limit(limit + 1)
+            .to_list(length=limit + 1)
+        )
+
+        next_cursor = None
+        if len(documents) > limit:
+            documents = documents[:limit]
+            next_cursor = encode_history_cursor(documents[-1])
+        return documents, next_cursor
+
+    async def get_user_analysis(
+        self,
+        user_id: str,
+        analysis_id: str,
+    ) -> Optional[Dict[str, Any]]:
+        """Load a single analysis with its full report hydrated."""
+        try:
+            object_id = ObjectId(analysis_id)
+        except (InvalidId, TypeError):
+            return None
+
+        item = await self.collection.find_one({"_id": object_id, "user_id": user_id})
+        if item is None:
+            return None
+
+        if item.get("payload_layout") == PAYLOAD_LAYOUT_SPLIT:
+            sections: Dict[str, Any] = {}
+            if self.payload_store is not None:
+                sections = await self.payload_store.load_sections(
+                    dict(item.get("payload_refs", {}))
+                )
+            item["response_payload"] = {
+                **sections,
+                "risk_assessment": item.get("risk_assessment", {}),
+                "search_timestamp": item.get("search_timestamp", ""),
+            }
+            item["request_payload"] = {
+                "symptom": item.get("symptom", ""),
+                "duration": item.get("duration", ""),
+                "severity": item.get("severity_label", ""),
+                "additional_info": item.get("additional_info", ""),
+                "age": item.get("age"),
+                "gender": item.get("gender", ""),
+                "medical_history": item.get("medical_history", ""),
+            }
+        return item
+
     async def get_recent_symptoms(
         self,
         user_id: str,
@@ -280,15 +1398,45 @@ class AnalysisRepository:
                 "severity": item.get("severity_label", ""),
                 "severity_score": item.get("severity_score", 0),
                 "duration": item.get("duration", ""),
-                "timestamp": item.get("created_at", ""),
+                "timestamp": format_timestamp(item.get("created_at")),
             }
             for item in analyses
         ]
 
-    async def build_dashboard(self, user_id: str) -> Dict[str, Any]:
-        analyses = await self.list_user_analyses(user_id, limit=50)
-
-        if not analyses:
+    def _cached_view(self, key: Optional[tuple]) -> Optional[Dict[str, Any]]:
+        if self.view_cache is None or key is None:
+            return None
+        cached = self.view_cache.get(key)
+        return copy.deepcopy(cached) if cached is not None else None
+
+    def _remember_view(self, key: Optional[tuple], view: Dict[str, Any]) -> None:
+        if self.view_cache is not None and key is not None:
+            self.view_cache.set(key, copy.deepcopy(view))
+
+    @staticmethod
+    def _view_key(user_id: str, data_version: Optional[int], *view: str) -> Optional[tuple]:
+        # Views are keyed on the user's data_version rather than invalidated on
+        # write. Callers must pass a version read from MongoDB, not from the
+        # user cache; then every worker sees a new analysis as a new key.
+        return None if data_version is None else (user_id, int(data_version), *view)
+
+    async def build_dashboard(
+        self, user_id: str, *, data_version: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Render the dashboard; memoized only when a fresh ``data_version`` is given."""
+        key = self._view_key(user_id, data_version, "dashboard")
+        cached = self._cached_view(key)
+        if cached is not None:
+            return cached
+        summary = await self.summarize_history(user_id)
+        dashboard = self._render_dashboard(user_id, summary)
+        self._remember_view(key, dashboard)
+        return dashboard
+
+    def _render_dashboard(self, user_id: str, summary: Dict[str, Any]) -> Dict[str, Any]:
+        window = summary["dashboard"]
+
+        if not window["count"]:
             return {
                 "user_id": user_id,
                 "symptom_trends": [],
@@ -305,55 +1453,32 @@ class AnalysisRepository:
                 ],
             }
 
-        trend_items: List[Dict[str, Any]] = []
-        severity_scores: List[int] = []
-        symptom_counts: Dict[str, int] = {}
-
-        for item in analyses[:14]:
-            symptom = str(item.get("symptom", "")).strip()
-            score = int(item.get("severity_score", 0))
-            severity_scores.append(score)
-
-            if symptom:
-                key = symptom.lower()
-                symptom_counts[key] = symptom_counts.get(key, 0) + 1
-
-            trend_items.append(
-                {
-                    "date": item.get("created_at", ""),
-                    "symptom": symptom,
-                    "severity": score,
-                    "severity_label": item.get("severity_label", ""),
-                    "summary": self._extract_summary(item),
-                }
-            )
-
-        avg_severity = sum(severity_scores) / max(len(severity_scores), 1)
+        avg_severity = window["severity_avg"]
         health_score = max(35, min(100, int(100 - (avg_severity * 7))))
 
         most_common_symptom = ""
-        if symptom_counts:
-            most_common_symptom = max(symptom_counts, key=symptom_counts.get)
+        if window["symptom_counts"]:
+            most_common_symptom = window["symptom_counts"][0][0]
 
         risk_factors: List[str] = []
         improvement_areas: List[str] = []
         recommendations: List[str] = []
 
         if avg_severity >= 7:
-            risk_factors.append("Recent analyses show a high average severity level.")
+            risk_factors.append("Your analyses show a high average severity level.")
             improvement_areas.append(
                 "Seek professional evaluation for repeated high-severity symptoms."
             )
         elif avg_severity >= 4:
             risk_factors.append(
-                "Symptoms show a moderate severity pattern over recent analyses."
+                "Symptoms show a moderate severity pattern across your analyses."
             )
             improvement_areas.append(
                 "Track triggers and note what improves or worsens symptoms."
             )
         else:
             risk_factors.append(
-                "Recent symptoms trend mild overall, but continued monitoring is still useful."
+                "Your symptoms trend mild overall, but continued monitoring is still useful."
             )
             improvement_areas.append(
                 "Maintain healthy sleep, hydration, and nutrition habits."
@@ -377,7 +1502,7 @@ class AnalysisRepository:
 
         return {
             "user_id": user_id,
-            "symptom_trends": trend_items,
+            "symptom_trends": summary["trend_items"],
             "health_score": health_score,
             "risk_factors": risk_factors,
             "improvement_areas": improvement_areas,
@@ -388,10 +1513,32 @@ class AnalysisRepository:
         self,
         user_id: str,
         timeframe: str = "month",
+        *,
+        start: Any = None,
+        end: Any = None,
+        data_version: Optional[int] = None,
     ) -> Dict[str, Any]:
-        analyses = await self.list_user_analyses(user_id, limit=50)
+        since, until = resolve_timeframe(timeframe, start=start, end=end)
+        # Custom ranges are rarely repeated, so only named windows are memoized.
+        key = (
+            self._view_key(user_id, data_version, "patterns", timeframe)
+            if timeframe in TIMEFRAME_DAYS
+            else None
+        )
+        cached = self._cached_view(key)
+        if cached is not None:
+            cached["timestamp"] = to_iso()
+            return cached
+
+        summary = await self.summarize_window(user_id, since, until)
+        patterns = self._render_patterns(summary, timeframe)
+        self._remember_view(key, patterns)
+        return patterns
 
-        if not analyses:
+    def _render_patterns(self, summary: Dict[str, Any], timeframe: str) -> Dict[str, Any]:
+        window = summary["patterns"]
+
+        if not window["count"]:
             return {
                 "status": "success",
                 "analysis_type": "History Pattern Analysis",
@@ -416,29 +1563,15 @@ class AnalysisRepository:
                 "timeframe": timeframe,
             }
 
-        symptom_counts: Dict[str, int] = {}
-        severities: List[int] = []
-
-        for item in analyses:
-            symptom = str(item.get("symptom", "")).strip().lower()
-            if symptom:
-                symptom_counts[symptom] = symptom_counts.get(symptom, 0) + 1
-            severities.append(int(item.get("severity_score", 0)))
-
-        avg_severity = sum(severities) / max(len(severities), 1)
-
-        sorted_counts = sorted(
-            symptom_counts.items(),
-            key=lambda pair: pair[1],
-            reverse=True,
-        )
+        avg_severity = window["severity_avg"]
 
         recurring = [
             f"{symptom} appears {count} time(s) in your recent analysis history."
-            for symptom, count in sorted_counts[:3]
+            for symptom, count in window["symptom_counts"][:3]
         ] or ["No recurring symptom pattern detected yet."]
 
         trend_direction = "stable"
+        severities = summary["recent_severities"]
         if len(severities) >= 6:
             recent = severities[:3]
             older = severities[3:6]
@@ -452,7 +1585,7 @@ class AnalysisRepository:
         return {
             "status": "success",
             "analysis_type": "History Pattern Analysis",
-            "confidence": "Medium" if len(analyses) < 5 else "High",
+            "confidence": "Medium" if window["count"] < 5 else "High",
             "patterns": {
                 "recurring_patterns": recurring,
                 "trigger_identification": [
@@ -470,7 +1603,7 @@ class AnalysisRepository:
                     "be professionally evaluated if persistent.",
                 ],
                 "personalized_insights": [
-                    f"You have {len(analyses)} stored analysis record(s).",
+                    f"You have {window['count']} stored analysis record(s).",
                     "Historical tracking is now influencing your dashboard and follow-up guidance.",
                 ],
             },
@@ -483,14 +1616,405 @@ class AnalysisRepository:
             "timeframe": timeframe,
         }
 
+    async def summarize_history(self, user_id: str) -> Dict[str, Any]:
+        """Return the small summary the dashboard renders from.
+
+        Uses the running totals of the stats document when aggregates are
+        enabled and falls back to a server-side aggregation otherwise, so whole
+        analysis documents never cross the wire for this view.
+        """
+        if self.stats is not None:
+            stats = await self._stats_document(user_id)
+            recent = list(stats.get("recent", []))
+            return {
+                "trend_items": self._trend_items(recent[:DASHBOARD_TREND_WINDOW]),
+                "dashboard": self._counted_window(
+                    int(stats.get("analysis_count", 0)),
+                    int(stats.get("severity_sum", 0)),
+                    stats.get("symptom_frequency", {}),
+                    stats.get("daily", {}),
+                ),
+            }
+
+        return await self.aggregate_history_summary(user_id)
+
+    async def summarize_window(
+        self,
+        user_id: str,
+        since: datetime,
+        until: datetime,
+    ) -> Dict[str, Any]:
+        """Summarize every analysis created in ``[since, until)``.
+
+        Windows starting at UTC midnight are summed from the daily buckets of
+        the stats document. Other windows use its recent entries when they
+        reach back past ``since``; otherwise the window is read with an index
+        range scan on (user_id, created_at).
+        """
+        if self.stats is not None:
+            since, until = since.astimezone(timezone.utc), until.astimezone(timezone.utc)
+            stats = await self._stats_document(user_id)
+            recent = list(stats.get("recent", []))
+            entries = [
+                entry
+                for entry in recent
+                if (created_at := parse_timestamp(entry.get("created_at"))) is not None
+                and since <= created_at < until
+            ]
+            severities = [int(entry.get("severity_score", 0)) for entry in entries[:6]]
+
+            if self._buckets_cover(recent, since, until):
+                first = since.date().isoformat()
+                last = until.date().isoformat()
+                daily = {
+                    day: bucket
+                    for day, bucket in stats.get("daily", {}).items()
+                    if first <= day < last or (day == last and until != start_of_day(until))
+                }
+                frequency: Dict[str, int] = {}
+                for bucket in daily.values():
+                    for field, count in bucket.get("symptoms", {}).items():
+                        frequency[field] = frequency.get(field, 0) + int(count)
+                return {
+                    "patterns": self._counted_window(
+                        sum(int(bucket.get("count", 0)) for bucket in daily.values()),
+                        sum(int(bucket.get("severity_sum", 0)) for bucket in daily.values()),
+                        frequency,
+                        daily,
+                    ),
+                    "recent_severities": severities,
+                }
+
+            oldest = parse_timestamp(recent[-1].get("created_at")) if recent else None
+            if int(stats.get("analysis_count", 0)) <= len(recent) or (
+                oldest is not None and oldest < since
+            ):
+                return {"patterns": self._window_stats(entries), "recent_severities": severities}
+
+        cursor = self.collection.aggregate(
+            self.window_summary_pipeline(user_id, since, until)
+        )
+        results = await cursor.to_list(length=1)
+        facets = results[0] if results else {}
+        return {
+            "patterns": self._facet_window(facets, "pattern_symptoms", "pattern_severity"),
+            "recent_severities": [
+                int(item.get("severity_score", 0))
+                for item in facets.get("recent_severities", [])
+            ],
+        }
+
+    async def _stats_document(self, user_id: str) -> Dict[str, Any]:
+        stats = await self.stats.get(user_id)
+        if stats is None or stats.get("layout") != STATS_LAYOUT:
+            stats = await self.rebuild_stats(user_id) or {}
+        return stats
+
+    @staticmethod
+    def _buckets_cover(
+        recent: List[Dict[str, Any]], since: datetime, until: datetime
+    ) -> bool:
+        # Whole days only: the window starts at midnight, and either ends at
+        # midnight or after the newest analysis, which is recorded first.
+        if since != start_of_day(since):
+            return False
+        if until == start_of_day(until) or not recent:
+            return True
+        newest = parse_timestamp(recent[0].get("created_at"))
+        return newest is None or newest < until
+
+    @staticmethod
+    def _counted_window(
+        count: int,
+        severity_sum: int,
+        frequency: Dict[str, int],
+        daily: Dict[str, Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        """Window stats from maintained counters rather than individual analyses."""
+        last_seen: Dict[str, str] = {}
+        for day in sorted(daily):
+            for field in daily[day].get("symptoms", {}):
+                last_seen[field] = day
+
+        # Ties go to the symptom seen on the latest day.
+        ranked = sorted(
+            frequency.items(),
+            key=lambda pair: (pair[1], last_seen.get(pair[0], "")),
+            reverse=True,
+        )
+        return {
+            "count": count,
+            "severity_avg": severity_sum / max(count, 1),
+            "symptom_counts": [
+                (AnalysisStatsRepository.symptom_from_field(field), int(total))
+                for field, total in ranked[:3]
+            ],
+        }
+
+    def summarize_entries(self, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Summarize newest-first analyses in Python (stats entries or raw documents)."""
+        return {
+            "trend_items": self._trend_items(entries[:DASHBOARD_TREND_WINDOW]),
+            "dashboard": self._window_stats(entries),
+        }
+
+    def _trend_items(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [
+            {
+                "date": format_timestamp(item.get("created_at")),
+                "symptom": str(item.get("symptom", "")).strip(),
+                "severity": int(item.get("severity_score", 0)),
+                "severity_label": item.get("severity_label", ""),
+                "summary": self._extract_summary(item),
+            }
+            for item in entries
+        ]
+
+    @staticmethod
+    def _window_stats(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        symptom_counts: Dict[str, int] = {}
+        severities: List[int] = []
+
+        for item in entries:
+            symptom = str(item.get("symptom", "")).strip().lower()
+            if symptom:
+                symptom_counts[symptom] = symptom_counts.get(symptom, 0) + 1
+            severities.append(int(item.get("severity_score", 0)))
+
+        # sorted() is stable, so ties keep the most recently seen symptom first.
+        sorted_counts = sorted(
+            symptom_counts.items(),
+            key=lambda pair: pair[1],
+            reverse=True,
+        )
+        return {
+            "count": len(entries),
+            "severity_avg": sum(severities) / max(len(severities), 1),
+            "symptom_counts": sorted_counts[:3],
+        }
+
+    async def aggregate_history_summary(self, user_id: str) -> Dict[str, Any]:
+        cursor = self.collection.aggregate(self.history_summary_pipeline(user_id))
+        results = await cursor.to_list(length=1)
+        facets = results[0] if results else {}
+
+        return {
+            "trend_items": [
+                {**item, "date": format_timestamp(item.get("date"))}
+                for item in facets.get("trend_items", [])
+            ],
+            "dashboard": self._facet_window(
+                facets, "dashboard_symptoms", "dashboard_severity"
+            ),
+        }
+
+    @staticmethod
+    def _facet_window(
+        facets: Dict[str, Any],
+        counts_key: str,
+        severity_key: str,
+    ) -> Dict[str, Any]:
+        severity = (facets.get(severity_key) or [{}])[0]
+        return {
+            "count": int(severity.get("count", 0)),
+            "severity_avg": float(severity.get("severity_avg") or 0),
+            "symptom_counts": [
+                (item["_id"], int(item["count"]))
+                for item in facets.get(counts_key, [])
+            ],
+        }
+
+    @staticmethod
+    def window_summary_pipeline(
+        user_id: str,
+        since: datetime,
+        until: datetime,
+    ) -> List[Dict[str, Any]]:
+        window = {"$gte": since, "$lt": until}
+        return [
+            {
+                "$match": {
+                    "user_id": user_id,
+                    "$or": [{"created_at": window}, {"created_at": {"$type": "string"}}],
+                }
+            },
+            # Unmigrated ISO strings are converted and windowed like native dates,
+            # matching the stats path; strings that do not parse are dropped.
+            {
+                "$addFields": {
+                    "created_at": {
+                        "$convert": {
+                            "input": "$created_at",
+                            "to": "date",
+                            "onError": None,
+                            "onNull": None,
+                        }
+                    }
+                }
+            },
+            {"$match": {"created_at": window}},
+            {"$sort": {"created_at": -1}},
+            {"$project": {"_id": 0, "symptom": 1, "severity_score": 1, "created_at": 1}},
+            {
+                "$facet": {
+                    "pattern_symptoms": _symptom_count_stages(),
+                    "pattern_severity": _severity_stat_stages(),
+                    "recent_severities": [
+                        {"$limit": 6},
+                        {"$project": {"_id": 0, "severity_score": _SEVERITY_EXPR}},
+                    ],
+                }
+            },
+        ]
+
+    @staticmethod
+    def history_summary_pipeline(user_id: str) -> List[Dict[str, Any]]:
+        severity = _SEVERITY_EXPR
+        legacy_text = {
+            "$trim": {"input": {"$ifNull": ["$response_payload.symptom_analysis", ""]}}
+        }
+        summary = {
+            "$let": {
+                "vars": {"stored": {"$ifNull": ["$summary", ""]}, "text": legacy_text},
+                "in": {
+                    "$cond": [
+                        {"$gt": [{"$strLenCP": "$$stored"}, 0]},
+                        "$$stored",
+                        {
+                            "$cond": [
+                                {"$eq": ["$$text", ""]},
+                                "No summary available.",
+                                {
+                                    "$concat": [
+                                        {"$substrCP": ["$$text", 0, 180]},
+                                        {
+                                            "$cond": [
+                                                {"$gt": [{"$strLenCP": "$$text"}, 180]},
+                                                "...",
+                                                "",
+                                            ]
+                                        },
+                                    ]
+                                },
+                            ]
+                        },
+                    ]
+                },
+            }
+        }
+
+        return [
+            {"$match": {"user_id": user_id}},
+            {"$sort": {"created_at": -1}},
+            {
+                "$project": {
+                    "_id": 0,
+                    "symptom": 1,
+                    "severity_score": 1,
+                    "severity_label": 1,
+                    "created_at": 1,
+                    "summary": 1,
+                    "response_payload.symptom_analysis": 1,
+                }
+            },
+            {
+                "$facet": {
+                    "trend_items": [
+                        {"$limit": DASHBOARD_TREND_WINDOW},
+                        {
+                            "$project": {
+                                "_id": 0,
+                                "date": {"$ifNull": ["$created_at", ""]},
+                                "symptom": {
+                                    "$trim": {"input": {"$ifNull": ["$symptom", ""]}}
+                                },
+                                "severity": severity,
+                                "severity_label": {"$ifNull": ["$severity_label", ""]},
+                                "summary": summary,
+                            }
+                        },
+                    ],
+                    # The dashboard covers the whole history, like the
+                    # running totals of the stats document.
+                    "dashboard_symptoms": _symptom_count_stages(),
+                    "dashboard_severity": _severity_stat_stages(),
+                }
+            },
+        ]
+
     def _extract_summary(self, item: Dict[str, Any]) -> str:
+        if item.get("summary"):
+            return str(item["summary"])
         response_payload = item.get("response_payload", {})
         if isinstance(response_payload, dict):
             text = str(response_payload.get("symptom_analysis", "")).strip()
             if text:
-                return text[:180] + ("..." if len(text) > 180 else "")
+                return summarize_text(text)
         return "No summary available."
 
+    async def _prepare_analysis_document(
+        self,
+        *,
+        user_id: str,
+        request_payload: Dict[str, Any],
+        response_payload: Dict[str, Any],
+        credits_before: Optional[int],
+        credits_after: Optional[int],
+    ) -> Dict[str, Any]:
+        document, sections = self._build_stored_document(
+            user_id=user_id,
+            request_payload=request_payload,
+            response_payload=response_payload,
+            credits_before=credits_before,
+            credits_after=credits_after,
+        )
+        if self.payload_store is not None and sections is not None:
+            document["payload_refs"] = await self.payload_store.put_sections(sections)
+        return document
+
+    def _build_stored_document(
+        self,
+        *,
+        user_id: str,
+        request_payload: Dict[str, Any],
+        response_payload: Dict[str, Any],
+        credits_before: Optional[int],
+        credits_after: Optional[int],
+    ) -> tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        """Build the document to insert and, for the split layout, its sections.
+
+        ``payload_refs`` is filled in once the sections have been stored.
+        """
+        document = self._build_analysis_document(
+            user_id=user_id,
+            request_payload=request_payload,
+            response_payload=response_payload,
+            credits_before=credits_before,
+            credits_after=credits_after,
+        )
+        if self.payload_store is None:
+            return document, None
+
+        sections = {
+            name: response_payload[name]
+            for name in STORED_PAYLOAD_SECTIONS
+            if name in response_payload
+        }
+        summary = str(response_payload.get("symptom_analysis", "")).strip()
+
+        del document["request_payload"]
+        del document["response_payload"]
+        document.update(
+            {
+                "payload_layout": PAYLOAD_LAYOUT_SPLIT,
+                "payload_refs": {},
+                "summary": summarize_text(summary) if summary else "No summary available.",
+                "risk_assessment": dict(response_payload.get("risk_assessment", {})),
+                "search_timestamp": str(response_payload.get("search_timestamp", "")),
+            }
+        )
+        return document, sections
+
     def _build_analysis_document(
         self,
         *,
@@ -518,5 +2042,5 @@ class AnalysisRepository:
             "credit_cost": 1,
             "credits_before": credits_before,
             "credits_after": credits_after,
-            "created_at": to_iso(),
+            "created_at": bson_utc_now(),
         }
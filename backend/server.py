@@ -1,13 +1,22 @@
 from __future__ import annotations
 
+import hashlib
 import logging
+import os
 from contextlib import asynccontextmanager
 from typing import Any, Dict, List, Optional
 
-from fastapi import FastAPI, Header, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel, Field, ValidationError
+
+from backend.caching import cache_registry
+from backend.compression import (
+    CompressionMiddleware,
+    CompressionPolicy,
+    strip_etag_encoding,
+)
 from backend.config import settings
 from backend.database import (
     DatabaseUnavailableError,
@@ -15,16 +24,50 @@ from backend.database import (
     connect_to_mongo,
     get_database,
     get_database_health,
+    start_background_reconnect,
+    transactions_supported,
+)
+from backend.executor import ExecutorSaturatedError, blocking_executor, run_blocking
+from backend.metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    CallbackMetric,
+    EventLoopLagMonitor,
+    MetricsMiddleware,
+    MetricsServer,
+    registry as metrics_registry,
+    worker_index,
+    worker_labels,
 )
 from backend.external_integrations.pubmed import (
     build_pubmed_search_url,
     format_research_digest,
     get_pubmed_research,
 )
+from backend.mongo_monitoring import command_monitor
+from backend.profiling import (
+    ProfilerBusyError,
+    ProfilingMiddleware,
+    admin_token_matches,
+    capture_stacks,
+    profile_store,
+    stack_sampler,
+)
+from backend.rate_limiting import (
+    MemoryRateLimitStore,
+    MongoRateLimitStore,
+    RateLimitMiddleware,
+    RateLimitPolicy,
+)
 from backend.repositories import (
+    AnalysisPayloadStore,
     AnalysisPersistenceError,
     AnalysisRepository,
+    AnalysisStatsRepository,
+    InvalidCursorError,
+    InvalidTimeframeError,
+    PendingAnalysis,
     UserRepository,
+    format_timestamp,
 )
 from backend.services.analysis import (
     build_analysis_response,
@@ -40,6 +83,10 @@ from backend.services.auth import (
     extract_bearer_token,
     verify_google_id_token,
 )
+from backend.services.google_keys import google_key_set
+from backend.stall_watchdog import LoopStallWatchdog
+from backend.tracing import TracingMiddleware, build_exporter, traced
+from backend.write_behind import WriteBehindQueue
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -151,6 +198,11 @@ class AnalysisHistoryItem(BaseModel):
     risk_assessment: Dict[str, Any]
 
 
+class AnalysisDetail(AnalysisHistoryItem):
+    request: SymptomRequest
+    report: HealthResponse
+
+
 class PatternAnalysisResponse(BaseModel):
     status: str
     analysis_type: str
@@ -174,14 +226,114 @@ class RealTimeSearchResponse(BaseModel):
     pubmed_url: str
 
 
+async def _flush_pending_analyses(batch: List[PendingAnalysis]) -> None:
+    await analysis_repository().persist_pending(batch)
+    # History and dashboards only change once the batch is stored.
+    await user_repository().bump_data_version(
+        *sorted({str(item.document["user_id"]) for item in batch})
+    )
+
+
+async def _compensate_pending_analyses(
+    batch: List[PendingAnalysis], _exc: BaseException
+) -> None:
+    await analysis_repository().compensate_pending(batch, user_repository())
+
+
+analysis_write_behind: WriteBehindQueue[PendingAnalysis] = WriteBehindQueue(
+    _flush_pending_analyses,
+    on_failure=_compensate_pending_analyses,
+    max_queue_size=settings.write_behind_max_queue_size,
+    batch_size=settings.write_behind_batch_size,
+    flush_interval_seconds=settings.write_behind_flush_interval_ms / 1000,
+    enqueue_timeout_seconds=settings.write_behind_enqueue_timeout_ms / 1000,
+)
+
+
+loop_lag_monitor = EventLoopLagMonitor(settings.metrics_loop_lag_interval_ms / 1000)
+stall_watchdog = LoopStallWatchdog(settings.loop_stall_threshold_ms / 1000)
+
+
+def _cache_metric(name: str, documentation: str, field: str, type_name: str) -> CallbackMetric:
+    return CallbackMetric(
+        name,
+        documentation,
+        ("cache",),
+        lambda: [
+            ((namespace,), stats[field])
+            for namespace, stats in cache_registry.stats().items()
+        ],
+        type_name=type_name,
+    )
+
+
+def _executor_metric(name: str, documentation: str, field: str, type_name: str) -> CallbackMetric:
+    return CallbackMetric(
+        name,
+        documentation,
+        (),
+        lambda: [((), blocking_executor.metrics()[field])],
+        type_name=type_name,
+    )
+
+
+for _metric in (
+    _cache_metric("cache_hits_total", "Per-process cache hits.", "hits", "counter"),
+    _cache_metric("cache_misses_total", "Per-process cache misses.", "misses", "counter"),
+    _cache_metric(
+        "cache_evictions_total", "Entries evicted to respect the size bound.", "evictions", "counter"
+    ),
+    _cache_metric("cache_entries", "Entries currently held.", "size", "gauge"),
+    _cache_metric("cache_hit_ratio", "Hits divided by lookups since start.", "hit_ratio", "gauge"),
+    _executor_metric(
+        "blocking_executor_active", "Blocking calls running on the thread pool.", "active", "gauge"
+    ),
+    _executor_metric(
+        "blocking_executor_queued", "Blocking calls waiting for a thread.", "queued", "gauge"
+    ),
+    _executor_metric(
+        "blocking_executor_rejected_total", "Blocking calls rejected with 503.", "rejected", "counter"
+    ),
+):
+    metrics_registry.register(_metric)
+
+
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     try:
         await connect_to_mongo()
     except DatabaseUnavailableError as exc:
         logger.warning("Starting API in degraded mode without MongoDB: %s", exc)
+        start_background_reconnect()
+    if settings.analysis_write_behind_enabled:
+        await analysis_write_behind.start()
+    if settings.google_auth_enabled and settings.google_jwks_enabled:
+        google_key_set.start()
+    metrics_server = None
+    if settings.metrics_enabled:
+        loop_lag_monitor.start()
+        if settings.metrics_port and settings.metrics_token:
+            metrics_server = MetricsServer(
+                lambda: metrics_registry.render(worker_labels()),
+                _metrics_authorized,
+                host=settings.api_host,
+                port=settings.metrics_port + worker_index(),
+            )
+            metrics_server.start()
+    if settings.profiling_sampler_interval_ms > 0:
+        stack_sampler.start()
+    stall_watchdog.start()
     yield
+    await stall_watchdog.stop()
+    if metrics_server is not None:
+        await run_blocking(metrics_server.stop)
+    stack_sampler.stop()
+    await loop_lag_monitor.stop()
+    await google_key_set.stop()
+    await analysis_write_behind.stop(settings.write_behind_drain_timeout_seconds)
     await close_mongo_connection()
+    await run_blocking(span_exporter.shutdown)
+    blocking_executor.shutdown(wait=False)
 
 
 app = FastAPI(
@@ -190,23 +342,154 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+
+@app.exception_handler(ExecutorSaturatedError)
+async def _executor_saturated(_: Request, exc: ExecutorSaturatedError) -> JSONResponse:
+    logger.warning("Rejecting request: %s", exc)
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "The server is busy. Please retry shortly."},
+        headers={"Retry-After": "1"},
+    )
+
+
+def _rate_limit_user(authorization: str) -> Optional[str]:
+    try:
+        return str(decode_access_token(extract_bearer_token(authorization))["sub"])
+    except AuthError:
+        return None
+
+
+RATE_LIMIT_POLICIES = {
+    # Each search costs two NCBI E-utilities calls.
+    "/api/real-time-search": RateLimitPolicy(
+        "search", settings.rate_limit_search_per_minute
+    ),
+    "/api/analyze-symptom": RateLimitPolicy(
+        "analyze", settings.rate_limit_analyze_per_minute
+    ),
+    "/api/auth/google": RateLimitPolicy(
+        "login", settings.rate_limit_login_per_minute, key="ip"
+    ),
+}
+
+rate_limit_store = (
+    MongoRateLimitStore(lambda: get_database().rate_limits)
+    if settings.rate_limit_storage == "mongo"
+    else MemoryRateLimitStore()
+)
+
+_default_compression = CompressionPolicy(
+    minimum_size=settings.compression_minimum_size,
+    gzip_level=settings.compression_gzip_level,
+    brotli_quality=settings.compression_brotli_quality,
+)
+
+COMPRESSION_ROUTES = {
+    # Probes poll health constantly and its body is small.
+    "/api/health": None,
+    # History pages repeat the same keys per item and compress well even when short.
+    "/api/history": CompressionPolicy(
+        minimum_size=512,
+        gzip_level=settings.compression_gzip_level,
+        brotli_quality=settings.compression_brotli_quality,
+    ),
+}
+
+if settings.compression_enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        default_policy=_default_compression,
+        routes=COMPRESSION_ROUTES,
+        offload_threshold=settings.compression_offload_threshold_bytes,
+        offload=run_blocking,
+    )
+
+if settings.profiling_admin_token:
+    # Inside rate limiting, so a profile shows the handler, encoding and compression.
+    app.add_middleware(
+        ProfilingMiddleware,
+        admin_token=settings.profiling_admin_token,
+        store=profile_store,
+    )
+
+if settings.rate_limit_enabled:
+    app.add_middleware(
+        RateLimitMiddleware,
+        store=rate_limit_store,
+        policies=RATE_LIMIT_POLICIES,
+        identify_user=_rate_limit_user,
+        default_policy=RateLimitPolicy("api", settings.rate_limit_default_per_minute),
+        exempt_paths=("/api/health",),
+        trust_forwarded_for=settings.rate_limit_trust_forwarded_for,
+    )
+
+if settings.metrics_enabled:
+    # Outside rate limiting and compression, so 429s and compression time count.
+    app.add_middleware(MetricsMiddleware, routes=app.router.routes)
+
+span_exporter = build_exporter(settings.tracing_exporter, settings.tracing_collector_url)
+
+if settings.tracing_enabled:
+    app.add_middleware(
+        TracingMiddleware,
+        exporter=span_exporter,
+        server_timing=settings.tracing_server_timing,
+    )
+
+# Added last so it is outermost and 429 responses still carry CORS headers.
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.cors_allow_origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        "ETag",
+        "X-Next-Cursor",
+        "Retry-After",
+        "X-RateLimit-Limit",
+        "X-RateLimit-Remaining",
+        "Server-Timing",
+        "X-Trace-Id",
+    ],
 )
 
 
 def user_repository(db: Optional[Any] = None) -> UserRepository:
     db = db if db is not None else get_database()
-    return UserRepository(db.users, initial_credits=settings.initial_credits)
+    return UserRepository(
+        db.users,
+        initial_credits=settings.initial_credits,
+        cache=cache_registry.get(
+            "users",
+            maxsize=settings.user_cache_max_entries,
+            ttl_seconds=settings.user_cache_ttl_seconds,
+        ),
+    )
 
 
 def analysis_repository(db: Optional[Any] = None) -> AnalysisRepository:
     db = db if db is not None else get_database()
-    return AnalysisRepository(db.symptom_analyses)
+    return AnalysisRepository(
+        db.symptom_analyses,
+        payload_store=AnalysisPayloadStore(db.analysis_payloads),
+        stats=(
+            AnalysisStatsRepository(db.user_analysis_stats)
+            if settings.analysis_stats_enabled
+            else None
+        ),
+        client=db.client,
+        use_transactions=(
+            settings.mongo_transactions_enabled and transactions_supported()
+        ),
+        write_behind=analysis_write_behind if analysis_write_behind.running else None,
+        view_cache=cache_registry.get(
+            "analysis_views",
+            maxsize=settings.analysis_view_cache_max_entries,
+            ttl_seconds=settings.analysis_view_cache_ttl_seconds,
+        ),
+    )
 
 
 async def initialize_indexes(db: Optional[Any] = None) -> None:
@@ -218,19 +501,31 @@ async def initialize_indexes(db: Optional[Any] = None) -> None:
 async def _ensure_database_available(feature_name: str) -> Any:
     try:
         return get_database()
-    except DatabaseUnavailableError:
-        try:
-            return await connect_to_mongo()
-        except DatabaseUnavailableError as exc:
-            raise HTTPException(
-                status_code=503,
-                detail=(
-                    f"{feature_name} is temporarily unavailable because the database "
-                    "connection is down."
-                ),
-            ) from exc
+    except DatabaseUnavailableError as exc:
+        # Reconnecting is left to the background supervisor so an outage does
+        # not turn every request into a server-selection timeout.
+        start_background_reconnect()
+        raise HTTPException(
+            status_code=503,
+            detail=(
+                f"{feature_name} is temporarily unavailable because the database "
+                "connection is down."
+            ),
+        ) from exc
+
+
+async def _release_credit_lease(
+    users: UserRepository, user_id: str, lease_id: str
+) -> None:
+    # A no-op when the lease was already committed; expiry is the backstop
+    # if this write fails.
+    try:
+        await users.release_credit_lease(user_id, lease_id)
+    except Exception:
+        logger.exception("Failed to release credit lease %s", lease_id)
 
 
+@traced("auth")
 def _auth_header_to_user(authorization: Optional[str]) -> Dict[str, Any]:
     try:
         token = extract_bearer_token(authorization)
@@ -240,16 +535,80 @@ def _auth_header_to_user(authorization: Optional[str]) -> Dict[str, Any]:
         raise HTTPException(status_code=401, detail=str(exc)) from exc
 
 
-async def _get_current_user_document(authorization: Optional[str]) -> Dict[str, Any]:
+@traced("user_lookup")
+async def _get_current_user_document(
+    authorization: Optional[str],
+    *,
+    fresh_credits: bool = False,
+    fresh_version: bool = False,
+) -> Dict[str, Any]:
+    """Resolve the bearer token to a user document.
+
+    Identity comes from the per-process user cache unless the handler needs
+    up-to-date credit counters, in which case MongoDB is read. Handlers that
+    derive ETags or cache keys from ``data_version`` pass ``fresh_version``:
+    the cached copy can miss writes made through other workers, so only that
+    field is re-read.
+    """
     decoded = _auth_header_to_user(authorization)
     db = await _ensure_database_available("Authentication")
     repo = user_repository(db)
-    user_doc = await repo.get_by_user_id(str(decoded["sub"]))
+    user_id = str(decoded["sub"])
+    user_doc = await repo.get_by_user_id(user_id, fresh=fresh_credits)
     if not user_doc:
         raise HTTPException(status_code=401, detail="User not found.")
+    if fresh_version and not fresh_credits:
+        data_version = await repo.get_data_version(user_id)
+        if data_version is None:
+            raise HTTPException(status_code=401, detail="User not found.")
+        user_doc = {**user_doc, "data_version": data_version}
     return user_doc
 
 
+# Browsers may keep per-user pages but must revalidate them on every view.
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+
+def _user_resource_etag(user_doc: Dict[str, Any], resource: str, *variant: Any) -> str:
+    """Strong ETag for a per-user resource, derived from the user's ``data_version``.
+
+    Every credit change and every stored analysis bumps the version, so the
+    tag can be checked with a point read of that field, without querying the
+    resource itself. ``user_doc`` must carry a freshly read version.
+    """
+    key = "|".join(
+        [settings.app_version, resource, str(user_doc.get("user_id", ""))]
+        + [str(part) for part in variant]
+    )
+    digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+    return f'"{int(user_doc.get("data_version", 0))}-{digest}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        # If-None-Match uses weak comparison.
+        candidate = candidate[2:] if candidate.startswith("W/") else candidate
+        if strip_etag_encoding(candidate) == etag:
+            return True
+    return False
+
+
+def _conditional_response(
+    response: Response, etag: str, if_none_match: Optional[str]
+) -> Optional[Response]:
+    """Return a 304 when the client's copy is current; else tag ``response``."""
+    headers = {"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
 def _current_user_response(user_doc: Dict[str, Any]) -> CurrentUserResponse:
     return CurrentUserResponse(
         user_id=str(user_doc.get("user_id", "")),
@@ -263,6 +622,168 @@ def _current_user_response(user_doc: Dict[str, Any]) -> CurrentUserResponse:
     )
 
 
+def _history_item(item: Dict[str, Any]) -> AnalysisHistoryItem:
+    risk_assessment = item.get("risk_assessment")
+    if risk_assessment is None:
+        risk_assessment = item.get("response_payload", {}).get("risk_assessment", {})
+
+    return AnalysisHistoryItem(
+        id=str(item.get("_id", item.get("created_at", ""))),
+        symptom=str(item.get("symptom", "")),
+        severity=str(item.get("severity_label", "")),
+        duration=str(item.get("duration", "")),
+        created_at=format_timestamp(item.get("created_at")),
+        risk_assessment=dict(risk_assessment),
+    )
+
+
+def _metrics_authorized(authorization: Optional[str]) -> bool:
+    scheme, _, token = (authorization or "").partition(" ")
+    return scheme.lower() == "bearer" and admin_token_matches(
+        settings.metrics_token, token.strip()
+    )
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics(authorization: Optional[str] = Header(default=None)) -> Response:
+    """Prometheus scrape target; counts cover the worker named in the ``worker`` label."""
+    if not settings.metrics_enabled or not settings.metrics_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not _metrics_authorized(authorization):
+        raise HTTPException(status_code=403, detail="Invalid metrics token.")
+    return Response(
+        metrics_registry.render(worker_labels()), media_type=METRICS_CONTENT_TYPE
+    )
+
+
+def _require_admin(x_admin_token: Optional[str]) -> None:
+    if not settings.profiling_admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not admin_token_matches(settings.profiling_admin_token, x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+
+def _profile_text(body: str) -> PlainTextResponse:
+    # Admin requests land on whichever worker accepts them; say which one answered.
+    return PlainTextResponse(body, headers={"X-Worker-Pid": str(os.getpid())})
+
+
+@app.get("/admin/profiles", include_in_schema=False)
+async def list_request_profiles(
+    x_admin_token: Optional[str] = Header(default=None),
+) -> Dict[str, Any]:
+    _require_admin(x_admin_token)
+    return {"worker_pid": os.getpid(), "profiles": profile_store.ids()}
+
+
+@app.get("/admin/profiles/{profile_id}", include_in_schema=False)
+async def get_request_profile(
+    profile_id: str,
+    x_admin_token: Optional[str] = Header(default=None),
+) -> PlainTextResponse:
+    _require_admin(x_admin_token)
+    report = profile_store.get(profile_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Profile not found on this worker.")
+    return _profile_text(report)
+
+
+@app.get("/admin/profile/capture", include_in_schema=False)
+async def capture_worker_profile(
+    seconds: float = Query(default=10.0, gt=0),
+    interval_ms: int = Query(default=5, ge=1, le=1000),
+    x_admin_token: Optional[str] = Header(default=None),
+) -> PlainTextResponse:
+    """Sample every thread of this worker for ``seconds``; returns collapsed stacks."""
+    _require_admin(x_admin_token)
+    if seconds > settings.profiling_max_capture_seconds:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Captures are limited to {settings.profiling_max_capture_seconds} seconds.",
+        )
+    try:
+        stacks = await capture_stacks(seconds, interval_ms / 1000)
+    except ProfilerBusyError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    return _profile_text(stacks)
+
+
+@app.get("/admin/profile/sampler", include_in_schema=False)
+async def read_stack_sampler(
+    reset: bool = Query(default=False),
+    x_admin_token: Optional[str] = Header(default=None),
+) -> PlainTextResponse:
+    _require_admin(x_admin_token)
+    stacks = stack_sampler.collapsed()
+    if reset:
+        stack_sampler.reset()
+    return _profile_text(stacks)
+
+
+@app.post("/admin/profile/sampler/{action}", include_in_schema=False)
+async def control_stack_sampler(
+    action: str,
+    interval_ms: Optional[int] = Query(default=None, ge=1, le=1000),
+    x_admin_token: Optional[str] = Header(default=None),
+) -> Dict[str, Any]:
+    _require_admin(x_admin_token)
+    if action == "start":
+        if interval_ms is not None:
+            stack_sampler.interval_seconds = interval_ms / 1000
+        stack_sampler.start()
+    elif action == "stop":
+        await run_blocking(stack_sampler.stop)
+    else:
+        raise HTTPException(status_code=404, detail="Unknown sampler action.")
+    return {
+        "worker_pid": os.getpid(),
+        "running": stack_sampler.running,
+        "interval_ms": round(stack_sampler.interval_seconds * 1000, 3),
+        "samples": stack_sampler.samples,
+    }
+
+
+@app.get("/admin/loop-stalls", include_in_schema=False)
+async def list_loop_stalls(
+    reset: bool = Query(default=False),
+    x_admin_token: Optional[str] = Header(default=None),
+) -> Dict[str, Any]:
+    """Call sites that blocked this worker's event loop, worst first."""
+    _require_admin(x_admin_token)
+    report = {
+        "worker_pid": os.getpid(),
+        "enabled": stall_watchdog.running,
+        "threshold_ms": settings.loop_stall_threshold_ms,
+        "stalls": stall_watchdog.stalls,
+        "sites": stall_watchdog.report(),
+    }
+    if reset:
+        stall_watchdog.reset()
+    return report
+
+
+@app.get("/admin/mongo/query-shapes", include_in_schema=False)
+async def list_mongo_query_shapes(
+    limit: int = Query(default=20, ge=1, le=200),
+    order_by: str = Query(default="total", pattern="^(total|mean|max)$"),
+    reset: bool = Query(default=False),
+    x_admin_token: Optional[str] = Header(default=None),
+) -> Dict[str, Any]:
+    """This worker's slowest MongoDB query shapes, with sampled plans."""
+    _require_admin(x_admin_token)
+    report = {
+        "worker_pid": os.getpid(),
+        "enabled": settings.mongo_command_monitoring,
+        "slow_threshold_ms": settings.mongo_slow_operation_ms,
+        "explain_sampling": settings.mongo_explain_sampling,
+        "commands": command_monitor.commands,
+        "shapes": command_monitor.report(limit, order_by),
+    }
+    if reset:
+        command_monitor.reset()
+    return report
+
+
 @app.get("/api/health")
 async def health_check() -> Dict[str, Any]:
     database_health = get_database_health()
@@ -270,11 +791,20 @@ async def health_check() -> Dict[str, Any]:
     return {
         "status": "healthy" if is_healthy else "degraded",
         "service": settings.app_name,
+        "worker_pid": os.getpid(),
         "database_available": is_healthy,
         "database_error": database_health.get("error"),
+        "database_reconnect": database_health.get("reconnect"),
         "google_auth_enabled": settings.google_auth_enabled,
+        "blocking_executor": blocking_executor.metrics(),
+        "google_signing_keys": google_key_set.metrics()
+        if settings.google_auth_enabled and settings.google_jwks_enabled
+        else None,
         "credit_limit": settings.initial_credits,
         "pubmed_enabled": settings.pubmed_enabled,
+        "analysis_write_behind": analysis_write_behind.metrics()
+        if settings.analysis_write_behind_enabled
+        else None,
         "degraded_features": []
         if is_healthy
         else [
@@ -287,7 +817,7 @@ async def health_check() -> Dict[str, Any]:
 @app.post("/api/auth/google", response_model=AuthTokens)
 async def google_auth_login(request: GoogleAuthRequest) -> AuthTokens:
     try:
-        profile = verify_google_id_token(request.id_token)
+        profile = await run_blocking(verify_google_id_token, request.id_token)
         db = await _ensure_database_available("Google sign-in")
         repo = user_repository(db)
         user_doc = await repo.create_or_update_google_user(
@@ -301,6 +831,8 @@ async def google_auth_login(request: GoogleAuthRequest) -> AuthTokens:
         return build_auth_response(user_doc)
     except AuthError as exc:
         raise HTTPException(status_code=401, detail=str(exc)) from exc
+    except ExecutorSaturatedError:
+        raise
     except Exception as exc:
         logger.exception("Google auth login failed")
         raise HTTPException(
@@ -312,20 +844,33 @@ async def google_auth_login(request: GoogleAuthRequest) -> AuthTokens:
 async def get_me(
     authorization: Optional[str] = Header(default=None),
 ) -> CurrentUserResponse:
-    user_doc = await _get_current_user_document(authorization)
+    user_doc = await _get_current_user_document(authorization, fresh_credits=True)
     return _current_user_response(user_doc)
 
 
 @app.get("/api/credits", response_model=CreditSummary)
 async def get_credits(
+    response: Response,
     authorization: Optional[str] = Header(default=None),
+    if_none_match: Optional[str] = Header(default=None),
 ) -> CreditSummary:
-    user_doc = await _get_current_user_document(authorization)
+    user_doc = await _get_current_user_document(authorization, fresh_version=True)
+    etag = _user_resource_etag(user_doc, "credits")
+    not_modified = _conditional_response(response, etag, if_none_match)
+    if not_modified is not None:
+        return not_modified
     db = await _ensure_database_available("Credits")
     summary = await user_repository(db).get_credit_summary(str(user_doc["user_id"]))
     return CreditSummary(**summary)
 
 
+def _build_analysis_report(
+    request_payload: Dict[str, Any], research_payload: Dict[str, Any]
+) -> Dict[str, Any]:
+    research_text = format_research_digest(request_payload["symptom"], research_payload)
+    return build_analysis_response(request_payload, research_text)
+
+
 @app.post("/api/analyze-symptom", response_model=HealthResponse)
 async def analyze_symptom(
     request: SymptomRequest,
@@ -335,32 +880,45 @@ async def analyze_symptom(
     db = await _ensure_database_available("Symptom analysis")
     users = user_repository(db)
     analyses = analysis_repository(db)
+    user_id = str(user_doc["user_id"])
 
-    credits_before = int(user_doc.get("credits_remaining", 0))
-    if credits_before <= 0:
+    # Reserve the credit before any PubMed or rule-engine work so concurrent
+    # requests beyond the user's balance are rejected up front.
+    try:
+        lease = await users.reserve_credit(
+            user_id, ttl_seconds=settings.credit_lease_ttl_seconds
+        )
+    except ValueError as exc:
+        if str(exc) == "User not found":
+            raise HTTPException(status_code=401, detail=str(exc)) from exc
         raise HTTPException(
             status_code=403,
             detail=f"You have used all {settings.initial_credits} credits available on this account.",
-        )
-
-    request_payload = request.model_dump()
-    research_payload = get_pubmed_research(
-        symptom=request.symptom,
-        age=request.age,
-        gender=request.gender,
-        medical_history=request.medical_history,
-        max_results=settings.pubmed_max_results,
-    )
-    research_text = format_research_digest(request.symptom, research_payload)
-    response_payload = build_analysis_response(request_payload, research_text)
+        ) from exc
 
+    committed = False
     try:
+        request_payload = request.model_dump()
+        research_payload = await run_blocking(
+            get_pubmed_research,
+            symptom=request.symptom,
+            age=request.age,
+            gender=request.gender,
+            medical_history=request.medical_history,
+            max_results=settings.pubmed_max_results,
+        )
+        response_payload = await run_blocking(
+            _build_analysis_report, request_payload, research_payload
+        )
+
         await analyses.create_analysis_with_credit_charge(
             user_repository=users,
-            user_id=str(user_doc["user_id"]),
+            user_id=user_id,
             request_payload=request_payload,
             response_payload=response_payload,
+            lease_id=lease.lease_id,
         )
+        committed = True
     except ValueError as exc:
         detail = str(exc)
         status_code = 401 if detail == "User not found" else 403
@@ -368,36 +926,70 @@ async def analyze_symptom(
     except AnalysisPersistenceError as exc:
         logger.exception("Durable symptom analysis workflow failed")
         raise HTTPException(status_code=500, detail=str(exc)) from exc
+    finally:
+        if not committed:
+            await _release_credit_lease(users, user_id, lease.lease_id)
 
     return HealthResponse(**response_payload)
 
 
 @app.get("/api/history", response_model=List[AnalysisHistoryItem])
 async def get_history(
+    response: Response,
+    cursor: Optional[str] = Query(default=None),
+    limit: Optional[int] = Query(default=None, ge=1, le=settings.history_max_page_size),
     authorization: Optional[str] = Header(default=None),
+    if_none_match: Optional[str] = Header(default=None),
 ) -> List[AnalysisHistoryItem]:
+    user_doc = await _get_current_user_document(authorization, fresh_version=True)
+    page_size = limit or settings.max_analysis_history
+    etag = _user_resource_etag(user_doc, "history", page_size, cursor or "")
+    not_modified = _conditional_response(response, etag, if_none_match)
+    if not_modified is not None:
+        return not_modified
+    db = await _ensure_database_available("History")
+    try:
+        records, next_cursor = await analysis_repository(db).list_user_analyses_page(
+            str(user_doc["user_id"]),
+            limit=page_size,
+            cursor=cursor,
+        )
+    except InvalidCursorError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [_history_item(item) for item in records]
+
+
+@app.get("/api/history/{analysis_id}", response_model=AnalysisDetail)
+async def get_history_detail(
+    analysis_id: str,
+    authorization: Optional[str] = Header(default=None),
+) -> AnalysisDetail:
     user_doc = await _get_current_user_document(authorization)
     db = await _ensure_database_available("History")
-    records = await analysis_repository(db).list_user_analyses(
+    item = await analysis_repository(db).get_user_analysis(
         str(user_doc["user_id"]),
-        limit=settings.max_analysis_history,
+        analysis_id,
     )
+    if item is None:
+        raise HTTPException(status_code=404, detail="Analysis not found.")
 
-    items: List[AnalysisHistoryItem] = []
-    for item in records:
-        items.append(
-            AnalysisHistoryItem(
-                id=str(item.get("_id", item.get("created_at", ""))),
-                symptom=str(item.get("symptom", "")),
-                severity=str(item.get("severity_label", "")),
-                duration=str(item.get("duration", "")),
-                created_at=str(item.get("created_at", "")),
-                risk_assessment=dict(
-                    item.get("response_payload", {}).get("risk_assessment", {})
-                ),
-            )
-        )
-    return items
+    try:
+        report = HealthResponse(**item.get("response_payload", {}))
+    except ValidationError as exc:
+        logger.error("Stored report for analysis %s is incomplete: %s", analysis_id, exc)
+        raise HTTPException(
+            status_code=500, detail="The stored report for this analysis is incomplete."
+        ) from exc
+
+    summary = _history_item(item)
+    return AnalysisDetail(
+        **summary.model_dump(),
+        request=SymptomRequest(**item.get("request_payload", {})),
+        report=report,
+    )
 
 
 @app.post("/api/ai-chat", response_model=ChatResponse)
@@ -410,23 +1002,31 @@ async def ai_health_chat(
     recent = await analysis_repository(db).get_recent_symptoms(
         str(user_doc["user_id"]), limit=5
     )
-    payload = build_chat_response(request.message, recent_records=recent)
+    payload = await run_blocking(build_chat_response, request.message, recent_records=recent)
     return ChatResponse(**payload)
 
 
 @app.get("/api/health-dashboard/{user_id}", response_model=HealthDashboard)
 async def get_health_dashboard(
     user_id: str,
+    response: Response,
     authorization: Optional[str] = Header(default=None),
+    if_none_match: Optional[str] = Header(default=None),
 ) -> HealthDashboard:
-    user_doc = await _get_current_user_document(authorization)
+    user_doc = await _get_current_user_document(authorization, fresh_version=True)
     if str(user_doc.get("user_id")) != user_id:
         raise HTTPException(
             status_code=403, detail="You can only access your own dashboard."
         )
+    etag = _user_resource_etag(user_doc, "dashboard")
+    not_modified = _conditional_response(response, etag, if_none_match)
+    if not_modified is not None:
+        return not_modified
 
     db = await _ensure_database_available("Dashboard")
-    dashboard = await analysis_repository(db).build_dashboard(user_id)
+    dashboard = await analysis_repository(db).build_dashboard(
+        user_id, data_version=int(user_doc.get("data_version", 0))
+    )
     return HealthDashboard(**dashboard)
 
 
@@ -446,7 +1046,8 @@ async def real_time_medical_search(
 ) -> RealTimeSearchResponse:
     await _get_current_user_document(authorization)
 
-    research_payload = get_pubmed_research(
+    research_payload = await run_blocking(
+        get_pubmed_research,
         symptom=request.query,
         max_results=settings.pubmed_max_results,
     )
@@ -469,13 +1070,19 @@ async def ai_pattern_analysis(
     data: Dict[str, Any],
     authorization: Optional[str] = Header(default=None),
 ) -> PatternAnalysisResponse:
-    user_doc = await _get_current_user_document(authorization)
+    user_doc = await _get_current_user_document(authorization, fresh_version=True)
     timeframe = str(data.get("timeframe", "month"))
     db = await _ensure_database_available("Pattern analysis")
-    result = await analysis_repository(db).build_pattern_analysis(
-        str(user_doc["user_id"]),
-        timeframe=timeframe,
-    )
+    try:
+        result = await analysis_repository(db).build_pattern_analysis(
+            str(user_doc["user_id"]),
+            timeframe=timeframe,
+            start=data.get("start"),
+            end=data.get("end"),
+            data_version=int(user_doc.get("data_version", 0)),
+        )
+    except InvalidTimeframeError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
     return PatternAnalysisResponse(**result)
 
 
@@ -3,6 +3,8 @@ from __future__ import annotations
 from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional
 
+from backend.tracing import traced
+
 
 def utc_now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
@@ -569,6 +571,7 @@ def build_personalized_tips(
     ]
 
 
+@traced("rule_engine")
 def build_analysis_response(
     request_data: Dict[str, Any],
     research_text: str,
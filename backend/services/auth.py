@@ -1,18 +1,27 @@
 from __future__ import annotations
 
+import hashlib
+import logging
+import time
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Any, Dict, Optional
 
 import requests
-from jose import JWTError, jwt
+from jose import ExpiredSignatureError, JWTError, jwt
 from pydantic import BaseModel, ConfigDict, EmailStr, Field
 
+from backend.caching import TTLCache, cache_registry
 from backend.config import settings
+from backend.services.google_keys import GoogleKeySet, KeyFetchError, google_key_set
 
 GOOGLE_TOKEN_INFO_URL = "https://oauth2.googleapis.com/tokeninfo"
+GOOGLE_ISSUERS = {"accounts.google.com", "https://accounts.google.com"}
 DEFAULT_ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7
 DEFAULT_INITIAL_CREDITS = 5
 
+logger = logging.getLogger(__name__)
+
 
 class AuthConfig(BaseModel):
     model_config = ConfigDict(frozen=True)
@@ -23,6 +32,12 @@ class AuthConfig(BaseModel):
         default_factory=lambda: settings.jwt_expiration_minutes
     )
     google_client_id: str = Field(default_factory=lambda: settings.google_client_id)
+    google_jwks_enabled: bool = Field(
+        default_factory=lambda: settings.google_jwks_enabled
+    )
+    google_tokeninfo_fallback: bool = Field(
+        default_factory=lambda: settings.google_tokeninfo_fallback
+    )
 
 
 class GoogleUserProfile(BaseModel):
@@ -61,10 +76,24 @@ class AuthError(Exception):
     pass
 
 
+@lru_cache(maxsize=1)
 def get_auth_config() -> AuthConfig:
+    """Process-wide auth configuration, built once from settings.
+
+    ``AuthConfig`` is frozen, so the shared instance can be handed to every
+    request. Call ``get_auth_config.cache_clear()`` after changing settings.
+    """
     return AuthConfig()
 
 
+def _access_token_cache() -> TTLCache[Dict[str, Any]]:
+    return cache_registry.get(
+        "access_tokens",
+        maxsize=settings.access_token_cache_max_entries,
+        ttl_seconds=settings.access_token_cache_ttl_seconds,
+    )
+
+
 def _utcnow() -> datetime:
     return datetime.now(timezone.utc)
 
@@ -74,8 +103,17 @@ def _iso_now() -> str:
 
 
 def verify_google_id_token(
-    id_token: str, config: Optional[AuthConfig] = None
+    id_token: str,
+    config: Optional[AuthConfig] = None,
+    key_set: Optional[GoogleKeySet] = None,
 ) -> GoogleUserProfile:
+    """Verify a Google ID token and return the signed-in profile.
+
+    Tokens are checked locally against Google's cached signing keys. The
+    tokeninfo endpoint is only called when local verification is disabled, or
+    as a fallback when the keys cannot be fetched or the token names a key id
+    Google has not published yet.
+    """
     config = config or get_auth_config()
 
     if not id_token or not id_token.strip():
@@ -86,6 +124,50 @@ def verify_google_id_token(
             "Google authentication is not configured. GOOGLE_CLIENT_ID is missing."
         )
 
+    if not config.google_jwks_enabled:
+        return _profile_from_claims(_fetch_tokeninfo_claims(id_token), config)
+
+    try:
+        payload = _verify_with_signing_keys(id_token, key_set or google_key_set)
+    except KeyFetchError as exc:
+        if not config.google_tokeninfo_fallback:
+            raise AuthError("Unable to load Google token signing keys.") from exc
+        logger.warning("Falling back to Google tokeninfo: %s", exc)
+        payload = _fetch_tokeninfo_claims(id_token)
+
+    return _profile_from_claims(payload, config)
+
+
+def _verify_with_signing_keys(id_token: str, key_set: GoogleKeySet) -> Dict[str, Any]:
+    try:
+        header = jwt.get_unverified_header(id_token)
+    except JWTError as exc:
+        raise AuthError("Invalid Google ID token.") from exc
+
+    kid = header.get("kid")
+    if header.get("alg") != "RS256" or not kid:
+        raise AuthError("Invalid Google ID token.")
+
+    key = key_set.get_key(str(kid))
+    if key is None:
+        raise KeyFetchError(f"No Google signing key with id {kid!r}.")
+
+    try:
+        # Audience and issuer are checked by _profile_from_claims so both
+        # verification paths report the same errors.
+        return jwt.decode(
+            id_token,
+            key,
+            algorithms=["RS256"],
+            options={"verify_aud": False, "verify_iss": False, "verify_at_hash": False},
+        )
+    except ExpiredSignatureError as exc:
+        raise AuthError("Google ID token has expired.") from exc
+    except JWTError as exc:
+        raise AuthError("Invalid Google ID token.") from exc
+
+
+def _fetch_tokeninfo_claims(id_token: str) -> Dict[str, Any]:
     try:
         response = requests.get(
             GOOGLE_TOKEN_INFO_URL,
@@ -98,18 +180,17 @@ def verify_google_id_token(
     if response.status_code != 200:
         raise AuthError("Invalid Google ID token.")
 
-    payload = response.json()
+    return response.json()
 
+
+def _profile_from_claims(payload: Dict[str, Any], config: AuthConfig) -> GoogleUserProfile:
     audience = payload.get("aud")
     if audience != config.google_client_id:
         raise AuthError(
             "Google token audience does not match the configured client ID."
         )
 
-    if payload.get("iss") not in {
-        "accounts.google.com",
-        "https://accounts.google.com",
-    }:
+    if payload.get("iss") not in GOOGLE_ISSUERS:
         raise AuthError("Invalid Google token issuer.")
 
     if payload.get("email_verified") not in {"true", True, "True"}:
@@ -193,11 +274,25 @@ def create_access_token(
 def decode_access_token(
     token: str, config: Optional[AuthConfig] = None
 ) -> Dict[str, Any]:
-    config = config or get_auth_config()
+    """Verify an access token and return its claims.
+
+    Tokens already verified with the process-wide config are served from a
+    bounded cache keyed by the token's SHA-256 digest, until the cache TTL or
+    the token's own ``exp``, whichever comes first.
+    """
+    shared_config = get_auth_config()
+    config = config or shared_config
 
     if not token:
         raise AuthError("Access token is required.")
 
+    cache = _access_token_cache() if config is shared_config else None
+    digest = hashlib.sha256(token.encode("utf-8")).digest()
+    if cache is not None:
+        cached = cache.get(digest)
+        if cached is not None:
+            return dict(cached)
+
     try:
         payload = jwt.decode(
             token,
@@ -212,6 +307,14 @@ def decode_access_token(
     if not subject or not email:
         raise AuthError("Access token is missing required claims.")
 
+    if cache is not None:
+        expires_at = payload.get("exp")
+        if isinstance(expires_at, (int, float)):
+            cache.set(digest, dict(payload), ttl_seconds=expires_at - time.time())
+        # Tokens without exp never expire, so the cache TTL alone bounds them.
+        elif expires_at is None:
+            cache.set(digest, dict(payload))
+
     return payload
 
 
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional
+
+import requests
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class KeyFetchError(Exception):
+    """Raised when the signing keys cannot be downloaded and none are cached."""
+
+
+def cache_lifetime_seconds(headers: Any, default: float) -> float:
+    """How long a JWKS response may be cached, from Cache-Control/Age or Expires."""
+    match = _MAX_AGE.search(headers.get("Cache-Control", "") or "")
+    if match:
+        try:
+            age = float(headers.get("Age", 0) or 0)
+        except ValueError:
+            age = 0.0
+        return max(float(match.group(1)) - age, 0.0)
+
+    expires = headers.get("Expires")
+    if expires:
+        try:
+            return max(parsedate_to_datetime(expires).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            pass
+    return default
+
+
+class GoogleKeySet:
+    """Google's ID-token signing keys (JWKS), cached per their HTTP cache headers.
+
+    ``get_key`` only fetches when the cache is empty, expired, or a token names
+    an unknown key id (key rotation), and at most once per
+    ``min_refresh_interval_seconds``. ``run_refresher`` keeps the cache warm in
+    the background so request handlers normally never wait on the network.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        *,
+        timeout_seconds: float = 5.0,
+        default_ttl_seconds: float = 3600.0,
+        min_refresh_interval_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.url = url
+        self.timeout_seconds = timeout_seconds
+        self.default_ttl_seconds = default_ttl_seconds
+        self.min_refresh_interval_seconds = min_refresh_interval_seconds
+        self._clock = clock
+        self._keys: Dict[str, Dict[str, Any]] = {}
+        self._expires_at = 0.0
+        self._last_attempt: Optional[float] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.failures = 0
+
+    def get_key(self, kid: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            key = self._keys.get(kid)
+            fresh = self._clock() < self._expires_at
+            may_refresh = (
+                self._last_attempt is None
+                or self._clock() - self._last_attempt >= self.min_refresh_interval_seconds
+            )
+        if key is not None and fresh:
+            return key
+        if not may_refresh:
+            return key
+
+        try:
+            self.refresh()
+        except KeyFetchError:
+            with self._lock:
+                if not self._keys:
+                    raise
+            logger.warning("Using cached Google signing keys after a failed refresh")
+        with self._lock:
+            return self._keys.get(kid)
+
+    def refresh(self) -> None:
+        with self._lock:
+            self._last_attempt = self._clock()
+        try:
+            response = requests.get(self.url, timeout=self.timeout_seconds)
+            response.raise_for_status()
+            keys = {
+                str(key["kid"]): key
+                for key in response.json().get("keys", [])
+                if key.get("kid")
+            }
+        except (requests.RequestException, ValueError, KeyError, AttributeError) as exc:
+            self.failures += 1
+            raise KeyFetchError(f"Unable to fetch Google signing keys: {exc}") from exc
+        if not keys:
+            self.failures += 1
+            raise KeyFetchError("Google signing key response contained no keys.")
+
+        lifetime = cache_lifetime_seconds(response.headers, self.default_ttl_seconds)
+        with self._lock:
+            self._keys = keys
+            self._expires_at = self._clock() + lifetime
+        self.refreshes += 1
+        logger.info(
+            "Loaded %s Google signing key(s), cacheable for %.0fs", len(keys), lifetime
+        )
+
+    def seconds_until_refresh(self) -> float:
+        with self._lock:
+            remaining = self._expires_at - self._clock()
+        # Refresh a little before expiry so requests never see an expired set.
+        return max(remaining * 0.9, 0.0)
+
+    def failure_backoff_seconds(self, failures: int) -> float:
+        # Cap the exponent so a long outage cannot overflow the float.
+        return min(self.min_refresh_interval_seconds * 2 ** min(failures - 1, 30), 600.0)
+
+    async def run_refresher(self) -> None:
+        failures = 0
+        while True:
+            delay = self.seconds_until_refresh()
+            if failures:
+                delay = self.failure_backoff_seconds(failures)
+            await asyncio.sleep(delay)
+            try:
+                await asyncio.to_thread(self.refresh)
+                failures = 0
+            except KeyFetchError as exc:
+                failures += 1
+                logger.warning("Background Google key refresh failed: %s", exc)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(
+                self.run_refresher(), name="google-jwks-refresh"
+            )
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    def reset_after_fork(self) -> None:
+        self._lock = threading.Lock()
+        self._task = None
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "keys": len(self._keys),
+                "expires_in_seconds": round(max(self._expires_at - self._clock(), 0.0), 1),
+                "refreshes": self.refreshes,
+                "failures": self.failures,
+            }
+
+
+google_key_set = GoogleKeySet(
+    settings.google_jwks_url,
+    default_ttl_seconds=settings.google_jwks_default_ttl_seconds,
+)
+os.register_at_fork(after_in_child=google_key_set.reset_after_fork)
@@ -0,0 +1,188 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from types import FrameType
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from backend.metrics import EVENT_LOOP_STALL_DURATION, EVENT_LOOP_STALLS
+
+_BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+OTHER_SITE = "other"
+UNKNOWN_SITE = "unknown"
+
+
+@dataclass
+class StallSite:
+    site: str
+    count: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    last_seen: float = 0.0
+    stack: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "site": self.site,
+            "count": self.count,
+            "total_ms": round(self.total_seconds * 1000, 1),
+            "max_ms": round(self.max_seconds * 1000, 1),
+            "last_seen": self.last_seen,
+            "stack": self.stack,
+        }
+
+
+class LoopStallWatchdog:
+    """Finds the code that blocks the event loop.
+
+    A heartbeat task sleeps for ``check_interval_seconds`` at a time. A
+    daemon thread checks on it; once the heartbeat is ``threshold_seconds``
+    late, the thread captures the event-loop thread's stack. That stack shows
+    the call that is blocking. When the heartbeat wakes, the stall is charged
+    to its call site: the innermost frame under ``app_roots``, or the
+    innermost frame if none is.
+    """
+
+    def __init__(
+        self,
+        threshold_seconds: float,
+        *,
+        check_interval_seconds: Optional[float] = None,
+        app_roots: Sequence[str] = (_BACKEND_DIR,),
+        max_sites: int = 200,
+        max_stack_depth: int = 30,
+        clock: Callable[[], float] = time.perf_counter,
+    ) -> None:
+        self.threshold_seconds = threshold_seconds
+        self.check_interval_seconds = check_interval_seconds or max(
+            threshold_seconds / 4, 0.005
+        )
+        self.app_roots = tuple(os.path.abspath(root) for root in app_roots)
+        self.max_sites = max_sites
+        self.max_stack_depth = max_stack_depth
+        self._clock = clock
+        self.sites: Dict[str, StallSite] = {}
+        self.stalls = 0
+
+        self._loop_thread_id: Optional[int] = None
+        self._beat_started = 0.0
+        # (beat the capture belongs to, (site, stack)); written by the watcher thread.
+        self._pending: Optional[Tuple[float, Tuple[str, List[str]]]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start watching the running event loop; call it from that loop."""
+        if self.threshold_seconds <= 0 or self.running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat_started = self._clock()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat(), name="loop-stall-heartbeat")
+        self._thread = threading.Thread(
+            target=self._watch, name="loop-stall-watchdog", daemon=True
+        )
+        self._thread.start()
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        thread, self._thread = self._thread, None
+        self._stop.set()
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        if thread is not None:
+            await asyncio.to_thread(thread.join)
+
+    def reset(self) -> None:
+        self.sites.clear()
+        self.stalls = 0
+
+    def report(self) -> List[Dict[str, Any]]:
+        """Offending call sites, most total stall time first."""
+        return [
+            site.to_dict()
+            for site in sorted(
+                self.sites.values(), key=lambda item: item.total_seconds, reverse=True
+            )
+        ]
+
+    async def _heartbeat(self) -> None:
+        while True:
+            beat = self._clock()
+            self._beat_started = beat
+            await asyncio.sleep(self.check_interval_seconds)
+            lag = self._clock() - beat - self.check_interval_seconds
+            pending, self._pending = self._pending, None
+            if lag < self.threshold_seconds:
+                continue
+            if pending is not None and pending[0] == beat:
+                site, stack = pending[1]
+            else:
+                # The loop recovered before the watcher looked.
+                site, stack = UNKNOWN_SITE, []
+            self._record(site, stack, lag)
+
+    def _watch(self) -> None:
+        poll = self.check_interval_seconds / 2
+        while not self._stop.wait(poll):
+            beat = self._beat_started
+            overdue = self._clock() - beat - self.check_interval_seconds
+            if overdue < self.threshold_seconds:
+                continue
+            pending = self._pending
+            if pending is not None and pending[0] == beat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id or 0)
+            if frame is not None:
+                self._pending = (beat, self._describe(frame))
+
+    def _describe(self, frame: Optional[FrameType]) -> Tuple[str, List[str]]:
+        stack: List[str] = []
+        site: Optional[str] = None
+        innermost: Optional[str] = None
+        while frame is not None:
+            code = frame.f_code
+            location = f"{code.co_filename}:{frame.f_lineno} in {code.co_name}"
+            if innermost is None:
+                innermost = location
+            if site is None and code.co_filename.startswith(self.app_roots):
+                site = location
+            if len(stack) < self.max_stack_depth:
+                stack.append(location)
+            frame = frame.f_back
+        stack.reverse()
+        return site or innermost or UNKNOWN_SITE, stack
+
+    def _record(self, site: str, stack: List[str], lag: float) -> None:
+        if site not in self.sites and len(self.sites) >= self.max_sites:
+            site = OTHER_SITE
+        entry = self.sites.get(site)
+        if entry is None:
+            entry = self.sites[site] = StallSite(site)
+        entry.count += 1
+        entry.total_seconds += lag
+        entry.max_seconds = max(entry.max_seconds, lag)
+        entry.last_seen = time.time()
+        if stack:
+            entry.stack = stack
+        self.stalls += 1
+        EVENT_LOOP_STALLS.labels(_short_site(site)).inc()
+        EVENT_LOOP_STALL_DURATION.observe(lag)
+
+
+def _short_site(site: str) -> str:
+    """Drop the directory part, keeping metric labels short and host-independent."""
+    path, separator, rest = site.partition(":")
+    return os.path.basename(path) + separator + rest if separator else site
@@ -0,0 +1,315 @@
+"""Lightweight in-process request tracing.
+
+``TracingMiddleware`` opens a trace per HTTP request. Code on the request path
+marks stages with ``span("name")`` or the ``@traced("name")`` decorator. The
+trace lives in a context variable, so it follows the request into tasks and
+into the blocking thread pool, which copies the caller's context. Outside a
+request, both helpers cost a single context-variable lookup.
+
+Finished traces go to a ``SpanExporter``. Stages that finished before the
+response started are also summarised in a ``Server-Timing`` header.
+"""
+
+import contextlib
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start_time: float
+    duration_ms: float = 0.0
+    status: str = "ok"
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+
+class Trace:
+    def __init__(self, trace_id: str) -> None:
+        self.trace_id = trace_id
+        self.spans: List[Span] = []
+
+    def add(self, span: Span) -> None:
+        # list.append is atomic, so spans from pool threads need no lock.
+        self.spans.append(span)
+
+    def stage_durations(self) -> List[Tuple[str, float]]:
+        """Total milliseconds per span name, in the order stages first finished."""
+        totals: Dict[str, float] = {}
+        for span in list(self.spans):
+            totals[span.name] = totals.get(span.name, 0.0) + span.duration_ms
+        return list(totals.items())
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar(
+    "current_trace", default=None
+)
+_current_span_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "current_span_id", default=None
+)
+
+
+def _new_id(size: int) -> str:
+    return os.urandom(size).hex()
+
+
+def current_trace_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.trace_id if trace is not None else None
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Time the enclosed block as a child of the current span, if tracing."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    current = Span(
+        name=name,
+        trace_id=trace.trace_id,
+        span_id=_new_id(8),
+        parent_id=_current_span_id.get(),
+        start_time=time.time(),
+        attributes=attributes,
+    )
+    token = _current_span_id.set(current.span_id)
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException as exc:
+        current.status = "error"
+        current.attributes["error"] = type(exc).__name__
+        raise
+    finally:
+        current.duration_ms = (time.perf_counter() - started) * 1000
+        _current_span_id.reset(token)
+        trace.add(current)
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """Decorate a function or coroutine function so each call is a span."""
+
+    def decorate(func: F) -> F:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                if _current_trace.get() is None:
+                    return await func(*args, **kwargs)
+                with span(name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if _current_trace.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+class SpanExporter:
+    def export(self, trace: Trace) -> None:
+        raise NotImplementedError
+
+    def shutdown(self) -> None:
+        return None
+
+
+class NullSpanExporter(SpanExporter):
+    def export(self, trace: Trace) -> None:
+        return None
+
+
+class InMemorySpanExporter(SpanExporter):
+    def __init__(self) -> None:
+        self.traces: List[Trace] = []
+
+    def export(self, trace: Trace) -> None:
+        self.traces.append(trace)
+
+
+def trace_payload(trace: Trace) -> Dict[str, Any]:
+    return {"trace_id": trace.trace_id, "spans": [asdict(item) for item in trace.spans]}
+
+
+class LogSpanExporter(SpanExporter):
+    """Writes each trace as one JSON log line on the ``backend.tracing`` logger."""
+
+    def export(self, trace: Trace) -> None:
+        logger.info("trace %s", json.dumps(trace_payload(trace), default=str))
+
+
+class HttpSpanExporter(SpanExporter):
+    """POSTs batches of traces as JSON to a collector from a daemon thread.
+
+    The request path only enqueues; when the queue is full, traces are
+    dropped and counted rather than slowing requests down.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        *,
+        max_queue_size: int = 1000,
+        batch_size: int = 50,
+        timeout_seconds: float = 2.0,
+    ) -> None:
+        self.url = url
+        self.batch_size = batch_size
+        self.timeout_seconds = timeout_seconds
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Trace]]" = queue.Queue(max_queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._session = requests.Session()
+
+    def export(self, trace: Trace) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="trace-exporter", daemon=True
+            )
+            self._thread.start()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = None in batch
+            traces = [item for item in batch if item is not None]
+            if traces:
+                self._post(traces)
+            if stopping:
+                return
+
+    def _post(self, traces: List[Trace]) -> None:
+        body = json.dumps([trace_payload(trace) for trace in traces], default=str)
+        try:
+            self._session.post(
+                self.url,
+                data=body,
+                headers={"Content-Type": "application/json"},
+                timeout=self.timeout_seconds,
+            ).raise_for_status()
+        except requests.RequestException as exc:
+            logger.warning("Dropped %s trace(s): %s", len(traces), exc)
+
+    def shutdown(self) -> None:
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join(self.timeout_seconds * 2)
+
+
+def build_exporter(kind: str, collector_url: str = "") -> SpanExporter:
+    if kind == "log":
+        return LogSpanExporter()
+    if kind == "http":
+        if not collector_url:
+            raise ValueError("TRACING_EXPORTER=http requires TRACING_COLLECTOR_URL.")
+        return HttpSpanExporter(collector_url)
+    return NullSpanExporter()
+
+
+def _parse_traceparent(value: str) -> Tuple[Optional[str], Optional[str]]:
+    parts = value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None, None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None, None
+    return parts[1], parts[2]
+
+
+def server_timing(trace: Trace, total_ms: float) -> bytes:
+    entries = [f"{name};dur={duration:.1f}" for name, duration in trace.stage_durations()]
+    entries.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(entries).encode("latin-1")
+
+
+class TracingMiddleware:
+    """ASGI middleware opening one trace per HTTP request.
+
+    A W3C ``traceparent`` request header is honoured, so a caller's trace id
+    is kept. The response carries ``X-Trace-Id`` and, with ``server_timing``,
+    a ``Server-Timing`` header listing each finished stage.
+    """
+
+    def __init__(
+        self,
+        app: Any,
+        *,
+        exporter: SpanExporter,
+        server_timing: bool = True,
+    ) -> None:
+        self.app = app
+        self.exporter = exporter
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        trace_id, parent_id = _parse_traceparent(
+            headers.get(b"traceparent", b"").decode("latin-1")
+        )
+        trace = Trace(trace_id or _new_id(16))
+        trace_token = _current_trace.set(trace)
+        parent_token = _current_span_id.set(parent_id)
+        started = time.perf_counter()
+
+        async def send_with_timing(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                extra = [(b"x-trace-id", trace.trace_id.encode())]
+                if self.server_timing:
+                    total_ms = (time.perf_counter() - started) * 1000
+                    extra.append((b"server-timing", server_timing(trace, total_ms)))
+                message = {**message, "headers": [*message.get("headers", []), *extra]}
+            await send(message)
+
+        try:
+            with span("http.request", method=scope["method"], path=scope["path"]):
+                await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_span_id.reset(parent_token)
+            _current_trace.reset(trace_token)
+            try:
+                self.exporter.export(trace)
+            except Exception:
+                logger.exception("Failed to export trace %s", trace.trace_id)
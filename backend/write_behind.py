@@ -0,0 +1,210 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Generic, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class WriteBehindQueue(Generic[T]):
+    """Bounded in-process queue flushed to storage in batches.
+
+    Items are flushed when ``batch_size`` items are waiting or when the oldest
+    waiting item is ``flush_interval_seconds`` old, whichever comes first.
+    Producers wait up to ``enqueue_timeout_seconds`` for space (backpressure);
+    if the queue is still full, or already closed, the item is written inline
+    so it is never dropped.
+
+    ``flush`` must be idempotent because a failed batch is retried up to
+    ``max_attempts`` times. Batches that still fail are handed to
+    ``on_failure``.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[List[T]], Awaitable[None]],
+        *,
+        on_failure: Optional[Callable[[List[T], BaseException], Awaitable[None]]] = None,
+        max_queue_size: int = 1000,
+        batch_size: int = 100,
+        flush_interval_seconds: float = 0.05,
+        enqueue_timeout_seconds: float = 0.5,
+        max_attempts: int = 3,
+        retry_backoff_seconds: float = 0.2,
+    ) -> None:
+        self._flush_callback = flush
+        self._on_failure = on_failure
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.enqueue_timeout_seconds = enqueue_timeout_seconds
+        self.max_attempts = max_attempts
+        self.retry_backoff_seconds = retry_backoff_seconds
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = True
+        # The batch the flusher took off the queue and has not finished with.
+        self._in_flight: Optional[List[T]] = None
+
+        self._enqueued = 0
+        self._inline_writes = 0
+        self._flushed_items = 0
+        self._flushed_batches = 0
+        self._failed_items = 0
+        self._retries = 0
+        self._flush_total_ms = 0.0
+        self._flush_max_ms = 0.0
+        self._flush_last_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._closed = False
+        self._task = asyncio.create_task(self._run(), name="write-behind-flusher")
+
+    async def submit(self, item: T) -> None:
+        if self._closed or self._queue is None:
+            await self._write_inline(item)
+            return
+
+        try:
+            await asyncio.wait_for(self._queue.put(item), self.enqueue_timeout_seconds)
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Write-behind queue full (%s items); writing inline", self._queue.qsize()
+            )
+            await self._write_inline(item)
+            return
+        self._enqueued += 1
+
+    async def stop(self, timeout_seconds: float = 30.0) -> None:
+        """Stop accepting items and flush everything already queued."""
+        self._closed = True
+        if self._task is None or self._queue is None:
+            return
+
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout_seconds)
+        except asyncio.TimeoutError:
+            logger.error(
+                "Write-behind drain timed out with %s item(s) still queued",
+                self._queue.qsize(),
+            )
+        finally:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        # Anything left after a timed-out drain is written inline rather than lost,
+        # including the batch the cancelled flusher was in the middle of; flushes
+        # are idempotent, so re-flushing its already stored part is harmless.
+        leftovers: List[T] = list(self._in_flight or [])
+        self._in_flight = None
+        while not self._queue.empty():
+            leftovers.append(self._queue.get_nowait())
+            self._queue.task_done()
+        if leftovers:
+            await self._flush_with_retries(leftovers)
+
+    def metrics(self) -> Dict[str, Any]:
+        depth = self._queue.qsize() if self._queue is not None else 0
+        return {
+            "running": self.running,
+            "queue_depth": depth,
+            "queue_capacity": self.max_queue_size,
+            "enqueued": self._enqueued,
+            "inline_writes": self._inline_writes,
+            "flushed_items": self._flushed_items,
+            "flushed_batches": self._flushed_batches,
+            "failed_items": self._failed_items,
+            "retries": self._retries,
+            "flush_last_ms": round(self._flush_last_ms, 3),
+            "flush_max_ms": round(self._flush_max_ms, 3),
+            "flush_avg_ms": round(
+                self._flush_total_ms / self._flushed_batches, 3
+            ) if self._flushed_batches else 0.0,
+        }
+
+    async def _write_inline(self, item: T) -> None:
+        self._inline_writes += 1
+        await self._flush_with_retries([item], raise_on_failure=True)
+
+    async def _run(self) -> None:
+        assert self._queue is not None
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval_seconds
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            self._in_flight = batch
+            try:
+                await self._flush_with_retries(batch)
+                self._in_flight = None
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _flush_with_retries(
+        self,
+        batch: List[T],
+        *,
+        raise_on_failure: bool = False,
+    ) -> None:
+        last_error: Optional[BaseException] = None
+        for attempt in range(1, self.max_attempts + 1):
+            started = time.perf_counter()
+            try:
+                await self._flush_callback(batch)
+            except Exception as exc:
+                last_error = exc
+                logger.warning(
+                    "Write-behind flush of %s item(s) failed (attempt %s/%s): %s",
+                    len(batch),
+                    attempt,
+                    self.max_attempts,
+                    exc,
+                )
+                if attempt < self.max_attempts:
+                    self._retries += 1
+                    await asyncio.sleep(self.retry_backoff_seconds * attempt)
+                continue
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self._flushed_items += len(batch)
+            self._flushed_batches += 1
+            self._flush_last_ms = elapsed_ms
+            self._flush_total_ms += elapsed_ms
+            self._flush_max_ms = max(self._flush_max_ms, elapsed_ms)
+            return
+
+        self._failed_items += len(batch)
+        assert last_error is not None
+        if raise_on_failure:
+            raise last_error
+
+        logger.error("Write-behind batch of %s item(s) could not be persisted", len(batch))
+        if self._on_failure is not None:
+            try:
+                await self._on_failure(batch, last_error)
+            except Exception:
+                logger.exception("Write-behind failure handler raised")
@@ -0,0 +1,79 @@
+"""Measure the per-request cost of resolving a bearer token to its claims.
+
+Runs entirely in-process; no MongoDB is needed.
+
+    python -m benchmarks.auth_overhead --requests 20000 --clients 50
+
+Each of ``--clients`` signed-in clients polls repeatedly with the same token,
+as the dashboard does against ``/api/credits`` and ``/api/history``.
+
+Strategies:
+    uncached   build a fresh AuthConfig and run a full jose decode per request
+               (the original get_auth_config/decode_access_token)
+    cached     shared AuthConfig plus the verified-token cache
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from typing import Dict, List
+
+from jose import jwt
+
+from backend.caching import cache_registry
+from backend.services.auth import (
+    AuthConfig,
+    create_access_token,
+    decode_access_token,
+    extract_bearer_token,
+)
+from benchmarks.common import measure, print_table
+
+
+def uncached_decode(authorization: str) -> None:
+    config = AuthConfig()
+    jwt.decode(
+        extract_bearer_token(authorization),
+        config.jwt_secret,
+        algorithms=[config.jwt_algorithm],
+    )
+
+
+def cached_decode(authorization: str) -> None:
+    decode_access_token(extract_bearer_token(authorization))
+
+
+async def main(requests: int, clients: int) -> None:
+    headers: List[str] = [
+        "Bearer " + create_access_token(f"user-{index}", f"user-{index}@example.com")[0]
+        for index in range(clients)
+    ]
+    batch = max(requests // 100, 1)
+    rows: Dict[str, Dict[str, float]] = {}
+
+    for name, decode in (("uncached", uncached_decode), ("cached", cached_decode)):
+        cache_registry.clear()
+        position = 0
+
+        async def poll_batch() -> None:
+            nonlocal position
+            for _ in range(batch):
+                decode(headers[position % clients])
+                position += 1
+
+        result = await measure(poll_batch, repetitions=100)
+        rows[name] = {
+            "median_us": result["median_ms"] * 1000 / batch,
+            "p95_us": result["p95_ms"] * 1000 / batch,
+        }
+
+    print_table(f"Auth overhead: {requests} requests from {clients} clients", rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.clients))
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import statistics
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+import bson
+from pymongo import monitoring
+
+
+class ReplyBytesListener(monitoring.CommandListener):
+    """Counts command round trips and the BSON size of every server reply."""
+
+    def __init__(self) -> None:
+        self.round_trips = 0
+        self.reply_bytes = 0
+
+    def reset(self) -> None:
+        self.round_trips = 0
+        self.reply_bytes = 0
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        self.round_trips += 1
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self.reply_bytes += len(bson.encode(event.reply))
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        return None
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+async def measure(
+    operation: Callable[[], Awaitable[Any]],
+    *,
+    repetitions: int,
+    listener: ReplyBytesListener | None = None,
+) -> Dict[str, float]:
+    await operation()  # warm up connection pools and caches
+
+    if listener is not None:
+        listener.reset()
+
+    samples: List[float] = []
+    for _ in range(repetitions):
+        started = time.perf_counter()
+        await operation()
+        samples.append((time.perf_counter() - started) * 1000)
+
+    result = {
+        "median_ms": statistics.median(samples),
+        "p95_ms": percentile(samples, 0.95),
+    }
+    if listener is not None:
+        result["round_trips"] = listener.round_trips / repetitions
+        result["reply_bytes"] = listener.reply_bytes / repetitions
+    return result
+
+
+def print_table(title: str, rows: Dict[str, Dict[str, float]]) -> None:
+    columns = sorted({key for row in rows.values() for key in row})
+    print(title)
+    print("  " + "strategy".ljust(16) + "".join(column.rjust(14) for column in columns))
+    for name, row in rows.items():
+        cells = "".join(f"{row.get(column, float('nan')):14.2f}" for column in columns)
+        print("  " + name.ljust(16) + cells)
@@ -0,0 +1,128 @@
+"""Compare dashboard summarization strategies on a large analysis history.
+
+Requires a reachable MongoDB (``MONGO_URL``). Data is written to a scratch
+database that is dropped afterwards.
+
+    python -m benchmarks.dashboard_aggregation --analyses 5000 --repetitions 50
+
+Strategies:
+    python-scan   fetch the 50 most recent full documents and summarize in Python
+                  (the original build_dashboard behaviour)
+    pipeline      server-side $facet aggregation returning only the summary
+    stats         single point read of the precomputed user_analysis_stats document
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from datetime import datetime, timedelta, timezone
+import random
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from backend.config import settings
+from backend.repositories import (
+    ANALYSIS_WINDOW,
+    AnalysisRepository,
+    AnalysisStatsRepository,
+)
+from backend.services.analysis import build_analysis_response, severity_label_to_score
+from benchmarks.common import ReplyBytesListener, measure, print_table
+
+SYMPTOMS = ["headache", "fatigue", "cough", "fever", "nausea", "back pain"]
+SEVERITIES = ["mild", "moderate", "severe", "very severe"]
+
+
+def _legacy_document(user_id: str, index: int, created_at: datetime) -> dict:
+    symptom = random.choice(SYMPTOMS)
+    severity = random.choice(SEVERITIES)
+    request_payload = {
+        "symptom": symptom,
+        "duration": "1-3 days",
+        "severity": severity,
+        "additional_info": "",
+        "age": 40,
+        "gender": "",
+        "medical_history": "",
+    }
+    digest = "\n".join(
+        f"{n}. Study {index}-{n} on {symptom} management and nutrition, Journal of Medicine"
+        for n in range(1, 40)
+    )
+    return {
+        "user_id": user_id,
+        "symptom": symptom,
+        "duration": "1-3 days",
+        "severity_label": severity,
+        "severity_score": severity_label_to_score(severity),
+        "request_payload": request_payload,
+        "response_payload": build_analysis_response(request_payload, digest),
+        "created_at": created_at,
+    }
+
+
+async def main(analyses: int, repetitions: int) -> None:
+    if not settings.mongo_url:
+        raise SystemExit("MONGO_URL must point to a MongoDB deployment for this benchmark.")
+
+    listener = ReplyBytesListener()
+    client = AsyncIOMotorClient(settings.mongo_url, event_listeners=[listener])
+    db = client[f"{settings.mongo_database}_bench"]
+    user_id = "bench-user"
+
+    try:
+        await db.symptom_analyses.create_index([("user_id", 1), ("created_at", -1)])
+        start = datetime.now(timezone.utc) - timedelta(minutes=analyses)
+        batch = [
+            _legacy_document(user_id, index, start + timedelta(minutes=index))
+            for index in range(analyses)
+        ]
+        for offset in range(0, len(batch), 500):
+            await db.symptom_analyses.insert_many(batch[offset:offset + 500])
+
+        plain = AnalysisRepository(db.symptom_analyses)
+        with_stats = AnalysisRepository(
+            db.symptom_analyses,
+            stats=AnalysisStatsRepository(db.user_analysis_stats),
+        )
+        await with_stats.rebuild_stats(user_id)
+
+        async def python_scan() -> dict:
+            cursor = (
+                db.symptom_analyses.find({"user_id": user_id})
+                .sort("created_at", -1)
+                .limit(ANALYSIS_WINDOW)
+            )
+            documents = await cursor.to_list(length=ANALYSIS_WINDOW)
+            return plain.summarize_entries(documents)
+
+        rows = {
+            "python-scan": await measure(python_scan, repetitions=repetitions, listener=listener),
+            "pipeline": await measure(
+                lambda: plain.aggregate_history_summary(user_id),
+                repetitions=repetitions,
+                listener=listener,
+            ),
+            "stats": await measure(
+                lambda: with_stats.summarize_history(user_id),
+                repetitions=repetitions,
+                listener=listener,
+            ),
+        }
+        print_table(
+            f"Dashboard summary for a user with {analyses} analyses "
+            f"({repetitions} repetitions)",
+            rows,
+        )
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--analyses", type=int, default=5000)
+    parser.add_argument("--repetitions", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.analyses, args.repetitions))
@@ -0,0 +1,145 @@
+"""Compare Google sign-in persistence strategies under a storm of concurrent logins.
+
+Requires a reachable MongoDB (``MONGO_URL``). Data is written to a scratch
+database that is dropped afterwards.
+
+    python -m benchmarks.login_storm --users 200 --logins-per-user 5
+
+Every user signs in ``--logins-per-user`` times concurrently, so the storm mixes
+first logins racing each other with repeat logins.
+
+Strategies:
+    lookup-write   find_one on google_sub/email, then update_one + find_one or
+                   insert_one (the original create_or_update_google_user)
+    upsert         single find_one_and_update upsert returning the after-image
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import DuplicateKeyError
+
+from backend.config import settings
+from backend.repositories import UserRepository, to_iso
+from benchmarks.common import ReplyBytesListener, percentile, print_table
+
+
+async def lookup_write_login(collection: Any, google_sub: str, email: str) -> None:
+    now_iso = to_iso()
+    existing = await collection.find_one(
+        {"$or": [{"google_sub": google_sub}, {"email": email}]}
+    )
+    profile = {"user_id": google_sub, "google_sub": google_sub, "email": email}
+    if existing:
+        await collection.update_one(
+            {"_id": existing["_id"]},
+            {"$set": {**profile, "updated_at": now_iso, "last_login_at": now_iso}},
+        )
+        await collection.find_one({"_id": existing["_id"]})
+        return
+
+    await collection.insert_one(
+        {
+            **profile,
+            "credits_total": settings.initial_credits,
+            "credits_remaining": settings.initial_credits,
+            "created_at": now_iso,
+            "updated_at": now_iso,
+        }
+    )
+
+
+async def storm(
+    login: Callable[[str, str], Awaitable[None]],
+    *,
+    users: int,
+    logins_per_user: int,
+    listener: ReplyBytesListener,
+) -> Dict[str, float]:
+    latencies: List[float] = []
+    failures = 0
+
+    async def one(index: int) -> None:
+        nonlocal failures
+        google_sub = f"bench-sub-{index}"
+        started = time.perf_counter()
+        try:
+            await login(google_sub, f"{google_sub}@example.com")
+        except DuplicateKeyError:
+            failures += 1
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    listener.reset()
+    started = time.perf_counter()
+    await asyncio.gather(
+        *[one(index) for index in range(users) for _ in range(logins_per_user)]
+    )
+    elapsed = time.perf_counter() - started
+    total = users * logins_per_user
+    return {
+        "median_ms": statistics.median(latencies),
+        "p95_ms": percentile(latencies, 0.95),
+        "round_trips": listener.round_trips / total,
+        "logins_per_s": total / elapsed,
+        "failed_logins": float(failures),
+    }
+
+
+async def main(users: int, logins_per_user: int) -> None:
+    if not settings.mongo_url:
+        raise SystemExit("MONGO_URL must point to a MongoDB deployment for this benchmark.")
+
+    listener = ReplyBytesListener()
+    client = AsyncIOMotorClient(settings.mongo_url, event_listeners=[listener])
+    db = client[f"{settings.mongo_database}_bench"]
+
+    async def fresh_collection() -> Any:
+        await db.users.drop()
+        await db.users.create_index("google_sub", unique=True)
+        await db.users.create_index("email", unique=True)
+        return db.users
+
+    try:
+        rows: Dict[str, Dict[str, float]] = {}
+
+        collection = await fresh_collection()
+        rows["lookup-write"] = await storm(
+            lambda sub, email: lookup_write_login(collection, sub, email),
+            users=users,
+            logins_per_user=logins_per_user,
+            listener=listener,
+        )
+
+        repository = UserRepository(
+            await fresh_collection(), initial_credits=settings.initial_credits
+        )
+        rows["upsert"] = await storm(
+            lambda sub, email: repository.create_or_update_google_user(
+                google_sub=sub, email=email, name="Bench User"
+            ),
+            users=users,
+            logins_per_user=logins_per_user,
+            listener=listener,
+        )
+
+        print_table(
+            f"Login storm: {users} users x {logins_per_user} concurrent logins",
+            rows,
+        )
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--logins-per-user", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.logins_per_user))
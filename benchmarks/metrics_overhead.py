@@ -0,0 +1,77 @@
+"""Measure what the always-on instrumentation costs per call.
+
+Runs in-process; no MongoDB is needed.
+
+    python -m benchmarks.metrics_overhead --calls 200000
+
+Rows:
+    counter       ``Counter.labels(...).inc()``
+    histogram     ``Histogram.labels(...).observe()``
+    bare_method   an empty repository coroutine awaited directly
+    timed_method  the same coroutine wrapped by ``instrument_repository``
+    render        one ``/metrics`` render of the two metrics above
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from typing import Callable, Dict
+
+from backend.metrics import MetricsRegistry, instrument_repository
+from benchmarks.common import print_table
+
+
+class _BareRepository:
+    async def load(self) -> None:
+        return None
+
+
+@instrument_repository
+class _TimedRepository:
+    async def load(self) -> None:
+        return None
+
+
+def _per_call_ns(operation: Callable[[], None], calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        operation()
+    return (time.perf_counter() - started) / calls * 1e9
+
+
+def _per_await_ns(method: Callable[[], object], calls: int) -> float:
+    async def loop() -> float:
+        started = time.perf_counter()
+        for _ in range(calls):
+            await method()
+        return (time.perf_counter() - started) / calls * 1e9
+
+    return asyncio.run(loop())
+
+
+def main(calls: int) -> None:
+    metrics = MetricsRegistry()
+    counter = metrics.counter("bench_total", "Benchmark counter.", ("outcome",))
+    histogram = metrics.histogram("bench_seconds", "Benchmark latency.", ("route", "status"))
+
+    rows: Dict[str, Dict[str, float]] = {
+        "counter": {"ns_per_call": _per_call_ns(lambda: counter.labels("ok").inc(), calls)},
+        "histogram": {
+            "ns_per_call": _per_call_ns(
+                lambda: histogram.labels("/api/history", "200").observe(0.012), calls
+            )
+        },
+        "bare_method": {"ns_per_call": _per_await_ns(_BareRepository().load, calls)},
+        "timed_method": {"ns_per_call": _per_await_ns(_TimedRepository().load, calls)},
+        "render": {"ns_per_call": _per_call_ns(metrics.render, 1000)},
+    }
+    print_table(f"Instrumentation cost over {calls} calls", rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200000)
+    args = parser.parse_args()
+    main(args.calls)
@@ -0,0 +1,40 @@
+"""Measure what the in-memory rate limiter adds to each request.
+
+Runs in-process; no MongoDB is needed.
+
+    python -m benchmarks.rate_limit_overhead --requests 20000 --keys 500
+
+Rows:
+    hit_now   one ``MemoryRateLimitStore.hit_now`` decision, cycling over
+              ``--keys`` clients under a limit that never rejects
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from backend.rate_limiting import MemoryRateLimitStore, RateLimitPolicy
+from benchmarks.common import print_table
+
+
+def main(requests: int, keys: int) -> None:
+    store = MemoryRateLimitStore()
+    policy = RateLimitPolicy("api", limit=10**9)
+    client_keys = [f"user:{index}" for index in range(keys)]
+
+    started = time.perf_counter()
+    for index in range(requests):
+        store.hit_now(policy, client_keys[index % keys])
+    elapsed = time.perf_counter() - started
+
+    rows = {"hit_now": {"us_per_request": elapsed / requests * 1e6}}
+    print_table(f"Rate limit overhead over {requests} requests, {keys} keys", rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--keys", type=int, default=500)
+    args = parser.parse_args()
+    main(args.requests, args.keys)
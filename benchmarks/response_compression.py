@@ -0,0 +1,119 @@
+"""Report the bandwidth/CPU trade-off of response compression on real payloads.
+
+Runs in-process; no MongoDB is needed.
+
+    python -m benchmarks.response_compression --repetitions 200
+
+Payloads:
+    report    a full HealthResponse for a symptom with a five-article PubMed digest
+    history   a 50-item /api/history page
+
+Each row shows the encoded size, the ratio to the uncompressed JSON and the
+median time to compress one body. brotli rows appear when the ``brotli``
+package is installed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import time
+from typing import Dict, List, Tuple
+
+from backend.compression import CompressionPolicy, brotli, compress
+from backend.external_integrations.pubmed import format_research_digest
+from backend.services.analysis import build_analysis_response
+from benchmarks.common import percentile, print_table
+
+REQUEST = {
+    "symptom": "recurring migraine with nausea",
+    "duration": "3 weeks",
+    "severity": "moderate",
+    "additional_info": "worse in the afternoon, sensitive to light",
+    "age": 34,
+    "gender": "female",
+    "medical_history": "seasonal allergies",
+}
+
+
+def report_payload() -> bytes:
+    research = {
+        "success": True,
+        "query": REQUEST["symptom"],
+        "results": [
+            {
+                "title": f"Dietary and lifestyle interventions for episodic migraine: trial {index}",
+                "journal": "Cephalalgia",
+                "pubdate": f"2024 Mar {index + 1}",
+                "authors": ["Smith J", "Garcia M", "Chen L", "Okafor A"],
+                "url": f"https://pubmed.ncbi.nlm.nih.gov/3800000{index}/",
+            }
+            for index in range(5)
+        ],
+    }
+    digest = format_research_digest(REQUEST["symptom"], research)
+    return json.dumps(build_analysis_response(REQUEST, digest)).encode()
+
+
+def history_payload() -> bytes:
+    report = build_analysis_response(REQUEST, "")
+    items = [
+        {
+            "id": f"66f0c1d2e3a4b5c6d7e8f9{index:02d}",
+            "symptom": REQUEST["symptom"],
+            "severity": REQUEST["severity"],
+            "duration": REQUEST["duration"],
+            "created_at": f"2026-03-{index % 28 + 1:02d}T10:00:00+00:00",
+            "risk_assessment": report["risk_assessment"],
+        }
+        for index in range(50)
+    ]
+    return json.dumps(items).encode()
+
+
+def strategies() -> List[Tuple[str, str, CompressionPolicy]]:
+    rows = [
+        (f"gzip-{level}", "gzip", CompressionPolicy(gzip_level=level)) for level in (1, 6, 9)
+    ]
+    if brotli is not None:
+        rows += [
+            (f"br-{quality}", "br", CompressionPolicy(brotli_quality=quality))
+            for quality in (4, 11)
+        ]
+    return rows
+
+
+def measure_payload(body: bytes, repetitions: int) -> Dict[str, Dict[str, float]]:
+    rows: Dict[str, Dict[str, float]] = {
+        "identity": {"bytes": float(len(body)), "ratio": 1.0, "median_us": 0.0, "p95_us": 0.0}
+    }
+    for name, encoding, policy in strategies():
+        samples: List[float] = []
+        for _ in range(repetitions):
+            started = time.perf_counter()
+            encoded = compress(body, encoding, policy)
+            samples.append((time.perf_counter() - started) * 1_000_000)
+        rows[name] = {
+            "bytes": float(len(encoded)),
+            "ratio": len(encoded) / len(body),
+            "median_us": statistics.median(samples),
+            "p95_us": percentile(samples, 0.95),
+        }
+    return rows
+
+
+def main(repetitions: int) -> None:
+    for title, body in (("report", report_payload()), ("history", history_payload())):
+        print_table(
+            f"Compression of a {title} payload ({len(body)} bytes)",
+            measure_payload(body, repetitions),
+        )
+        print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repetitions", type=int, default=200)
+    args = parser.parse_args()
+    main(args.repetitions)
@@ -0,0 +1,141 @@
+"""Measure API throughput as the launcher's worker count grows.
+
+Starts ``python -m backend.launcher`` with 1, 2, 4, ... workers (up to
+``--max-workers``, default the CPU count) and drives ``/api/health`` from
+``--clients`` load-generator processes for ``--seconds`` each. No MongoDB is
+needed; the endpoint exercises the full middleware stack and JSON rendering.
+
+    python -m benchmarks.worker_scaling --max-workers 4 --clients 4 --seconds 10
+
+Load generators share the machine with the workers, so leave spare cores or
+expect the curve to flatten early.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.common import percentile, print_table
+
+PATH = "/api/health"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_up(base_url: str, timeout_seconds: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout_seconds
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(base_url + PATH, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f"API at {base_url} did not start")
+
+
+async def _drive(base_url: str, seconds: float, concurrency: int) -> List[float]:
+    latencies: List[float] = []
+    deadline = time.perf_counter() + seconds
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits) as client:
+
+        async def loop() -> None:
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await client.get(PATH)
+                response.raise_for_status()
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        await asyncio.gather(*[loop() for _ in range(concurrency)])
+    return latencies
+
+
+def _client_process(base_url: str, seconds: float, concurrency: int, results: multiprocessing.Queue) -> None:
+    results.put(asyncio.run(_drive(base_url, seconds, concurrency)))
+
+
+def run_level(workers: int, *, clients: int, seconds: float, concurrency: int) -> Dict[str, float]:
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = {
+        **os.environ,
+        "WEB_CONCURRENCY": str(workers),
+        # Every request comes from one IP; keep the limiter out of the measurement.
+        "RATE_LIMIT_ENABLED": "false",
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "backend.launcher", "--host", "127.0.0.1", "--port", str(port)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_until_up(base_url)
+        context = multiprocessing.get_context("spawn")
+        results: multiprocessing.Queue = context.Queue()
+        generators = [
+            context.Process(target=_client_process, args=(base_url, seconds, concurrency, results))
+            for _ in range(clients)
+        ]
+        for generator in generators:
+            generator.start()
+        latencies = [value for _ in generators for value in results.get()]
+        for generator in generators:
+            generator.join()
+    finally:
+        server.terminate()
+        server.wait(30)
+
+    return {
+        "req_per_s": len(latencies) / seconds,
+        "median_ms": statistics.median(latencies),
+        "p95_ms": percentile(latencies, 0.95),
+    }
+
+
+def main(max_workers: int, clients: int, seconds: float, concurrency: int) -> None:
+    levels: List[int] = []
+    workers = 1
+    while workers < max_workers:
+        levels.append(workers)
+        workers *= 2
+    levels.append(max_workers)
+
+    rows: Dict[str, Dict[str, float]] = {}
+    for workers in levels:
+        rows[f"{workers} worker(s)"] = run_level(
+            workers, clients=clients, seconds=seconds, concurrency=concurrency
+        )
+
+    print_table(
+        f"Worker scaling: {clients} client process(es) x {concurrency} connections, "
+        f"{seconds:.0f}s per level",
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--clients", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+    main(args.max_workers, args.clients, args.seconds, args.concurrency)
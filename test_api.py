@@ -1,7 +1,24 @@
+import asyncio
+import dataclasses
+import threading
+from types import SimpleNamespace
+
+import httpx
 from fastapi.testclient import TestClient
 
 from backend import server
-from backend.repositories import AnalysisPersistenceError
+from backend.caching import TTLCache
+from backend.mongo_monitoring import CommandMonitor
+from backend.repositories import (
+    AnalysisPayloadStore,
+    AnalysisPersistenceError,
+    AnalysisRepository,
+    UserRepository,
+    InvalidCursorError,
+    resolve_timeframe,
+)
+from backend.services.analysis import build_analysis_response
+from tests.fakes import FakeDatabase
 
 
 class FakeAnalysisRepository:
@@ -21,6 +38,9 @@ class FakeAnalysisRepository:
                 },
             }
         ]
+        self.detail_record = None
+        self.page_requests = []
+        self.next_cursor = None
         self.dashboard_payload = {
             "user_id": "user-123",
             "symptom_trends": [],
@@ -56,23 +76,41 @@ class FakeAnalysisRepository:
         del user_id, limit
         return self.history_records
 
+    async def list_user_analyses_page(self, user_id: str, *, limit: int, cursor=None):
+        del user_id
+        self.page_requests.append({"limit": limit, "cursor": cursor})
+        if cursor == "bad":
+            raise InvalidCursorError("Invalid history cursor.")
+        return self.history_records[:limit], self.next_cursor
+
+    async def get_user_analysis(self, user_id: str, analysis_id: str):
+        del user_id
+        if analysis_id != "analysis-1":
+            return None
+        return self.detail_record
+
     async def get_recent_symptoms(self, user_id: str, limit: int = 10):
         del user_id, limit
         return [{"symptom": "headache", "severity": "moderate"}]
 
-    async def build_dashboard(self, user_id: str):
-        del user_id
+    async def build_dashboard(self, user_id: str, *, data_version=None):
+        del user_id, data_version
         return self.dashboard_payload
 
-    async def build_pattern_analysis(self, user_id: str, timeframe: str = "month"):
-        del user_id
+    async def build_pattern_analysis(
+        self, user_id: str, timeframe: str = "month", *, start=None, end=None, data_version=None
+    ):
+        del user_id, data_version
+        resolve_timeframe(timeframe, start=start, end=end)
         payload = dict(self.pattern_payload)
         payload["timeframe"] = timeframe
         return payload
 
 
 class FakeUserRepository:
-    def __init__(self):
+    def __init__(self, credits_remaining=4):
+        self.credits_remaining = credits_remaining
+        self.released_leases = []
         self.credit_summary = {
             "user_id": "user-123",
             "email": "test@example.com",
@@ -89,6 +127,18 @@ class FakeUserRepository:
         del user_id
         return self.credit_summary
 
+    async def reserve_credit(self, user_id: str, *, ttl_seconds: float):
+        del user_id, ttl_seconds
+        if self.credits_remaining <= 0:
+            raise ValueError("No credits remaining")
+        self.credits_remaining -= 1
+        return SimpleNamespace(lease_id=f"lease-{self.credits_remaining}")
+
+    async def release_credit_lease(self, user_id: str, lease_id: str):
+        del user_id
+        self.released_leases.append(lease_id)
+        return True
+
 
 def create_client(monkeypatch, *, database_available=True, database_error=None):
     async def fake_connect():
@@ -104,6 +154,7 @@ def create_client(monkeypatch, *, database_available=True, database_error=None):
     monkeypatch.setattr(server, "connect_to_mongo", fake_connect)
     monkeypatch.setattr(server, "close_mongo_connection", fake_close)
     monkeypatch.setattr(server, "initialize_indexes", fake_initialize_indexes)
+    server.rate_limit_store.clear()
     monkeypatch.setattr(
         server,
         "get_database_health",
@@ -118,7 +169,7 @@ def create_client(monkeypatch, *, database_available=True, database_error=None):
 
 
 def stub_authenticated_user(monkeypatch, credits_remaining=5):
-    async def fake_get_current_user_document(_authorization):
+    async def fake_get_current_user_document(_authorization, **_options):
         return {
             "user_id": "user-123",
             "email": "test@example.com",
@@ -158,6 +209,33 @@ def test_health_reports_degraded_database(monkeypatch):
     assert payload["degraded_features"]
 
 
+def test_requests_fail_fast_while_database_reconnects(monkeypatch):
+    reconnect_requests = []
+
+    def database_down():
+        raise server.DatabaseUnavailableError("Database has not been initialized.")
+
+    with create_client(monkeypatch) as client:
+        async def unexpected_connect():
+            raise AssertionError("request handlers must not reconnect inline")
+
+        monkeypatch.setattr(server, "connect_to_mongo", unexpected_connect)
+        monkeypatch.setattr(server, "get_database", database_down)
+        monkeypatch.setattr(
+            server,
+            "start_background_reconnect",
+            lambda: reconnect_requests.append(True),
+        )
+        monkeypatch.setattr(server, "_auth_header_to_user", lambda _: {"sub": "user-123"})
+
+        response = client.get(
+            "/api/history", headers={"Authorization": "Bearer test-token"}
+        )
+
+    assert response.status_code == 503
+    assert reconnect_requests == [True]
+
+
 def test_credits_requires_authentication(monkeypatch):
     with create_client(monkeypatch) as client:
         response = client.get("/api/credits")
@@ -215,7 +293,9 @@ def test_analyze_symptom_uses_durable_persistence_workflow(monkeypatch):
 
 def test_analyze_symptom_rejects_users_without_credits(monkeypatch):
     stub_authenticated_user(monkeypatch, credits_remaining=0)
-    monkeypatch.setattr(server, "user_repository", lambda db=None: FakeUserRepository())
+    monkeypatch.setattr(
+        server, "user_repository", lambda db=None: FakeUserRepository(credits_remaining=0)
+    )
     monkeypatch.setattr(
         server,
         "analysis_repository",
@@ -233,6 +313,105 @@ def test_analyze_symptom_rejects_users_without_credits(monkeypatch):
     assert "used all 5 credits" in response.json()["detail"]
 
 
+def test_parallel_analyses_never_overspend_or_waste_research(monkeypatch):
+    db = FakeDatabase(users=("user_id",))
+    db.users.documents.append(
+        {"user_id": "user-123", "credits_total": 5, "credits_remaining": 1}
+    )
+    stored_find_one_and_update = db.users.find_one_and_update
+
+    async def interleaved_find_one_and_update(*args, **kwargs):
+        # Let the other requests run before this write is applied atomically.
+        await asyncio.sleep(0)
+        return await stored_find_one_and_update(*args, **kwargs)
+
+    monkeypatch.setattr(db.users, "find_one_and_update", interleaved_find_one_and_update)
+    research_calls = []
+
+    stub_authenticated_user(monkeypatch, credits_remaining=1)
+    monkeypatch.setattr(server, "user_repository", lambda db_=None: UserRepository(db.users))
+    monkeypatch.setattr(
+        server,
+        "analysis_repository",
+        lambda db_=None: AnalysisRepository(
+            db.symptom_analyses, payload_store=AnalysisPayloadStore(db.analysis_payloads)
+        ),
+    )
+    monkeypatch.setattr(
+        server,
+        "get_pubmed_research",
+        lambda **kwargs: research_calls.append(kwargs)
+        or {"success": True, "query": kwargs["symptom"], "results": []},
+    )
+
+    async def fire_requests():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(
+                *[
+                    client.post(
+                        "/api/analyze-symptom",
+                        headers={"Authorization": "Bearer test-token"},
+                        json={"symptom": "headache"},
+                    )
+                    for _ in range(5)
+                ]
+            )
+
+    responses = asyncio.run(fire_requests())
+
+    assert sorted(response.status_code for response in responses) == [200, 403, 403, 403, 403]
+    assert len(research_calls) == 1
+    user = db.users.documents[0]
+    assert user["credits_remaining"] == 0
+    assert user["credit_leases"] == []
+    assert len(db.symptom_analyses.documents) == 1
+
+
+def test_slow_pubmed_call_does_not_stall_other_requests(monkeypatch):
+    stub_authenticated_user(monkeypatch)
+
+    entered = threading.Event()
+    release = threading.Event()
+
+    def slow_pubmed_research(**kwargs):
+        entered.set()
+        release.wait(5)
+        return {"query": kwargs["symptom"], "results": []}
+
+    monkeypatch.setattr(server, "get_pubmed_research", slow_pubmed_research)
+    monkeypatch.setattr(
+        server,
+        "get_database_health",
+        lambda: {"available": True, "database": "smart_health_advisor_ai", "error": None},
+    )
+    server.rate_limit_store.clear()
+
+    async def fire_requests():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            search = asyncio.ensure_future(
+                client.post(
+                    "/api/real-time-search",
+                    headers={"Authorization": "Bearer test-token"},
+                    json={"query": "migraine"},
+                )
+            )
+            assert await asyncio.to_thread(entered.wait, 5)
+            # The PubMed call is still blocked, yet the loop answers health checks.
+            health = await client.get("/api/health")
+            search_was_pending = not search.done()
+            release.set()
+            return health, search_was_pending, await search
+
+    health, search_was_pending, search = asyncio.run(fire_requests())
+
+    assert health.status_code == 200
+    assert search_was_pending
+    assert search.status_code == 200
+    assert health.json()["blocking_executor"]["pool_size"] == server.settings.blocking_pool_size
+
+
 def test_analyze_symptom_returns_reconciliation_error_on_failed_persist(monkeypatch):
     fake_analysis_repo = FakeAnalysisRepository()
     fake_analysis_repo.raise_on_create = AnalysisPersistenceError(
@@ -279,6 +458,14 @@ def test_history_dashboard_and_pattern_routes(monkeypatch):
         "analysis_repository",
         lambda db=None: fake_analysis_repo,
     )
+    lookups = []
+    stubbed_lookup = server._get_current_user_document
+
+    async def recording_lookup(authorization, **options):
+        lookups.append(options)
+        return await stubbed_lookup(authorization, **options)
+
+    monkeypatch.setattr(server, "_get_current_user_document", recording_lookup)
 
     with create_client(monkeypatch) as client:
         history_response = client.get(
@@ -305,6 +492,36 @@ def test_history_dashboard_and_pattern_routes(monkeypatch):
 
     assert pattern_response.status_code == 200
     assert pattern_response.json()["patterns"]["recurring_patterns"]
+    # Memoized views and ETags are keyed on a version read past the user cache.
+    assert lookups == [{"fresh_version": True}] * 3
+
+
+def test_pattern_analysis_rejects_invalid_custom_timeframe(monkeypatch):
+    stub_authenticated_user(monkeypatch, credits_remaining=4)
+    monkeypatch.setattr(
+        server, "analysis_repository", lambda db=None: FakeAnalysisRepository()
+    )
+
+    with create_client(monkeypatch) as client:
+        missing_start = client.post(
+            "/api/pattern-analysis",
+            headers={"Authorization": "Bearer test-token"},
+            json={"timeframe": "custom"},
+        )
+        custom_range = client.post(
+            "/api/pattern-analysis",
+            headers={"Authorization": "Bearer test-token"},
+            json={
+                "timeframe": "custom",
+                "start": "2026-03-01T00:00:00+00:00",
+                "end": "2026-04-01T00:00:00+00:00",
+            },
+        )
+
+    assert missing_start.status_code == 400
+    assert "start" in missing_start.json()["detail"]
+    assert custom_range.status_code == 200
+    assert custom_range.json()["timeframe"] == "custom"
 
 
 def test_realtime_search_degrades_gracefully_when_pubmed_is_unavailable(monkeypatch):
@@ -337,3 +554,354 @@ def test_realtime_search_degrades_gracefully_when_pubmed_is_unavailable(monkeypa
     payload = response.json()
     assert "currently unavailable" in payload["results"]
     assert payload["source_count"] == "0 PubMed summary result(s)"
+
+
+def test_real_time_search_is_rate_limited_per_client(monkeypatch):
+    stub_authenticated_user(monkeypatch)
+    pubmed_calls = []
+
+    def fake_pubmed_research(**kwargs):
+        pubmed_calls.append(kwargs)
+        return {"query": kwargs["symptom"], "results": []}
+
+    monkeypatch.setattr(server, "get_pubmed_research", fake_pubmed_research)
+    limit = server.RATE_LIMIT_POLICIES["/api/real-time-search"].limit
+
+    with create_client(monkeypatch) as client:
+        responses = [
+            client.post(
+                "/api/real-time-search",
+                headers={"Authorization": "Bearer test-token"},
+                json={"query": "migraine"},
+            )
+            for _ in range(limit + 1)
+        ]
+        health = client.get("/api/health")
+
+    assert [response.status_code for response in responses] == [200] * limit + [429]
+    assert responses[0].headers["X-RateLimit-Remaining"] == str(limit - 1)
+    assert int(responses[-1].headers["Retry-After"]) >= 1
+    assert len(pubmed_calls) == limit
+    assert health.status_code == 200
+
+
+def test_history_detail_loads_full_report(monkeypatch):
+    fake_analysis_repo = FakeAnalysisRepository()
+    request_payload = {
+        "symptom": "headache",
+        "duration": "2 days",
+        "severity": "moderate",
+        "additional_info": "",
+        "age": None,
+        "gender": "",
+        "medical_history": "",
+    }
+    fake_analysis_repo.detail_record = {
+        "_id": "analysis-1",
+        "symptom": "headache",
+        "severity_label": "moderate",
+        "duration": "2 days",
+        "created_at": "2026-03-17T10:00:00+00:00",
+        "risk_assessment": {"immediate_risk": "Low"},
+        "request_payload": request_payload,
+        "response_payload": build_analysis_response(request_payload, "Digest"),
+    }
+
+    stub_authenticated_user(monkeypatch, credits_remaining=4)
+    monkeypatch.setattr(
+        server,
+        "analysis_repository",
+        lambda db=None: fake_analysis_repo,
+    )
+
+    with create_client(monkeypatch) as client:
+        detail_response = client.get(
+            "/api/history/analysis-1",
+            headers={"Authorization": "Bearer test-token"},
+        )
+        missing_response = client.get(
+            "/api/history/analysis-2",
+            headers={"Authorization": "Bearer test-token"},
+        )
+
+    assert detail_response.status_code == 200
+    payload = detail_response.json()
+    assert payload["risk_assessment"]["immediate_risk"] == "Low"
+    assert payload["request"]["symptom"] == "headache"
+    assert payload["report"]["ai_web_research"] == "Digest"
+    assert missing_response.status_code == 404
+
+
+def test_history_pages_with_opaque_cursor(monkeypatch):
+    fake_analysis_repo = FakeAnalysisRepository()
+    fake_analysis_repo.next_cursor = "next-page"
+
+    stub_authenticated_user(monkeypatch, credits_remaining=4)
+    monkeypatch.setattr(
+        server,
+        "analysis_repository",
+        lambda db=None: fake_analysis_repo,
+    )
+
+    with create_client(monkeypatch) as client:
+        first_page = client.get(
+            "/api/history?limit=1",
+            headers={"Authorization": "Bearer test-token"},
+        )
+        bad_cursor = client.get(
+            "/api/history?cursor=bad",
+            headers={"Authorization": "Bearer test-token"},
+        )
+        oversized = client.get(
+            "/api/history?limit=100000",
+            headers={"Authorization": "Bearer test-token"},
+        )
+
+    assert first_page.status_code == 200
+    assert first_page.headers["X-Next-Cursor"] == "next-page"
+    assert fake_analysis_repo.page_requests[0] == {"limit": 1, "cursor": None}
+    assert bad_cursor.status_code == 400
+    assert oversized.status_code == 422
+
+
+def test_history_page_is_compressed_for_gzip_clients(monkeypatch):
+    fake_analysis_repo = FakeAnalysisRepository()
+    fake_analysis_repo.history_records = [
+        {**fake_analysis_repo.history_records[0], "_id": f"analysis-{index}"}
+        for index in range(50)
+    ]
+
+    stub_authenticated_user(monkeypatch, credits_remaining=4)
+    monkeypatch.setattr(server, "analysis_repository", lambda db=None: fake_analysis_repo)
+
+    with create_client(monkeypatch) as client:
+        compressed = client.get(
+            "/api/history?limit=50",
+            headers={"Authorization": "Bearer test-token", "Accept-Encoding": "gzip"},
+        )
+        plain = client.get(
+            "/api/history?limit=50",
+            headers={"Authorization": "Bearer test-token", "Accept-Encoding": "identity"},
+        )
+
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert int(compressed.headers["Content-Length"]) < int(plain.headers["Content-Length"]) / 4
+    assert "Content-Encoding" not in plain.headers
+    assert compressed.json() == plain.json()
+
+
+def test_unchanged_history_dashboard_and_credits_return_304(monkeypatch):
+    fake_analysis_repo = FakeAnalysisRepository()
+    fake_user_repo = FakeUserRepository()
+    user_doc = {"user_id": "user-123", "email": "test@example.com", "data_version": 7}
+    database_calls = []
+
+    async def fake_get_current_user_document(_authorization, **_options):
+        return dict(user_doc)
+
+    async def fake_ensure_database_available(feature_name):
+        database_calls.append(feature_name)
+        return {"db": "ok"}
+
+    monkeypatch.setattr(server, "_get_current_user_document", fake_get_current_user_document)
+    monkeypatch.setattr(server, "_ensure_database_available", fake_ensure_database_available)
+    monkeypatch.setattr(server, "analysis_repository", lambda db=None: fake_analysis_repo)
+    monkeypatch.setattr(server, "user_repository", lambda db=None: fake_user_repo)
+
+    paths = ["/api/history?limit=20", "/api/health-dashboard/user-123", "/api/credits"]
+    auth = {"Authorization": "Bearer test-token"}
+    with create_client(monkeypatch) as client:
+        first = [client.get(path, headers=auth) for path in paths]
+        database_calls.clear()
+        repeated = [
+            client.get(path, headers={**auth, "If-None-Match": response.headers["ETag"]})
+            for path, response in zip(paths, first)
+        ]
+        other_page = client.get(
+            "/api/history?limit=5",
+            headers={**auth, "If-None-Match": first[0].headers["ETag"]},
+        )
+        user_doc["data_version"] = 8
+        after_change = client.get(
+            "/api/credits", headers={**auth, "If-None-Match": first[2].headers["ETag"]}
+        )
+
+    etags = [response.headers["ETag"] for response in first]
+    assert all(response.status_code == 200 for response in first)
+    assert len(set(etags)) == 3
+    assert all(etag.startswith('"7-') for etag in etags)
+    assert first[0].headers["Cache-Control"] == "private, no-cache"
+
+    assert [response.status_code for response in repeated] == [304, 304, 304]
+    assert [response.headers["ETag"] for response in repeated] == etags
+    assert repeated[0].content == b""
+    assert database_calls == ["History", "Credits"]
+
+    assert other_page.status_code == 200
+    assert after_change.status_code == 200
+    assert after_change.headers["ETag"].startswith('"8-')
+
+
+def test_conditional_requests_see_versions_bumped_by_other_workers(monkeypatch):
+    db = FakeDatabase()
+    db.users.documents.append(
+        {"user_id": "user-123", "email": "test@example.com", "data_version": 7}
+    )
+    cached_users = UserRepository(db.users, cache=TTLCache(maxsize=10, ttl_seconds=30))
+
+    async def fake_ensure_database_available(_feature_name):
+        return db
+
+    monkeypatch.setattr(server, "_auth_header_to_user", lambda _header: {"sub": "user-123"})
+    monkeypatch.setattr(server, "_ensure_database_available", fake_ensure_database_available)
+    monkeypatch.setattr(server, "user_repository", lambda db=None: cached_users)
+
+    async def scenario():
+        await server._get_current_user_document("Bearer token")
+        # Another worker stores an analysis; this worker's cached copy is stale.
+        db.users.documents[0]["data_version"] = 8
+        cached = await server._get_current_user_document("Bearer token")
+        fresh = await server._get_current_user_document("Bearer token", fresh_version=True)
+        return cached, fresh
+
+    cached, fresh = asyncio.run(scenario())
+
+    assert cached["data_version"] == 7
+    assert fresh["data_version"] == 8
+    assert server._user_resource_etag(fresh, "credits").startswith('"8-')
+
+
+def test_compressed_etag_revalidates(monkeypatch):
+    fake_analysis_repo = FakeAnalysisRepository()
+    fake_analysis_repo.history_records = [
+        {**fake_analysis_repo.history_records[0], "_id": f"analysis-{index}"}
+        for index in range(50)
+    ]
+
+    stub_authenticated_user(monkeypatch, credits_remaining=4)
+    monkeypatch.setattr(server, "analysis_repository", lambda db=None: fake_analysis_repo)
+
+    headers = {"Authorization": "Bearer test-token", "Accept-Encoding": "gzip"}
+    with create_client(monkeypatch) as client:
+        compressed = client.get("/api/history?limit=50", headers=headers)
+        revalidated = client.get(
+            "/api/history?limit=50",
+            headers={**headers, "If-None-Match": compressed.headers["ETag"]},
+        )
+
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.headers["ETag"].endswith('-gzip"')
+    assert revalidated.status_code == 304
+
+
+def test_metrics_endpoint_reports_request_latency_by_route(monkeypatch):
+    stub_authenticated_user(monkeypatch, credits_remaining=4)
+    monkeypatch.setattr(server, "analysis_repository", lambda db=None: FakeAnalysisRepository())
+
+    with create_client(monkeypatch) as client:
+        disabled = client.get("/metrics")
+
+    monkeypatch.setattr(
+        server, "settings", dataclasses.replace(server.settings, metrics_token="scrape-secret")
+    )
+    with create_client(monkeypatch) as client:
+        client.get("/api/history", headers={"Authorization": "Bearer test-token"})
+        client.get("/api/history/analysis-1", headers={"Authorization": "Bearer test-token"})
+        client.get("/no-such-page")
+        anonymous = client.get("/metrics")
+        forbidden = client.get("/metrics", headers={"Authorization": "Bearer guess"})
+        response = client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+
+    assert disabled.status_code == 404
+    assert anonymous.status_code == forbidden.status_code == 403
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert "# TYPE http_request_duration_seconds histogram" in body
+    assert 'route="/api/history",status="200"' in body
+    assert 'route="/api/history/{analysis_id}"' in body
+    assert 'route="unmatched",status="404"' in body
+    assert "# TYPE cache_hit_ratio gauge" in body
+    assert 'blocking_executor_active{worker="0"} 0' in body
+
+
+def test_profiling_endpoints_require_the_admin_token(monkeypatch):
+    with create_client(monkeypatch) as client:
+        disabled = client.get("/admin/profiles", headers={"X-Admin-Token": "secret"})
+
+    monkeypatch.setattr(
+        server, "settings", dataclasses.replace(server.settings, profiling_admin_token="secret")
+    )
+    with create_client(monkeypatch) as client:
+        forbidden = client.get("/admin/profiles", headers={"X-Admin-Token": "guess"})
+        listed = client.get("/admin/profiles", headers={"X-Admin-Token": "secret"})
+        too_long = client.get(
+            "/admin/profile/capture?seconds=3600", headers={"X-Admin-Token": "secret"}
+        )
+        capture = client.get(
+            "/admin/profile/capture?seconds=0.1&interval_ms=10",
+            headers={"X-Admin-Token": "secret"},
+        )
+        started = client.post(
+            "/admin/profile/sampler/start?interval_ms=20", headers={"X-Admin-Token": "secret"}
+        )
+        stopped = client.post("/admin/profile/sampler/stop", headers={"X-Admin-Token": "secret"})
+
+    assert disabled.status_code == 404
+    assert forbidden.status_code == 403
+    assert listed.json()["profiles"] == []
+    assert too_long.status_code == 400
+    assert capture.status_code == 200
+    assert capture.headers["X-Worker-Pid"]
+    assert "MainThread;" in capture.text
+    assert started.json()["running"] is True
+    assert started.json()["interval_ms"] == 20
+    assert stopped.json()["running"] is False
+
+
+def test_mongo_query_shapes_are_listed_for_admins(monkeypatch):
+    monkeypatch.setattr(
+        server, "settings", dataclasses.replace(server.settings, profiling_admin_token="secret")
+    )
+    monitor = CommandMonitor(0.1)
+    monitor.record("find", "users", '{"filter":{"email":"?"}}', 0.3)
+    monitor.record("find", "users", '{"filter":{"google_sub":"?"}}', 0.01)
+    monkeypatch.setattr(server, "command_monitor", monitor)
+
+    with create_client(monkeypatch) as client:
+        forbidden = client.get("/admin/mongo/query-shapes")
+        listed = client.get(
+            "/admin/mongo/query-shapes?limit=1&order_by=max&reset=true",
+            headers={"X-Admin-Token": "secret"},
+        )
+
+    assert forbidden.status_code == 403
+    body = listed.json()
+    assert body["commands"] == 2
+    assert [shape["shape"] for shape in body["shapes"]] == ['{"filter":{"email":"?"}}']
+    assert body["shapes"][0]["slow"] == 1
+    assert monitor.report() == []
+
+
+def test_analysis_response_reports_stage_timings(monkeypatch):
+    stub_authenticated_user(monkeypatch, credits_remaining=5)
+    monkeypatch.setattr(server, "user_repository", lambda db=None: FakeUserRepository())
+    monkeypatch.setattr(server, "analysis_repository", lambda db=None: FakeAnalysisRepository())
+    monkeypatch.setattr(
+        server,
+        "get_pubmed_research",
+        lambda **kwargs: {"success": True, "query": kwargs["symptom"], "results": []},
+    )
+
+    with create_client(monkeypatch) as client:
+        response = client.post(
+            "/api/analyze-symptom",
+            headers={"Authorization": "Bearer test-token"},
+            json={"symptom": "headache", "severity": "moderate"},
+        )
+
+    assert response.status_code == 200
+    assert len(response.headers["X-Trace-Id"]) == 32
+    stages = [entry.split(";")[0] for entry in response.headers["Server-Timing"].split(", ")]
+    assert "rule_engine" in stages
+    assert stages[-1] == "total"
@@ -0,0 +1,637 @@
+"""Minimal in-memory stand-ins for the Motor collection API used in tests."""
+
+from __future__ import annotations
+
+import copy
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+_MISSING = object()
+
+
+def _get_path(document: Dict[str, Any], path: str) -> Any:
+    value: Any = document
+    for part in path.split("."):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        else:
+            return _MISSING
+    return value
+
+
+def _set_path(document: Dict[str, Any], path: str, value: Any) -> None:
+    parts = path.split(".")
+    target = document
+    for part in parts[:-1]:
+        target = target.setdefault(part, {})
+    target[parts[-1]] = value
+
+
+def _unset_path(document: Dict[str, Any], path: str) -> None:
+    parts = path.split(".")
+    target = document
+    for part in parts[:-1]:
+        target = target.get(part, {})
+    target.pop(parts[-1], None)
+
+
+_BSON_TYPE_ALIASES = {"string": str, "date": datetime}
+
+
+def _type_rank(value: Any) -> int:
+    """Position of a value's BSON type in MongoDB's cross-type sort order."""
+    if value is _MISSING or value is None:
+        return 0
+    if isinstance(value, bool):
+        return 7
+    if isinstance(value, (int, float)):
+        return 1
+    if isinstance(value, str):
+        return 2
+    if isinstance(value, dict):
+        return 3
+    if isinstance(value, list):
+        return 4
+    if isinstance(value, bytes):
+        return 5
+    if isinstance(value, ObjectId):
+        return 6
+    if isinstance(value, datetime):
+        return 8
+    return 9
+
+
+def _compare(value: Any, operator: str, expected: Any) -> bool:
+    if operator == "$type":
+        return isinstance(value, _BSON_TYPE_ALIASES[expected])
+    if operator == "$in":
+        return value in expected
+    if operator == "$ne":
+        return value != expected
+    if value is _MISSING or value is None:
+        return False
+    # Range operators only match values of the same BSON type.
+    if _type_rank(value) != _type_rank(expected):
+        return False
+    if operator == "$gt":
+        return value > expected
+    if operator == "$gte":
+        return value >= expected
+    if operator == "$lt":
+        return value < expected
+    if operator == "$lte":
+        return value <= expected
+    raise NotImplementedError(operator)
+
+
+def _matches_value(value: Any, condition: Any) -> bool:
+    if isinstance(condition, dict) and condition and all(
+        key.startswith("$") for key in condition
+    ):
+        normalized = _MISSING if value is _MISSING else value
+        return all(
+            _compare(normalized, operator, expected)
+            for operator, expected in condition.items()
+        )
+    if value is _MISSING:
+        return condition is None
+    return value == condition
+
+
+def matches(document: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(document, clause) for clause in condition):
+                return False
+        elif "." in key and isinstance(_get_path(document, key.split(".")[0]), list):
+            head, rest = key.split(".", 1)
+            items = _get_path(document, head)
+            if isinstance(condition, dict) and list(condition) == ["$ne"]:
+                # On an array, $ne matches only when no element equals the value.
+                if any(
+                    isinstance(item, dict) and _get_path(item, rest) == condition["$ne"]
+                    for item in items
+                ):
+                    return False
+            elif not any(
+                isinstance(item, dict) and _matches_value(_get_path(item, rest), condition)
+                for item in items
+            ):
+                return False
+        elif not _matches_value(_get_path(document, key), condition):
+            return False
+    return True
+
+
+def _to_date(value: Any, on_error: Any, on_null: Any) -> Any:
+    if value is None:
+        return on_null
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return on_error
+
+
+def _evaluate(document: Dict[str, Any], expression: Any) -> Any:
+    """Evaluate the aggregation expressions used in pipeline updates and stages."""
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = _get_path(document, expression[1:])
+        return None if value is _MISSING else value
+    if not isinstance(expression, dict):
+        return expression
+    if not any(key.startswith("$") for key in expression):
+        return {key: _evaluate(document, value) for key, value in expression.items()}
+    if len(expression) != 1:
+        return expression
+    [(operator, operands)] = expression.items()
+    if operator in {"$trim", "$convert", "$dateToString"}:
+        named = {key: _evaluate(document, value) for key, value in operands.items()}
+        if operator == "$trim":
+            return named["input"].strip() if isinstance(named["input"], str) else None
+        if operator == "$convert" and named["to"] == "date":
+            return _to_date(named["input"], named.get("onError"), named.get("onNull"))
+        if operator == "$dateToString":
+            date = named["date"]
+            return date.strftime(named["format"]) if isinstance(date, datetime) else None
+        raise NotImplementedError(operator)
+    if not isinstance(operands, list):
+        operands = [operands]
+    values = [_evaluate(document, operand) for operand in operands]
+    if operator == "$toLower":
+        return values[0].lower() if isinstance(values[0], str) else ""
+    if operator == "$ifNull":
+        return next((value for value in values if value is not None), None)
+    if operator == "$cond":
+        return values[1] if values[0] else values[2]
+    if operator == "$lte":
+        return values[0] <= values[1]
+    if operator == "$add":
+        return sum(values)
+    raise NotImplementedError(operator)
+
+
+def apply_update(
+    document: Dict[str, Any],
+    update: Any,
+    *,
+    inserting: bool = False,
+) -> None:
+    if isinstance(update, list):
+        for stage in update:
+            [(name, fields)] = stage.items()
+            if name != "$set":
+                raise NotImplementedError(name)
+            values = {path: _evaluate(document, value) for path, value in fields.items()}
+            for path, value in values.items():
+                _set_path(document, path, copy.deepcopy(value))
+        return
+
+    for operator, fields in update.items():
+        if operator == "$setOnInsert" and not inserting:
+            continue
+        for path, value in fields.items():
+            if operator in {"$set", "$setOnInsert"}:
+                _set_path(document, path, copy.deepcopy(value))
+            elif operator == "$inc":
+                current = _get_path(document, path)
+                _set_path(document, path, (0 if current is _MISSING else current) + value)
+            elif operator == "$push":
+                current = _get_path(document, path)
+                items = [] if current is _MISSING else list(current)
+                if isinstance(value, dict) and "$each" in value:
+                    new_items = copy.deepcopy(value["$each"])
+                    position = value.get("$position", len(items))
+                    items[position:position] = new_items
+                    if "$slice" in value:
+                        limit = value["$slice"]
+                        items = items[:limit] if limit >= 0 else items[limit:]
+                else:
+                    items.append(copy.deepcopy(value))
+                _set_path(document, path, items)
+            elif operator == "$pull":
+                current = _get_path(document, path)
+                if current is _MISSING:
+                    continue
+                _set_path(
+                    document,
+                    path,
+                    [
+                        item
+                        for item in current
+                        if not (
+                            matches(item, value)
+                            if isinstance(value, dict)
+                            else item == value
+                        )
+                    ],
+                )
+            else:
+                raise NotImplementedError(operator)
+
+
+def _project(document: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    result = copy.deepcopy(document)
+    if not projection:
+        return result
+
+    if all(not value for key, value in projection.items() if key != "_id"):
+        for path, value in projection.items():
+            if not value:
+                _unset_path(result, path)
+        return result
+
+    projected: Dict[str, Any] = {}
+    if projection.get("_id", 1):
+        projected["_id"] = result.get("_id")
+    for path, value in projection.items():
+        if path == "_id" or not value:
+            continue
+        found = _get_path(result, path)
+        if found is not _MISSING:
+            _set_path(projected, path, found)
+    return projected
+
+
+def _project_stage(document: Dict[str, Any], spec: Dict[str, Any]) -> Dict[str, Any]:
+    computed = {
+        path: value
+        for path, value in spec.items()
+        if not isinstance(value, (bool, int))
+    }
+    if not computed:
+        return _project(document, spec)
+    projected: Dict[str, Any] = {}
+    if spec.get("_id", 1):
+        projected["_id"] = document.get("_id")
+    for path, value in spec.items():
+        found = _get_path(document, path)
+        if value == 1 and path != "_id" and found is not _MISSING:
+            _set_path(projected, path, copy.deepcopy(found))
+    for path, expression in computed.items():
+        _set_path(projected, path, _evaluate(document, expression))
+    return projected
+
+
+def _group_stage(documents: List[Dict[str, Any]], spec: Dict[str, Any]) -> List[Dict[str, Any]]:
+    groups: Dict[str, Dict[str, Any]] = {}
+    for document in documents:
+        key = _evaluate(document, spec["_id"])
+        group = groups.setdefault(repr(key), {"_id": key})
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            [(operator, operand)] = accumulator.items()
+            if operator != "$sum":
+                raise NotImplementedError(operator)
+            group[field] = group.get(field, 0) + _evaluate(document, operand)
+    return list(groups.values())
+
+
+def run_pipeline(documents: List[Dict[str, Any]], pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Apply the aggregation stages the repositories use to in-memory documents."""
+    for stage in pipeline:
+        [(name, spec)] = stage.items()
+        if name == "$match":
+            documents = [item for item in documents if matches(item, spec)]
+        elif name == "$sort":
+            documents = FakeCursor(list(documents)).sort(list(spec.items()))._documents
+        elif name == "$limit":
+            documents = documents[:spec]
+        elif name == "$project":
+            documents = [_project_stage(item, spec) for item in documents]
+        elif name == "$group":
+            documents = _group_stage(documents, spec)
+        elif name == "$facet":
+            documents = [
+                {field: run_pipeline(documents, stages) for field, stages in spec.items()}
+            ]
+        else:
+            raise NotImplementedError(name)
+    return documents
+
+
+class FakeCursor:
+    def __init__(self, documents: List[Dict[str, Any]]) -> None:
+        self._documents = documents
+
+    def sort(self, key: Any, direction: Optional[int] = None) -> "FakeCursor":
+        keys = [(key, direction)] if isinstance(key, str) else list(key)
+        for field, order in reversed(keys):
+            self._documents.sort(
+                key=lambda item: _sort_key(_get_path(item, field)),
+                reverse=order == -1,
+            )
+        return self
+
+    def limit(self, count: int) -> "FakeCursor":
+        if count:
+            self._documents = self._documents[:count]
+        return self
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self._documents[:length] if length else list(self._documents)
+
+    def __aiter__(self):
+        self._iterator = iter(self._documents)
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            raise StopAsyncIteration from None
+
+
+def _sort_key(value: Any) -> tuple:
+    rank = _type_rank(value)
+    if rank == 0:
+        return (0, "")
+    if isinstance(value, ObjectId):
+        return (rank, str(value))
+    return (rank, value)
+
+
+class FakeCollection:
+    """Async, single-process collection that applies each operation atomically."""
+
+    def __init__(
+        self,
+        name: str = "collection",
+        unique_fields: tuple[str, ...] = (),
+    ) -> None:
+        self.name = name
+        self.documents: List[Dict[str, Any]] = []
+        self.unique_fields = unique_fields
+        self.calls: List[str] = []
+
+    def _check_unique(self, candidate: Dict[str, Any], ignore: Any = None) -> None:
+        for field in ("_id", *self.unique_fields):
+            value = _get_path(candidate, field)
+            if value is _MISSING:
+                continue
+            for existing in self.documents:
+                if existing is not ignore and _get_path(existing, field) == value:
+                    raise DuplicateKeyError(f"E11000 duplicate key on {field}")
+
+    def _first(self, query: Dict[str, Any], sort: Any = None) -> Optional[Dict[str, Any]]:
+        candidates = [item for item in self.documents if matches(item, query)]
+        if sort:
+            candidates = FakeCursor(candidates).sort(sort)._documents
+        return candidates[0] if candidates else None
+
+    def _upsert_document(self, query: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+        document = {
+            key: copy.deepcopy(value)
+            for key, value in query.items()
+            if not key.startswith("$") and not isinstance(value, dict)
+        }
+        apply_update(document, update, inserting=True)
+        document.setdefault("_id", ObjectId())
+        self._check_unique(document)
+        self.documents.append(document)
+        return document
+
+    async def insert_one(self, document: Dict[str, Any], session: Any = None) -> Any:
+        self.calls.append("insert_one")
+        document.setdefault("_id", ObjectId())
+        self._check_unique(document)
+        self.documents.append(copy.deepcopy(document))
+        return SimpleNamespace(inserted_id=document["_id"])
+
+    async def insert_many(
+        self,
+        documents: List[Dict[str, Any]],
+        ordered: bool = True,
+        session: Any = None,
+    ) -> Any:
+        self.calls.append("insert_many")
+        for index, document in enumerate(documents):
+            document.setdefault("_id", ObjectId())
+            try:
+                self._check_unique(document)
+            except DuplicateKeyError as exc:
+                raise BulkWriteError(
+                    {
+                        "nInserted": index,
+                        "writeErrors": [{"index": index, "code": 11000, "errmsg": str(exc)}],
+                    }
+                ) from exc
+            self.documents.append(copy.deepcopy(document))
+        return SimpleNamespace(inserted_ids=[item["_id"] for item in documents])
+
+    async def find_one(
+        self,
+        query: Optional[Dict[str, Any]] = None,
+        projection: Optional[Dict[str, Any]] = None,
+        session: Any = None,
+        sort: Any = None,
+    ) -> Optional[Dict[str, Any]]:
+        self.calls.append("find_one")
+        found = self._first(query or {}, sort)
+        return _project(found, projection) if found is not None else None
+
+    def find(
+        self,
+        query: Optional[Dict[str, Any]] = None,
+        projection: Optional[Dict[str, Any]] = None,
+        session: Any = None,
+    ) -> FakeCursor:
+        self.calls.append("find")
+        return FakeCursor(
+            [
+                _project(item, projection)
+                for item in self.documents
+                if matches(item, query or {})
+            ]
+        )
+
+    async def find_one_and_update(
+        self,
+        query: Dict[str, Any],
+        update: Dict[str, Any],
+        *,
+        upsert: bool = False,
+        return_document: bool = ReturnDocument.BEFORE,
+        projection: Optional[Dict[str, Any]] = None,
+        session: Any = None,
+        sort: Any = None,
+    ) -> Optional[Dict[str, Any]]:
+        self.calls.append("find_one_and_update")
+        found = self._first(query, sort)
+        if found is None:
+            if not upsert:
+                return None
+            created = self._upsert_document(query, update)
+            return _project(created, projection) if return_document else None
+
+        before = copy.deepcopy(found)
+        candidate = copy.deepcopy(found)
+        apply_update(candidate, update)
+        self._check_unique(candidate, ignore=found)
+        found.clear()
+        found.update(candidate)
+        return _project(found if return_document else before, projection)
+
+    async def update_one(
+        self,
+        query: Dict[str, Any],
+        update: Dict[str, Any],
+        upsert: bool = False,
+        session: Any = None,
+    ) -> Any:
+        self.calls.append("update_one")
+        return self._update(query, update, upsert=upsert, many=False)
+
+    async def replace_one(
+        self,
+        query: Dict[str, Any],
+        replacement: Dict[str, Any],
+        upsert: bool = False,
+        session: Any = None,
+    ) -> Any:
+        self.calls.append("replace_one")
+        found = self._first(query)
+        if found is None:
+            if upsert:
+                self.documents.append(copy.deepcopy(replacement))
+            return SimpleNamespace(matched_count=0)
+        preserved_id = found.get("_id")
+        found.clear()
+        found.update(copy.deepcopy(replacement))
+        found.setdefault("_id", preserved_id)
+        return SimpleNamespace(matched_count=1)
+
+    async def update_many(
+        self,
+        query: Dict[str, Any],
+        update: Dict[str, Any],
+        upsert: bool = False,
+        session: Any = None,
+    ) -> Any:
+        self.calls.append("update_many")
+        return self._update(query, update, upsert=upsert, many=True)
+
+    def _update(
+        self,
+        query: Dict[str, Any],
+        update: Dict[str, Any],
+        *,
+        upsert: bool,
+        many: bool,
+    ) -> Any:
+        targets = [item for item in self.documents if matches(item, query)]
+        if not many:
+            targets = targets[:1]
+        for item in targets:
+            apply_update(item, update)
+        upserted_id = None
+        if not targets and upsert:
+            upserted_id = self._upsert_document(query, update)["_id"]
+        return SimpleNamespace(
+            matched_count=len(targets),
+            modified_count=len(targets),
+            upserted_id=upserted_id,
+        )
+
+    def aggregate(self, pipeline: List[Dict[str, Any]], session: Any = None) -> FakeCursor:
+        self.calls.append("aggregate")
+        return FakeCursor(run_pipeline(copy.deepcopy(self.documents), pipeline))
+
+    async def distinct(self, key: str, query: Optional[Dict[str, Any]] = None) -> List[Any]:
+        self.calls.append("distinct")
+        values: List[Any] = []
+        for item in self.documents:
+            value = _get_path(item, key)
+            if matches(item, query or {}) and value is not _MISSING and value not in values:
+                values.append(value)
+        return values
+
+    async def delete_many(self, query: Dict[str, Any], session: Any = None) -> Any:
+        self.calls.append("delete_many")
+        kept = [item for item in self.documents if not matches(item, query)]
+        deleted = len(self.documents) - len(kept)
+        self.documents = kept
+        return SimpleNamespace(deleted_count=deleted)
+
+    async def bulk_write(
+        self,
+        requests: List[Any],
+        ordered: bool = True,
+        session: Any = None,
+    ) -> Any:
+        self.calls.append("bulk_write")
+        modified = 0
+        for request in requests:
+            if isinstance(request, UpdateOne):
+                modified += self._update(
+                    request._filter,
+                    request._doc,
+                    upsert=bool(request._upsert),
+                    many=False,
+                ).modified_count
+            else:
+                raise NotImplementedError(type(request).__name__)
+        return SimpleNamespace(acknowledged=True, modified_count=modified)
+
+
+class FakeDatabase:
+    """Attribute-style access to lazily created fake collections."""
+
+    def __init__(self, **unique_fields: tuple[str, ...]) -> None:
+        self._collections: Dict[str, FakeCollection] = {}
+        self._unique_fields = unique_fields
+
+    def __getattr__(self, name: str) -> FakeCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(
+                name,
+                unique_fields=self._unique_fields.get(name, ()),
+            )
+        return self._collections[name]
+
+
+class FakeSession:
+    def __init__(self, client: "FakeClient") -> None:
+        self.client = client
+
+    async def __aenter__(self) -> "FakeSession":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        return None
+
+    async def with_transaction(self, callback: Any) -> Any:
+        if self.client.transaction_error is not None:
+            raise self.client.transaction_error
+        snapshots = {
+            name: copy.deepcopy(collection.documents)
+            for name, collection in self.client.database._collections.items()
+        }
+        self.client.transactions += 1
+        try:
+            return await callback(self)
+        except BaseException:
+            for name, documents in snapshots.items():
+                self.client.database._collections[name].documents = documents
+            raise
+
+
+class FakeClient:
+    """Client whose sessions roll every collection back when a transaction aborts."""
+
+    def __init__(self, database: FakeDatabase) -> None:
+        self.database = database
+        self.transactions = 0
+        self.transaction_error: Optional[BaseException] = None
+
+    async def start_session(self) -> FakeSession:
+        return FakeSession(self)
@@ -0,0 +1,96 @@
+"""Local stand-in for Google's JWKS endpoint, plus helpers to mint ID tokens."""
+
+import base64
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+import rsa
+from jose import jwt
+
+
+def _b64_uint(value: int) -> str:
+    raw = value.to_bytes((value.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+class SigningKey:
+    def __init__(self, kid: str) -> None:
+        self.kid = kid
+        self.public_key, self.private_key = rsa.newkeys(1024)
+
+    @property
+    def jwk(self) -> Dict[str, Any]:
+        return {
+            "kty": "RSA",
+            "alg": "RS256",
+            "use": "sig",
+            "kid": self.kid,
+            "n": _b64_uint(self.public_key.n),
+            "e": _b64_uint(self.public_key.e),
+        }
+
+    def sign(self, **overrides: Any) -> str:
+        now = int(time.time())
+        claims: Dict[str, Any] = {
+            "iss": "https://accounts.google.com",
+            "aud": "test-client-id",
+            "sub": "google-sub-1",
+            "email": "person@example.com",
+            "email_verified": True,
+            "name": "Test Person",
+            "iat": now,
+            "exp": now + 3600,
+        }
+        claims.update(overrides)
+        return jwt.encode(
+            claims,
+            self.private_key.save_pkcs1().decode("ascii"),
+            algorithm="RS256",
+            headers={"kid": self.kid},
+        )
+
+
+class JWKSServer:
+    """Serves ``keys`` as a JWKS document with a configurable Cache-Control header."""
+
+    def __init__(self, keys: List[SigningKey], cache_control: str = "public, max-age=3600") -> None:
+        self.keys = keys
+        self.cache_control = cache_control
+        self.status = 200
+        self.requests = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        assert self._server is not None
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/oauth2/v3/certs"
+
+    def __enter__(self) -> "JWKSServer":
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                stand_in.requests += 1
+                body = json.dumps({"keys": [key.jwk for key in stand_in.keys]}).encode()
+                self.send_response(stand_in.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Cache-Control", stand_in.cache_control)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *_args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *_exc: Any) -> None:
+        assert self._server is not None
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,90 @@
+import time
+
+import pytest
+
+from backend.caching import TTLCache, cache_registry
+from backend.services import auth
+from backend.services.auth import (
+    AuthConfig,
+    AuthError,
+    create_access_token,
+    decode_access_token,
+    get_auth_config,
+)
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    cache_registry.clear()
+    yield
+    cache_registry.clear()
+
+
+@pytest.fixture
+def decode_calls(monkeypatch):
+    calls = []
+    real_decode = auth.jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        calls.append(args[0])
+        return real_decode(*args, **kwargs)
+
+    monkeypatch.setattr(auth.jwt, "decode", counting_decode)
+    return calls
+
+
+def test_auth_config_is_built_once():
+    assert get_auth_config() is get_auth_config()
+
+
+def test_verified_tokens_are_served_from_cache(decode_calls):
+    token, _ = create_access_token("user-1", "user@example.com")
+
+    first = decode_access_token(token)
+    first["sub"] = "tampered"
+    second = decode_access_token(token)
+
+    assert second["sub"] == "user-1"
+    assert len(decode_calls) == 1
+
+
+def test_tokens_decoded_with_another_config_bypass_the_cache(decode_calls):
+    config = AuthConfig(jwt_secret="other-secret")
+    token, _ = create_access_token("user-1", "user@example.com", config=config)
+
+    decode_access_token(token, config=config)
+    decode_access_token(token, config=config)
+
+    assert len(decode_calls) == 2
+    with pytest.raises(AuthError):
+        decode_access_token(token)
+
+
+def test_cached_tokens_still_expire_at_exp(monkeypatch, decode_calls):
+    clock = FakeClock()
+    cache = TTLCache(maxsize=100, ttl_seconds=300, clock=clock)
+    monkeypatch.setattr(auth, "_access_token_cache", lambda: cache)
+    config = get_auth_config()
+    token = auth.jwt.encode(
+        {"sub": "user-1", "email": "user@example.com", "exp": int(time.time()) + 60},
+        config.jwt_secret,
+        algorithm=config.jwt_algorithm,
+    )
+    decode_access_token(token)
+
+    clock.now += 30
+    decode_access_token(token)
+    assert len(decode_calls) == 1
+
+    # Past exp the cache no longer vouches for the token; jose checks it again.
+    clock.now += 31
+    decode_access_token(token)
+    assert len(decode_calls) == 2
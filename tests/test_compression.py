@@ -0,0 +1,97 @@
+import asyncio
+import gzip
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from backend.compression import (
+    CompressionMiddleware,
+    CompressionPolicy,
+    compress,
+    negotiate_encoding,
+)
+
+REPORT = {"sections": [{"title": f"Section {index}", "text": "hydrate and rest " * 20} for index in range(20)]}
+
+
+def make_client(offloaded=None, offload_threshold=64 * 1024):
+    app = FastAPI()
+
+    @app.get("/api/report")
+    async def report():
+        return REPORT
+
+    @app.get("/api/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/api/health")
+    async def health():
+        return REPORT
+
+    @app.get("/api/stream")
+    async def stream():
+        return StreamingResponse(iter([b"x" * 4096, b"y" * 4096]), media_type="text/plain")
+
+    async def offload(func, *args):
+        offloaded.append(len(args[0]))
+        return await asyncio.to_thread(func, *args)
+
+    app.add_middleware(
+        CompressionMiddleware,
+        routes={"/api/health": None},
+        offload_threshold=offload_threshold,
+        offload=offload if offloaded is not None else None,
+    )
+    return TestClient(app)
+
+
+def test_negotiation_respects_quality_values():
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("gzip;q=0, deflate") is None
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding("*") in {"br", "gzip"}
+    assert negotiate_encoding("") is None
+
+
+def test_large_json_is_gzipped_when_accepted():
+    response = make_client().get("/api/report", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(response.content) / 5
+    assert response.json() == REPORT
+
+
+def test_small_disabled_streamed_and_identity_responses_are_untouched():
+    client = make_client()
+
+    for path, headers in [
+        ("/api/small", {"Accept-Encoding": "gzip"}),
+        ("/api/health", {"Accept-Encoding": "gzip"}),
+        ("/api/stream", {"Accept-Encoding": "gzip"}),
+        ("/api/report", {"Accept-Encoding": "identity"}),
+    ]:
+        response = client.get(path, headers=headers)
+        assert "content-encoding" not in response.headers, path
+        # Identity responses on compressible routes must still vary by coding.
+        expected_vary = None if path == "/api/health" else "Accept-Encoding"
+        assert response.headers.get("vary") == expected_vary, path
+
+
+def test_large_bodies_are_compressed_off_the_event_loop():
+    offloaded = []
+    client = make_client(offloaded, offload_threshold=1024)
+
+    response = client.get("/api/report", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(offloaded) == 1 and offloaded[0] > 1024
+
+
+def test_gzip_output_is_deterministic():
+    body = b"{}" * 1000
+    policy = CompressionPolicy()
+    assert compress(body, "gzip", policy) == compress(body, "gzip", policy)
+    assert gzip.decompress(compress(body, "gzip", policy)) == body
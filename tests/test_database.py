@@ -0,0 +1,78 @@
+import asyncio
+import dataclasses
+
+from backend import database
+from backend.database import DatabaseManager, DatabaseUnavailableError
+
+
+def configure(monkeypatch, **overrides):
+    values = {
+        "mongo_url": "mongodb://mongo.invalid:27017",
+        "mongo_reconnect_initial_delay_ms": 1,
+        "mongo_reconnect_max_delay_seconds": 0.01,
+        **overrides,
+    }
+    monkeypatch.setattr(
+        database, "settings", dataclasses.replace(database.settings, **values)
+    )
+
+
+def test_single_supervisor_reconnects_with_backoff(monkeypatch):
+    configure(monkeypatch)
+    manager = DatabaseManager()
+    attempts = []
+
+    async def flaky_connect():
+        attempts.append(True)
+        if len(attempts) < 3:
+            raise DatabaseUnavailableError("MongoDB is unavailable")
+        manager._database = object()
+        return manager._database
+
+    manager.connect = flaky_connect
+
+    async def scenario():
+        manager.start_reconnect()
+        first_task = manager._reconnect_task
+        manager.start_reconnect()
+        assert manager._reconnect_task is first_task
+
+        snapshot = manager.health_snapshot()["reconnect"]
+        assert snapshot["state"] == "reconnecting"
+        assert snapshot["next_attempt_at"] is not None
+
+        await asyncio.wait_for(first_task, 1)
+
+    asyncio.run(scenario())
+
+    assert len(attempts) == 3
+    snapshot = manager.health_snapshot()["reconnect"]
+    assert snapshot == {"state": "connected", "attempts": 3, "next_attempt_at": None}
+
+
+def test_backoff_delay_is_capped(monkeypatch):
+    configure(monkeypatch)
+    manager = DatabaseManager()
+    manager._reconnect_attempts = 50
+
+    assert all(0 <= manager._reconnect_delay() <= 0.01 for _ in range(100))
+
+    # Days of failed attempts must not overflow the backoff computation.
+    manager._reconnect_attempts = 5000
+    assert 0 <= manager._reconnect_delay() <= 0.01
+
+
+def test_disconnect_stops_the_supervisor(monkeypatch):
+    configure(monkeypatch, mongo_reconnect_initial_delay_ms=60000)
+    manager = DatabaseManager()
+
+    async def scenario():
+        manager.start_reconnect()
+        task = manager._reconnect_task
+        await manager.disconnect()
+        return task
+
+    task = asyncio.run(scenario())
+
+    assert task.cancelled()
+    assert manager.health_snapshot()["reconnect"]["state"] == "idle"
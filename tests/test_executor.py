@@ -0,0 +1,95 @@
+import asyncio
+import contextvars
+import threading
+
+import pytest
+
+from backend.executor import BlockingExecutor, ExecutorSaturatedError
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+def test_calls_run_off_the_loop_thread_with_the_callers_context():
+    executor = BlockingExecutor(max_workers=2, max_queue_size=2)
+
+    async def scenario():
+        request_id.set("req-1")
+        return await executor.run(lambda: (threading.get_ident(), request_id.get()))
+
+    thread_id, seen_request_id = asyncio.run(scenario())
+    executor.shutdown()
+
+    assert thread_id != threading.get_ident()
+    assert seen_request_id == "req-1"
+    assert executor.metrics()["completed"] == 1
+
+
+def test_calls_beyond_the_queue_limit_are_rejected():
+    executor = BlockingExecutor(max_workers=1, max_queue_size=1)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(release.wait, 5))
+        while executor.metrics()["active"] == 0:
+            await asyncio.sleep(0.001)
+        queued = asyncio.ensure_future(executor.run(lambda: "queued"))
+        await asyncio.sleep(0)
+
+        with pytest.raises(ExecutorSaturatedError):
+            await executor.run(lambda: "rejected")
+
+        metrics = executor.metrics()
+        release.set()
+        return metrics, await running, await queued
+
+    metrics, first, second = asyncio.run(scenario())
+    executor.shutdown()
+
+    assert metrics["active"] == 1
+    assert metrics["queued"] == 1
+    assert metrics["saturation"] == 1.0
+    assert metrics["rejected"] == 1
+    assert first is True
+    assert second == "queued"
+
+
+def test_cancelled_queued_calls_release_their_queue_slot():
+    executor = BlockingExecutor(max_workers=1, max_queue_size=1)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(release.wait, 5))
+        while executor.metrics()["active"] == 0:
+            await asyncio.sleep(0.001)
+        queued = asyncio.ensure_future(executor.run(lambda: "never"))
+        await asyncio.sleep(0)
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        after_cancel = executor.metrics()["queued"]
+
+        accepted = asyncio.ensure_future(executor.run(lambda: "accepted"))
+        await asyncio.sleep(0)
+        release.set()
+        return after_cancel, await running, await accepted
+
+    after_cancel, first, second = asyncio.run(scenario())
+    executor.shutdown()
+
+    assert after_cancel == 0
+    assert (first, second) == (True, "accepted")
+    assert executor.metrics()["queued"] == 0
+    assert executor.metrics()["rejected"] == 0
+
+
+def test_failures_propagate_and_are_counted():
+    executor = BlockingExecutor(max_workers=1, max_queue_size=1)
+
+    def explode():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError, match="boom"):
+        asyncio.run(executor.run(explode))
+    executor.shutdown()
+
+    assert executor.metrics()["failed"] == 1
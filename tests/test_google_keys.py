@@ -0,0 +1,141 @@
+import time
+
+import pytest
+
+from backend.services.auth import AuthConfig, AuthError, verify_google_id_token
+from backend.services.google_keys import GoogleKeySet, cache_lifetime_seconds
+from tests.jwks_server import JWKSServer, SigningKey
+
+CONFIG = AuthConfig(
+    google_client_id="test-client-id",
+    google_jwks_enabled=True,
+    google_tokeninfo_fallback=False,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(scope="module")
+def signing_key():
+    return SigningKey("key-1")
+
+
+def test_valid_token_is_verified_without_refetching_keys(signing_key):
+    with JWKSServer([signing_key]) as server:
+        key_set = GoogleKeySet(server.url)
+        for _ in range(3):
+            profile = verify_google_id_token(signing_key.sign(), CONFIG, key_set)
+
+        assert profile.google_sub == "google-sub-1"
+        assert profile.email == "person@example.com"
+        assert server.requests == 1
+
+
+@pytest.mark.parametrize(
+    "claims, message",
+    [
+        ({"aud": "someone-else"}, "audience"),
+        ({"iss": "https://evil.example.com"}, "issuer"),
+        ({"exp": int(time.time()) - 60}, "expired"),
+        ({"email_verified": False}, "verified"),
+    ],
+)
+def test_claim_checks_are_enforced(signing_key, claims, message):
+    with JWKSServer([signing_key]) as server:
+        with pytest.raises(AuthError, match=message):
+            verify_google_id_token(
+                signing_key.sign(**claims), CONFIG, GoogleKeySet(server.url)
+            )
+
+
+def test_token_signed_by_another_key_with_a_known_kid_is_rejected(signing_key):
+    forger = SigningKey("key-1")
+    with JWKSServer([signing_key]) as server:
+        with pytest.raises(AuthError, match="Invalid Google ID token"):
+            verify_google_id_token(forger.sign(), CONFIG, GoogleKeySet(server.url))
+
+
+def test_unknown_kid_triggers_a_refresh_for_rotated_keys(signing_key):
+    rotated = SigningKey("key-2")
+    with JWKSServer([signing_key]) as server:
+        clock = FakeClock()
+        key_set = GoogleKeySet(server.url, min_refresh_interval_seconds=30, clock=clock)
+        verify_google_id_token(signing_key.sign(), CONFIG, key_set)
+
+        server.keys = [signing_key, rotated]
+        clock.now = 31
+        profile = verify_google_id_token(rotated.sign(sub="rotated"), CONFIG, key_set)
+
+        assert profile.google_sub == "rotated"
+        assert server.requests == 2
+
+
+def test_keys_expire_per_cache_control_and_survive_a_failed_refresh(signing_key):
+    with JWKSServer([signing_key], cache_control="public, max-age=60") as server:
+        clock = FakeClock()
+        key_set = GoogleKeySet(server.url, min_refresh_interval_seconds=0, clock=clock)
+        verify_google_id_token(signing_key.sign(), CONFIG, key_set)
+        assert key_set.metrics()["expires_in_seconds"] == 60
+
+        clock.now = 61
+        server.status = 503
+        profile = verify_google_id_token(signing_key.sign(), CONFIG, key_set)
+
+        assert profile.google_sub == "google-sub-1"
+        assert server.requests == 2
+        assert key_set.metrics()["failures"] == 1
+
+
+def test_unreachable_key_server_without_fallback_is_an_auth_error(signing_key):
+    with JWKSServer([signing_key]) as server:
+        url = server.url
+    with pytest.raises(AuthError, match="signing keys"):
+        verify_google_id_token(
+            signing_key.sign(), CONFIG, GoogleKeySet(url, timeout_seconds=1)
+        )
+
+
+def test_cache_lifetime_accounts_for_age_header():
+    headers = {"Cache-Control": "public, max-age=19800, must-revalidate", "Age": "800"}
+    assert cache_lifetime_seconds(headers, default=5) == 19000
+    assert cache_lifetime_seconds({}, default=5) == 5
+
+
+def test_refresh_backoff_is_capped_after_many_failures():
+    key_set = GoogleKeySet("http://keys.invalid", min_refresh_interval_seconds=1)
+
+    assert key_set.failure_backoff_seconds(1) == 1
+    assert key_set.failure_backoff_seconds(4) == 8
+    assert key_set.failure_backoff_seconds(5000) == 600
+
+
+def test_tokeninfo_fallback_is_used_when_keys_are_unavailable(monkeypatch, signing_key):
+    from backend.services import auth
+
+    calls = []
+
+    def fake_tokeninfo(id_token):
+        calls.append(id_token)
+        return {
+            "aud": "test-client-id",
+            "iss": "accounts.google.com",
+            "sub": "via-tokeninfo",
+            "email": "person@example.com",
+            "email_verified": "true",
+        }
+
+    monkeypatch.setattr(auth, "_fetch_tokeninfo_claims", fake_tokeninfo)
+    config = CONFIG.model_copy(update={"google_tokeninfo_fallback": True})
+    with JWKSServer([]) as server:
+        profile = verify_google_id_token(
+            signing_key.sign(), config, GoogleKeySet(server.url)
+        )
+
+    assert profile.google_sub == "via-tokeninfo"
+    assert len(calls) == 1
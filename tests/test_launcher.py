@@ -0,0 +1,179 @@
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+import uvicorn
+
+from backend import launcher
+from backend.caching import cache_registry
+from backend.database import database_manager
+from backend.executor import blocking_executor
+from backend.external_integrations import pubmed
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _worker_pids(base_url, attempts=20):
+    pids = set()
+    for _ in range(attempts):
+        pids.add(httpx.get(base_url + "/api/health", timeout=5).json()["worker_pid"])
+    return pids
+
+
+def _wait_for(predicate, timeout_seconds=60):
+    deadline = time.monotonic() + timeout_seconds
+    while time.monotonic() < deadline:
+        try:
+            if predicate():
+                return True
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def test_forked_children_drop_process_bound_state():
+    database_manager._client = object()
+    database_manager._database = object()
+    pubmed._http_session()
+    cache_registry.get("fork-test", maxsize=2, ttl_seconds=60).set("key", "value")
+    blocking_executor._active = 3
+
+    pid = os.fork()
+    if pid == 0:
+        ok = (
+            database_manager._client is None
+            and database_manager._database is None
+            and pubmed._session is None
+            and cache_registry.get("fork-test", maxsize=2, ttl_seconds=60).get("key") is None
+            and blocking_executor.metrics()["active"] == 0
+        )
+        os._exit(0 if ok else 1)
+
+    _, status = os.waitpid(pid, 0)
+    database_manager._client = None
+    database_manager._database = None
+    blocking_executor._active = 0
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert cache_registry.get("fork-test", maxsize=2, ttl_seconds=60).get("key") == "value"
+
+
+def test_launcher_reloads_workers_on_sighup_and_stops_on_sigterm():
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = {**os.environ, "MONGO_URL": "", "RATE_LIMIT_ENABLED": "false"}
+    supervisor = subprocess.Popen(
+        [sys.executable, "-m", "backend.launcher", "--workers", "2", "--host", "127.0.0.1", "--port", str(port)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        assert _wait_for(lambda: len(_worker_pids(base_url)) == 2)
+        original = _worker_pids(base_url)
+
+        supervisor.send_signal(signal.SIGHUP)
+        assert _wait_for(lambda: _worker_pids(base_url).isdisjoint(original))
+        assert len(_worker_pids(base_url, attempts=40)) == 2
+
+        supervisor.send_signal(signal.SIGTERM)
+        assert supervisor.wait(30) == 0
+    finally:
+        if supervisor.poll() is None:
+            supervisor.kill()
+            supervisor.wait()
+
+
+class FakeProcess:
+    def __init__(self, pid, alive=True):
+        self.pid = pid
+        self.alive = alive
+        self.exitcode = None if alive else 1
+        self.terminated = False
+
+    def is_alive(self):
+        return self.alive
+
+    def join(self, timeout=None):
+        return None
+
+    def terminate(self):
+        self.terminated = True
+        self.alive = False
+
+    def kill(self):
+        self.alive = False
+
+
+def fake_worker(pid, *, alive=True, ready=True, started_at=0.0):
+    event = threading.Event()
+    if ready:
+        event.set()
+    return launcher._Worker(FakeProcess(pid, alive), event, started_at=started_at)
+
+
+def make_supervisor(monkeypatch, spawned):
+    supervisor = launcher.WorkerSupervisor(None, 1, startup_timeout_seconds=1)
+
+    def spawn_worker(index):
+        worker = spawned.pop(0)
+        worker.started_at = time.monotonic()
+        return worker
+
+    monkeypatch.setattr(supervisor, "_spawn_worker", spawn_worker)
+    return supervisor
+
+
+def test_worker_is_not_ready_when_startup_asks_it_to_exit(monkeypatch):
+    async def failed_startup(self, sockets=None):
+        self.should_exit = True
+
+    monkeypatch.setattr(uvicorn.Server, "startup", failed_startup)
+    ready = threading.Event()
+    server = launcher._WorkerServer(uvicorn.Config("backend.server:app"), ready)
+
+    asyncio.run(server.startup())
+
+    assert not ready.is_set()
+
+
+def test_reload_keeps_the_old_worker_when_the_replacement_dies(monkeypatch):
+    old = fake_worker(100)
+    replacement = fake_worker(101, alive=False, ready=False)
+    supervisor = make_supervisor(monkeypatch, [replacement])
+    supervisor._workers = [old]
+
+    supervisor._rolling_restart()
+
+    assert supervisor._workers == [old]
+    assert not old.process.terminated
+
+
+def test_crashing_workers_are_restarted_with_backoff(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(launcher.time, "monotonic", lambda: now[0])
+    spawned = [fake_worker(pid, alive=False, ready=False) for pid in (201, 202, 203)]
+    supervisor = make_supervisor(monkeypatch, spawned)
+    supervisor._workers = [fake_worker(200, alive=False, ready=False, started_at=990.0)]
+
+    restarted_at = []
+    for _ in range(10):
+        supervisor._replace_dead_workers()
+        if supervisor._workers[0].started_at == now[0]:
+            restarted_at.append(now[0] - 1000.0)
+        now[0] += 0.5
+
+    # Each crash is noticed on the next tick, then waits 0.5 s, 1 s and 2 s.
+    assert restarted_at == [0.5, 2.0, 4.5]
+    assert supervisor._workers[0].failures == 3
+    assert [launcher.crash_backoff_seconds(n) for n in (1, 2, 3, 20)] == [0.5, 1.0, 2.0, 30.0]
@@ -0,0 +1,142 @@
+import asyncio
+import socket
+import threading
+import time
+
+import httpx
+import pytest
+
+from backend.metrics import (
+    EventLoopLagMonitor,
+    Histogram,
+    MetricsRegistry,
+    MetricsServer,
+    instrument_repository,
+    registry,
+)
+
+
+def test_histogram_renders_cumulative_buckets_sum_and_count():
+    metrics = MetricsRegistry()
+    latency = metrics.histogram(
+        "stage_seconds", "Stage latency.", ("stage",), buckets=(0.1, 1.0)
+    )
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.labels("search").observe(value)
+
+    lines = metrics.render().splitlines()
+
+    assert lines[:2] == ["# HELP stage_seconds Stage latency.", "# TYPE stage_seconds histogram"]
+    assert lines[2:] == [
+        'stage_seconds_bucket{stage="search",le="0.1"} 2',
+        'stage_seconds_bucket{stage="search",le="1"} 3',
+        'stage_seconds_bucket{stage="search",le="+Inf"} 4',
+        'stage_seconds_sum{stage="search"} 3.65',
+        'stage_seconds_count{stage="search"} 4',
+    ]
+
+
+def test_counters_from_many_threads_are_summed_at_scrape_time():
+    metrics = MetricsRegistry()
+    charges = metrics.counter("charges_total", "Charges.", ("outcome",))
+
+    def charge() -> None:
+        for _ in range(10000):
+            charges.labels("ok").inc()
+
+    threads = [threading.Thread(target=charge) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert 'charges_total{outcome="ok"} 80000' in metrics.render()
+
+
+def test_label_values_are_escaped_and_arity_is_checked():
+    metrics = MetricsRegistry()
+    counter = metrics.counter("paths_total", "Paths.", ("path",))
+    counter.labels('a"b\\c').inc()
+
+    assert 'paths_total{path="a\\"b\\\\c"} 1' in metrics.render()
+    with pytest.raises(ValueError):
+        counter.labels("a", "b")
+
+
+def test_repository_methods_are_timed_by_outcome():
+    @instrument_repository
+    class WidgetRepository:
+        async def load(self, fail: bool = False) -> str:
+            if fail:
+                raise RuntimeError("boom")
+            return "widget"
+
+        async def _private(self) -> None:
+            return None
+
+    repository = WidgetRepository()
+    assert asyncio.run(repository.load()) == "widget"
+    with pytest.raises(RuntimeError):
+        asyncio.run(repository.load(fail=True))
+
+    rendered = registry.render()
+    assert (
+        'mongo_operation_duration_seconds_count{repository="WidgetRepository",'
+        'method="load",outcome="ok"} 1'
+    ) in rendered
+    assert 'method="load",outcome="error"} 1' in rendered
+    assert 'method="_private"' not in rendered
+
+
+def test_loop_lag_monitor_records_a_blocked_loop():
+    lag = Histogram("lag_seconds", "Lag.", buckets=(0.05,))
+    monitor = EventLoopLagMonitor(0.01, histogram=lag)
+
+    async def block_the_loop() -> None:
+        monitor.start()
+        await asyncio.sleep(0.02)
+        threading.Event().wait(0.2)
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+    asyncio.run(block_the_loop())
+
+    samples = {name + str(labels): value for name, labels, value in lag.collect()}
+    assert samples["lag_seconds_bucket{'le': '+Inf'}"] > samples["lag_seconds_bucket{'le': '0.05'}"]
+
+
+def test_metrics_server_serves_its_worker_once_the_port_is_free():
+    metrics = MetricsRegistry()
+    metrics.counter("scrapes_total", "Scrapes.").inc()
+    held = socket.socket()
+    held.bind(("127.0.0.1", 0))
+    held.listen()
+    port = held.getsockname()[1]
+    server = MetricsServer(
+        lambda: metrics.render({"worker": "7"}),
+        lambda authorization: authorization == "Bearer secret",
+        host="127.0.0.1",
+        port=port,
+        retry_seconds=0.05,
+    )
+    server.start()
+    try:
+        # A predecessor still holds the port; the server keeps retrying.
+        time.sleep(0.2)
+        held.close()
+        url = f"http://127.0.0.1:{port}/metrics"
+        deadline = time.monotonic() + 5
+        while True:
+            try:
+                forbidden = httpx.get(url, timeout=1)
+                break
+            except httpx.TransportError:
+                assert time.monotonic() < deadline
+                time.sleep(0.05)
+        response = httpx.get(url, headers={"Authorization": "Bearer secret"}, timeout=1)
+    finally:
+        server.stop()
+
+    assert forbidden.status_code == 403
+    assert response.status_code == 200
+    assert 'scrapes_total{worker="7"} 1' in response.text
@@ -0,0 +1,145 @@
+import datetime
+import logging
+import time
+
+from pymongo import monitoring
+
+from backend.metrics import registry
+from backend.mongo_monitoring import (
+    CommandMonitor,
+    command_shape,
+    winning_plan_stages,
+)
+
+CONNECTION = ("mongo.test", 27017)
+
+
+def run_command(monitor, request_id, command, *, millis, failed=False):
+    name = next(iter(command))
+    monitor.started(
+        monitoring.CommandStartedEvent(command, "health", request_id, CONNECTION, request_id)
+    )
+    duration = datetime.timedelta(milliseconds=millis)
+    if failed:
+        monitor.failed(
+            monitoring.CommandFailedEvent(
+                duration, {"ok": 0}, name, request_id, CONNECTION, request_id
+            )
+        )
+    else:
+        monitor.succeeded(
+            monitoring.CommandSucceededEvent(
+                duration, {"ok": 1}, name, request_id, CONNECTION, request_id
+            )
+        )
+
+
+def history_page(user_id, created_at):
+    return {
+        "find": "symptom_analyses",
+        "filter": {
+            "user_id": user_id,
+            "$or": [{"created_at": {"$lt": created_at}}, {"created_at": created_at}],
+            "symptom": {"$in": ["cough", "fever"]},
+        },
+        "sort": {"created_at": -1, "_id": -1},
+        "lsid": {"id": "session"},
+        "$db": "health",
+    }
+
+
+def test_commands_differing_only_in_values_share_a_shape():
+    first = command_shape("find", history_page("alice", "2024-01-01"))
+    second = command_shape("find", history_page("bob", "2025-06-30"))
+
+    assert first == second
+    assert "alice" not in first
+    assert first == (
+        '{"filter":{"user_id":"?","$or":[{"created_at":{"$lt":"?"}},{"created_at":"?"}],'
+        '"symptom":{"$in":["?"]}},"sort":{"created_at":-1,"_id":-1}}'
+    )
+    assert command_shape("update", {"update": "users", "updates": [{"q": {"user_id": "a"}}]}) == (
+        '{"q":{"user_id":"?"}}'
+    )
+
+
+def test_monitor_aggregates_by_shape_and_logs_slow_commands(caplog):
+    monitor = CommandMonitor(0.1)
+
+    with caplog.at_level(logging.WARNING, logger="backend.mongo_monitoring"):
+        run_command(monitor, 1, history_page("alice", "2024-01-01"), millis=20)
+        run_command(monitor, 2, history_page("bob", "2024-02-01"), millis=250)
+        run_command(monitor, 3, {"ping": 1}, millis=500)
+        run_command(monitor, 4, {"insert": "users", "documents": []}, millis=5, failed=True)
+
+    find, insert = monitor.report()
+    assert (find["command"], find["collection"]) == ("find", "symptom_analyses")
+    assert (find["count"], find["slow"], find["max_ms"]) == (2, 1, 250.0)
+    assert find["total_ms"] == 270.0
+    assert (insert["command"], insert["errors"]) == ("insert", 1)
+    assert monitor.commands == 3
+
+    [slow_log] = [record.getMessage() for record in caplog.records]
+    assert "Slow MongoDB find on symptom_analyses took 250.0 ms" in slow_log
+    assert "bob" not in slow_log
+    assert (
+        'mongo_command_duration_seconds_count{command="find",collection="symptom_analyses"}'
+        in registry.render()
+    )
+
+
+class FakeDatabase:
+    def __init__(self, reply):
+        self.reply = reply
+        self.commands = []
+
+    def command(self, command):
+        self.commands.append(command)
+        return self.reply
+
+
+class FakeClient:
+    def __init__(self, reply):
+        self.database = FakeDatabase(reply)
+
+    def __getitem__(self, name):
+        return self.database
+
+
+def test_explain_sampling_flags_collection_scans_once_per_shape():
+    reply = {
+        "queryPlanner": {
+            "winningPlan": {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}},
+            "rejectedPlans": [{"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}],
+        }
+    }
+    client = FakeClient(reply)
+    monitor = CommandMonitor(1.0, explain_sampling=True)
+    monitor.attach(client)
+
+    run_command(monitor, 1, history_page("alice", "2024-01-01"), millis=3)
+    run_command(monitor, 2, history_page("bob", "2024-02-01"), millis=3)
+
+    deadline = time.monotonic() + 2
+    while not monitor.shapes or not next(iter(monitor.shapes.values())).plan:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    monitor.detach()
+
+    [shape] = monitor.report()
+    assert shape["plan"] == ["SORT", "COLLSCAN"]
+    assert shape["collscan"] is True
+    [explained] = client.database.commands
+    assert explained["verbosity"] == "queryPlanner"
+    assert list(explained["explain"]) == ["find", "filter", "sort"]
+
+
+def test_winning_plan_stages_reads_pipeline_cursor_stages():
+    explain = {
+        "stages": [
+            {"$cursor": {"queryPlanner": {"winningPlan": {"stage": "IXSCAN"}}}},
+            {"$group": {}},
+        ]
+    }
+
+    assert winning_plan_stages(explain) == ["IXSCAN"]
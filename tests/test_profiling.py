@@ -0,0 +1,99 @@
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+from backend.executor import BlockingExecutor
+from backend.profiling import (
+    ProfileStore,
+    ProfilerBusyError,
+    ProfilingMiddleware,
+    StackSampler,
+    capture_stacks,
+)
+
+
+def slow_report_builder():
+    total = 0
+    for value in range(20000):
+        total += value * value
+    return total
+
+
+def make_app(executor):
+    async def app(scope, receive, send):
+        await executor.run(slow_report_builder)
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"text/plain")],
+            }
+        )
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    return app
+
+
+def request(app, headers):
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/api/analyze", headers=headers)
+
+    return asyncio.run(scenario())
+
+
+def test_header_profiles_the_request_including_blocking_calls():
+    executor = BlockingExecutor(max_workers=1, max_queue_size=1)
+    store = ProfileStore(max_profiles=1)
+    app = ProfilingMiddleware(make_app(executor), admin_token="secret", store=store)
+
+    plain = request(app, {})
+    wrong_token = request(app, {"X-Profile": "1", "X-Admin-Token": "guess"})
+    profiled = request(app, {"X-Profile": "1", "X-Admin-Token": "secret"})
+    executor.shutdown()
+
+    assert "x-profile-id" not in plain.headers
+    assert "x-profile-id" not in wrong_token.headers
+    report = store.get(profiled.headers["x-profile-id"])
+    assert "GET /api/analyze: event loop plus 1 blocking call(s)" in report
+    assert "slow_report_builder" in report
+
+
+def test_sampler_renders_collapsed_stacks_per_thread():
+    release = threading.Event()
+
+    def parked_worker():
+        release.wait()
+
+    worker = threading.Thread(target=parked_worker, name="blocking_3")
+    worker.start()
+    sampler = StackSampler()
+    sampler.sample()
+    sampler.sample()
+    release.set()
+    worker.join()
+
+    lines = sampler.collapsed().splitlines()
+    parked = [line for line in lines if line.startswith("blocking;")]
+    assert len(parked) == 1
+    stack, count = parked[0].rsplit(" ", 1)
+    assert count == "2"
+    assert "parked_worker (test_profiling.py:" in stack
+    assert sampler.samples == 2
+
+
+def test_only_one_capture_runs_at_a_time():
+    async def scenario():
+        first = asyncio.create_task(capture_stacks(0.2, 0.01))
+        await asyncio.sleep(0.05)
+        with pytest.raises(ProfilerBusyError):
+            await capture_stacks(0.1)
+        return await first
+
+    stacks = asyncio.run(scenario())
+
+    assert "MainThread;" in stacks
+    assert "run_forever" in stacks
@@ -0,0 +1,133 @@
+import asyncio
+
+from pymongo.errors import DuplicateKeyError
+
+from backend.rate_limiting import (
+    MemoryRateLimitStore,
+    MongoRateLimitStore,
+    RateLimitPolicy,
+    sliding_window_decision,
+)
+from tests.fakes import FakeDatabase
+
+POLICY = RateLimitPolicy("search", limit=3, window_seconds=60)
+
+
+class FakeClock:
+    def __init__(self, now=6000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_requests_beyond_the_limit_are_rejected_with_retry_after():
+    clock = FakeClock()
+    store = MemoryRateLimitStore(clock=clock)
+
+    decisions = [store.hit_now(POLICY, "user:a") for _ in range(4)]
+
+    assert [decision.allowed for decision in decisions] == [True, True, True, False]
+    assert [decision.remaining for decision in decisions[:3]] == [2, 1, 0]
+    # The full window still counts right after rollover, so a third must slide out too.
+    assert decisions[3].retry_after_seconds == 80
+    assert store.hit_now(POLICY, "user:b").allowed
+
+
+def test_previous_window_slides_out_gradually():
+    clock = FakeClock()
+    store = MemoryRateLimitStore(clock=clock)
+    for _ in range(3):
+        store.hit_now(POLICY, "ip:1.2.3.4")
+
+    clock.now += 60 + 10  # 10s into the next window, 5/6 of the old one still counts
+    blocked = store.hit_now(POLICY, "ip:1.2.3.4")
+    assert not blocked.allowed
+    assert blocked.retry_after_seconds == 10
+
+    clock.now += blocked.retry_after_seconds
+    assert store.hit_now(POLICY, "ip:1.2.3.4").allowed
+
+
+def test_retry_after_is_never_early():
+    policy = RateLimitPolicy("api", limit=5, window_seconds=10)
+    for previous in range(0, 12):
+        for current in range(0, 6):
+            for tenth in range(10):
+                decision = sliding_window_decision(policy, previous, current, tenth / 10)
+                if decision.allowed:
+                    continue
+                wait = decision.retry_after_seconds / policy.window_seconds
+                position = tenth / 10 + wait
+                if position < 1:
+                    estimate = previous * (1 - position) + current
+                else:
+                    estimate = current * (2 - position)
+                assert estimate + 1 <= policy.limit + 1e-9
+
+
+def test_stale_counters_are_pruned():
+    clock = FakeClock()
+    store = MemoryRateLimitStore(clock=clock, prune_every=3)
+    store.hit_now(POLICY, "ip:old")
+    clock.now += 180
+    store.hit_now(POLICY, "ip:new")
+    store.hit_now(POLICY, "ip:new")
+
+    assert len(store) == 1
+
+
+def test_mongo_store_shares_counts_and_rejects_in_one_round_trip():
+    clock = FakeClock()
+    db = FakeDatabase()
+    first_worker = MongoRateLimitStore(lambda: db.rate_limits, clock=clock)
+    second_worker = MongoRateLimitStore(lambda: db.rate_limits, clock=clock)
+
+    async def scenario():
+        allowed = []
+        for store in (first_worker, second_worker, first_worker, second_worker):
+            calls_before = len(db.rate_limits.calls)
+            allowed.append((await store.hit(POLICY, "user:a")).allowed)
+        return allowed, db.rate_limits.calls[calls_before:]
+
+    allowed, rejected_calls = asyncio.run(scenario())
+    assert allowed == [True, True, True, False]
+    assert rejected_calls == ["find_one_and_update"]
+    assert [document["count"] for document in db.rate_limits.documents] == [3]
+
+
+def test_mongo_store_retries_a_first_hit_that_lost_the_upsert_race():
+    clock = FakeClock()
+    db = FakeDatabase()
+    store = MongoRateLimitStore(lambda: db.rate_limits, clock=clock)
+    real_update = db.rate_limits.find_one_and_update
+    raced = []
+
+    async def racing_update(query, update, **kwargs):
+        if not raced:
+            # Another worker inserts the window document between our match and upsert.
+            raced.append(True)
+            await real_update(query, update, **kwargs)
+            raise DuplicateKeyError("E11000 duplicate key on _id")
+        return await real_update(query, update, **kwargs)
+
+    db.rate_limits.find_one_and_update = racing_update
+
+    decision = asyncio.run(store.hit(POLICY, "user:a"))
+
+    assert decision.allowed and decision.remaining == 1
+    assert [document["count"] for document in db.rate_limits.documents] == [2]
+    assert len(store.fallback) == 0
+
+
+def test_mongo_store_falls_back_to_local_counters_when_unavailable():
+    def unavailable():
+        raise RuntimeError("MongoDB is not connected")
+
+    store = MongoRateLimitStore(unavailable, clock=FakeClock())
+
+    async def scenario():
+        return [(await store.hit(POLICY, "user:a")).allowed for _ in range(4)]
+
+    assert asyncio.run(scenario()) == [True, True, True, False]
+
@@ -0,0 +1,975 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError, OperationFailure, PyMongoError
+
+from backend.caching import TTLCache
+from backend.repositories import (
+    PAYLOAD_LAYOUT_SPLIT,
+    STATS_LAYOUT,
+    AnalysisPersistenceError,
+    AnalysisPayloadStore,
+    AnalysisRepository,
+    AnalysisStatsRepository,
+    InvalidCursorError,
+    InvalidTimeframeError,
+    UserRepository,
+    resolve_timeframe,
+)
+from backend.services.analysis import build_analysis_response
+from tests.fakes import FakeClient, FakeDatabase
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def make_repositories(db=None):
+    db = db or FakeDatabase(users=("user_id", "google_sub", "email"))
+    users = UserRepository(db.users, initial_credits=5)
+    analyses = AnalysisRepository(
+        db.symptom_analyses,
+        payload_store=AnalysisPayloadStore(db.analysis_payloads),
+        stats=AnalysisStatsRepository(db.user_analysis_stats),
+    )
+    return db, users, analyses
+
+
+def record_analyses(users, analyses, items, user_id="user-123"):
+    for symptom, severity in items:
+        request_payload, response_payload = analysis_request(symptom, severity)
+        run(
+            analyses.create_analysis_with_credit_charge(
+                user_repository=users,
+                user_id=user_id,
+                request_payload=request_payload,
+                response_payload=response_payload,
+            )
+        )
+
+
+def seed_user(db, user_id="user-123", credits_remaining=5):
+    db.users.documents.append(
+        {
+            "user_id": user_id,
+            "google_sub": user_id,
+            "email": f"{user_id}@example.com",
+            "credits_total": 5,
+            "credits_remaining": credits_remaining,
+        }
+    )
+
+
+def analysis_request(symptom="headache", severity="moderate"):
+    request_payload = {
+        "symptom": symptom,
+        "duration": "1-3 days",
+        "severity": severity,
+        "additional_info": "",
+        "age": 34,
+        "gender": "female",
+        "medical_history": "",
+    }
+    response_payload = build_analysis_response(request_payload, f"Digest for {symptom}")
+    return request_payload, response_payload
+
+
+def test_split_layout_keeps_index_document_lean_and_deduplicates_sections():
+    db, users, analyses = make_repositories()
+    seed_user(db)
+
+    for _ in range(2):
+        request_payload, response_payload = analysis_request()
+        run(
+            analyses.create_analysis_with_credit_charge(
+                user_repository=users,
+                user_id="user-123",
+                request_payload=request_payload,
+                response_payload=response_payload,
+            )
+        )
+
+    stored = db.symptom_analyses.documents
+    assert len(stored) == 2
+    assert all(item["payload_layout"] == PAYLOAD_LAYOUT_SPLIT for item in stored)
+    assert all("response_payload" not in item for item in stored)
+    assert all("request_payload" not in item for item in stored)
+    assert stored[0]["payload_refs"] == stored[1]["payload_refs"]
+    assert len(db.analysis_payloads.documents) == len(stored[0]["payload_refs"])
+    assert all(
+        blob["stored_size"] < blob["raw_size"]
+        for blob in db.analysis_payloads.documents
+        if blob["raw_size"] > 200
+    )
+
+
+def test_single_analysis_is_hydrated_from_payload_store():
+    db, users, analyses = make_repositories()
+    seed_user(db)
+    request_payload, response_payload = analysis_request("fatigue", "mild")
+
+    created = run(
+        analyses.create_analysis_with_credit_charge(
+            user_repository=users,
+            user_id="user-123",
+            request_payload=request_payload,
+            response_payload=response_payload,
+        )
+    )
+
+    listed = run(analyses.list_user_analyses("user-123"))
+    assert listed[0]["summary"].startswith("Symptom reviewed: Fatigue")
+
+    loaded = run(analyses.get_user_analysis("user-123", str(created["_id"])))
+    assert loaded["response_payload"] == response_payload
+    assert loaded["request_payload"] == request_payload
+    assert run(analyses.get_user_analysis("someone-else", str(created["_id"]))) is None
+    assert run(analyses.get_user_analysis("user-123", "not-an-id")) is None
+
+
+def test_stats_are_maintained_on_write_and_serve_dashboards_without_scans():
+    db, users, analyses = make_repositories()
+    seed_user(db)
+    record_analyses(users, analyses, [("headache", "mild")])
+    assert db.user_analysis_stats.documents == []
+    run(analyses.build_dashboard("user-123"))
+
+    record_analyses(users, analyses, [("Headache", "severe"), ("fatigue", "moderate")])
+
+    stats = db.user_analysis_stats.documents[0]
+    assert stats["analysis_count"] == 3
+    assert stats["severity_sum"] == 2 + 8 + 5
+    assert stats["symptom_frequency"] == {"headache": 2, "fatigue": 1}
+    [day] = stats["daily"].values()
+    assert day == {
+        "count": 3,
+        "severity_sum": 15,
+        "symptoms": {"headache": 2, "fatigue": 1},
+    }
+    assert [entry["symptom"] for entry in stats["recent"]] == [
+        "fatigue",
+        "Headache",
+        "headache",
+    ]
+
+    db.symptom_analyses.calls.clear()
+    dashboard = run(analyses.build_dashboard("user-123"))
+    patterns = run(analyses.build_pattern_analysis("user-123"))
+
+    assert db.symptom_analyses.calls == []
+    assert dashboard["health_score"] == 65
+    assert dashboard["symptom_trends"][0]["symptom"] == "fatigue"
+    assert "headache appears 2 time(s)" in patterns["patterns"]["recurring_patterns"][0]
+
+
+def test_rebuild_regenerates_stats_matching_incremental_updates(monkeypatch):
+    # Analyses stored within the same millisecond share a timestamp.
+    stored_at = datetime(2026, 3, 17, 10, tzinfo=timezone.utc)
+    monkeypatch.setattr("backend.repositories.bson_utc_now", lambda: stored_at)
+    db, users, analyses = make_repositories()
+    seed_user(db)
+    record_analyses(users, analyses, [("cough", "mild")])
+    run(analyses.build_dashboard("user-123"))
+    record_analyses(users, analyses, [("cough", "moderate"), ("fever", "severe")])
+    incremental = {
+        key: value
+        for key, value in db.user_analysis_stats.documents[0].items()
+        if key != "updated_at"
+    }
+
+    db.user_analysis_stats.documents.clear()
+    dashboard = run(analyses.build_dashboard("user-123"))
+    rebuilt = {
+        key: value
+        for key, value in db.user_analysis_stats.documents[0].items()
+        if key != "updated_at"
+    }
+
+    assert rebuilt == incremental
+    assert len(dashboard["symptom_trends"]) == 3
+
+
+def test_recording_the_same_analysis_twice_counts_it_once():
+    db, users, analyses = make_repositories()
+    seed_user(db)
+    record_analyses(users, analyses, [("cough", "mild")])
+    run(analyses.build_dashboard("user-123"))
+    stored = db.symptom_analyses.documents[0]
+
+    run(analyses.stats.record(stored))
+    run(analyses.stats.record_many([stored]))
+
+    stats = db.user_analysis_stats.documents[0]
+    assert stats["analysis_count"] == 1
+    assert [entry["analysis_id"] for entry in stats["recent"]] == [str(stored["_id"])]
+
+
+def test_stats_in_an_older_layout_are_rebuilt_rather_than_incremented():
+    db, users, analyses = make_repositories()
+    seed_user(db)
+    db.user_analysis_stats.documents.append(
+        {"_id": "user-123", "analysis_count": 1, "recent": []}
+    )
+
+    record_analyses(users, analyses, [("cough", "mild")])
+    assert db.user_analysis_stats.documents[0]["analysis_count"] == 1
+    assert "severity_sum" not in db.user_analysis_stats.documents[0]
+
+    run(analyses.build_dashboard("user-123"))
+    stats = db.user_analysis_stats.documents[0]
+    assert stats["layout"] == STATS_LAYOUT
+    assert (stats["analysis_count"], stats["severity_sum"]) == (1, 2)
+
+
+def test_rebuild_totals_the_whole_history_and_keeps_a_bounded_window():
+    db, users, _ = make_repositories()
+    seed_user(db, credits_remaining=10)
+    analyses = AnalysisRepository(
+        db.symptom_analyses, stats=AnalysisStatsRepository(db.user_analysis_stats, window=3)
+    )
+    record_analyses(
+        users,
+        analyses,
+        [("n.v. pain" if index % 2 else f"symptom-{index}", "mild") for index in range(6)],
+    )
+    for index, document in enumerate(db.symptom_analyses.documents):
+        document["created_at"] = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(
+            hours=index * 8
+        )
+    db.symptom_analyses.documents[0]["created_at"] = "not a date"
+
+    stats = run(analyses.rebuild_stats("user-123"))
+
+    assert stats["analysis_count"] == 6
+    assert stats["severity_sum"] == 6 * 2
+    # Field names cannot contain ".", so symptoms are escaped.
+    assert stats["symptom_frequency"]["n%2Ev%2E pain"] == 3
+    # The analysis without a parseable timestamp only counts towards the totals.
+    assert {day: bucket["count"] for day, bucket in stats["daily"].items()} == {
+        "2024-01-01": 2,
+        "2024-01-02": 3,
+    }
+    assert [entry["symptom"] for entry in stats["recent"]] == [
+        "n.v. pain",
+        "symptom-4",
+        "n.v. pain",
+    ]
+
+    dashboard = run(analyses.build_dashboard("user-123"))
+    assert "Most frequently analyzed symptom: n.v. pain." in dashboard["risk_factors"]
+
+
+def test_rebuild_replays_analyses_recorded_while_it_ran():
+    db, users, analyses = make_repositories()
+    seed_user(db)
+    record_analyses(users, analyses, [("cough", "mild")])
+    run(analyses.build_dashboard("user-123"))
+    read_snapshot = db.symptom_analyses.aggregate
+    raced = []
+
+    class RacingCursor:
+        def __init__(self, cursor):
+            self.cursor = cursor
+
+        async def to_list(self, length=None):
+            documents = await self.cursor.to_list(length)
+            if not raced:
+                # Another request stores and records an analysis between the
+                # rebuild's read and its replace.
+                request_payload, response_payload = analysis_request("fever", "severe")
+                raced.append(
+                    await analyses.create_analysis_with_credit_charge(
+                        user_repository=users,
+                        user_id="user-123",
+                        request_payload=request_payload,
+                        response_payload=response_payload,
+                    )
+                )
+            return documents
+
+    db.symptom_analyses.aggregate = lambda pipeline: RacingCursor(read_snapshot(pipeline))
+    run(analyses.rebuild_stats("user-123"))
+
+    document = db.user_analysis_stats.documents[0]
+    assert [entry["symptom"] for entry in document["recent"]] == ["fever", "cough"]
+    assert document["recent"][0]["analysis_id"] == str(raced[0]["_id"])
+    assert document["analysis_count"] == 2
+    assert document["symptom_frequency"] == {"cough": 1, "fever": 1}
+
+
+class CannedAggregateCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    async def to_list(self, length=None):
+        return self.documents[:length]
+
+
+class AggregateOnlyCollection:
+    def __init__(self, facets):
+        self.facets = facets
+        self.pipelines = []
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        return CannedAggregateCursor([self.facets])
+
+
+def test_dashboard_and_patterns_use_server_side_pipeline_without_stats():
+    collection = AggregateOnlyCollection(
+        {
+            "trend_items": [
+                {
+                    "date": "2026-03-17T10:00:00+00:00",
+                    "symptom": "headache",
+                    "severity": 8,
+                    "severity_label": "severe",
+                    "summary": "Symptom reviewed: Headache",
+                }
+            ],
+            "dashboard_symptoms": [{"_id": "headache", "count": 1}],
+            "dashboard_severity": [{"_id": None, "count": 1, "severity_avg": 8.0}],
+            "pattern_symptoms": [{"_id": "headache", "count": 1}],
+            "pattern_severity": [{"_id": None, "count": 1, "severity_avg": 8.0}],
+            "recent_severities": [{"severity_score": 8}],
+        }
+    )
+    analyses = AnalysisRepository(collection)
+
+    dashboard = run(analyses.build_dashboard("user-123"))
+    patterns = run(analyses.build_pattern_analysis("user-123", timeframe="week"))
+
+    assert len(collection.pipelines) == 2
+    assert collection.pipelines[0][0] == {"$match": {"user_id": "user-123"}}
+    assert dashboard["health_score"] == 44
+    assert dashboard["risk_factors"][0].startswith("Your analyses show a high")
+    assert dashboard["symptom_trends"][0]["summary"] == "Symptom reviewed: Headache"
+    assert patterns["confidence"] == "Medium"
+    assert patterns["timeframe"] == "week"
+
+
+def test_python_summary_matches_dashboard_rendering_of_raw_documents():
+    analyses = AnalysisRepository(None)
+    entries = [
+        {"symptom": "cough", "severity_score": 2, "created_at": "3"},
+        {"symptom": "fever", "severity_score": 8, "created_at": "2"},
+        {"symptom": "Cough", "severity_score": 5, "created_at": "1"},
+        {"symptom": "fever", "severity_score": 5, "created_at": "0"},
+    ]
+
+    summary = analyses.summarize_entries(entries)
+
+    assert summary["dashboard"]["symptom_counts"] == [("cough", 2), ("fever", 2)]
+    assert summary["dashboard"]["severity_avg"] == 5.0
+    assert summary["trend_items"][0]["summary"] == "No summary available."
+
+
+def test_history_keyset_pages_are_stable_across_equal_timestamps():
+    db, _, analyses = make_repositories()
+    for index in range(7):
+        db.symptom_analyses.documents.append(
+            {
+                "user_id": "user-123",
+                "symptom": f"symptom-{index}",
+                # Pairs of analyses share a timestamp to exercise the _id tiebreak.
+                "created_at": f"2026-03-{10 + index // 2:02d}T10:00:00+00:00",
+            }
+        )
+    for document in db.symptom_analyses.documents:
+        document["_id"] = ObjectId()
+
+    seen = []
+    cursor = None
+    while True:
+        page, cursor = run(
+            analyses.list_user_analyses_page("user-123", limit=3, cursor=cursor)
+        )
+        seen.extend(item["symptom"] for item in page)
+        if cursor is None:
+            break
+
+    assert len(seen) == 7
+    assert len(set(seen)) == 7
+    assert seen[0] == "symptom-6"
+
+    with pytest.raises(InvalidCursorError):
+        run(analyses.list_user_analyses_page("user-123", limit=3, cursor="%%%"))
+
+
+def make_transactional_repositories():
+    db, users, _ = make_repositories()
+    client = FakeClient(db)
+    analyses = AnalysisRepository(
+        db.symptom_analyses,
+        payload_store=AnalysisPayloadStore(db.analysis_payloads),
+        stats=AnalysisStatsRepository(db.user_analysis_stats),
+        client=client,
+        use_transactions=True,
+    )
+    return db, client, users, analyses
+
+
+def test_transaction_mode_charges_and_inserts_without_read_back():
+    db, client, users, analyses = make_transactional_repositories()
+    seed_user(db, credits_remaining=2)
+    request_payload, response_payload = analysis_request()
+
+    created = run(
+        analyses.create_analysis_with_credit_charge(
+            user_repository=users,
+            user_id="user-123",
+            request_payload=request_payload,
+            response_payload=response_payload,
+        )
+    )
+
+    assert client.transactions == 1
+    assert created["credits_before"] == 2
+    assert created["credits_after"] == 1
+    assert db.users.documents[0]["credits_remaining"] == 1
+    assert db.symptom_analyses.calls == ["insert_one"]
+
+
+def test_transaction_abort_leaves_credit_untouched():
+    db, _, users, analyses = make_transactional_repositories()
+    seed_user(db, credits_remaining=2)
+    request_payload, response_payload = analysis_request()
+
+    async def failing_insert(document, session=None):
+        raise OperationFailure("insert failed", code=112)
+
+    analyses.collection.insert_one = failing_insert
+
+    with pytest.raises(AnalysisPersistenceError, match="No credit was charged"):
+        run(
+            analyses.create_analysis_with_credit_charge(
+                user_repository=users,
+                user_id="user-123",
+                request_payload=request_payload,
+                response_payload=response_payload,
+            )
+        )
+    assert db.users.documents[0]["credits_remaining"] == 2
+
+
+def test_unknown_commit_result_does_not_claim_nothing_was_charged():
+    db, client, users, analyses = make_transactional_repositories()
+    client.transaction_error = PyMongoError(
+        "commit timed out", error_labels=["UnknownTransactionCommitResult"]
+    )
+    seed_user(db, credits_remaining=2)
+    request_payload, response_payload = analysis_request()
+
+    with pytest.raises(AnalysisPersistenceError) as caught:
+        run(
+            analyses.create_analysis_with_credit_charge(
+                user_repository=users,
+                user_id="user-123",
+                request_payload=request_payload,
+                response_payload=response_payload,
+            )
+        )
+
+    assert "could not be confirmed" in str(caught.value)
+    assert "No credit was charged" not in str(caught.value)
+
+
+def test_stats_failure_does_not_abort_the_transaction():
+    db, client, users, analyses = make_transactional_repositories()
+    seed_user(db, credits_remaining=2)
+    request_payload, response_payload = analysis_request()
+    run(analyses.rebuild_stats("user-123"))
+
+    async def failing_record(document, session=None):
+        raise OperationFailure("stats update failed", code=112)
+
+    analyses.stats.record = failing_record
+
+    created = run(
+        analyses.create_analysis_with_credit_charge(
+            user_repository=users,
+            user_id="user-123",
+            request_payload=request_payload,
+            response_payload=response_payload,
+        )
+    )
+
+    assert client.transactions == 1
+    assert db.symptom_analyses.documents[0]["_id"] == created["_id"]
+    assert db.users.documents[0]["credits_remaining"] == 1
+    # The aggregates are dropped and regenerated from history on the next read.
+    assert db.user_analysis_stats.documents == []
+
+
+def test_standalone_server_falls_back_to_compensation_path():
+    db, client, users, analyses = make_transactional_repositories()
+    client.transaction_error = OperationFailure(
+        "Transaction numbers are only allowed on a replica set member or mongos",
+        code=20,
+    )
+    seed_user(db, credits_remaining=1)
+    request_payload, response_payload = analysis_request()
+
+    created = run(
+        analyses.create_analysis_with_credit_charge(
+            user_repository=users,
+            user_id="user-123",
+            request_payload=request_payload,
+            response_payload=response_payload,
+        )
+    )
+
+    assert analyses.use_transactions is False
+    assert created["credits_after"] == 0
+    assert len(db.symptom_analyses.documents) == 1
+
+
+def make_cached_user_repository():
+    db = FakeDatabase(users=("user_id", "google_sub", "email"))
+    seed_user(db, credits_remaining=2)
+    users = UserRepository(db.users, initial_credits=5, cache=TTLCache(10, 60))
+    return db, users
+
+
+def test_cached_identity_lookup_skips_the_database():
+    db, users = make_cached_user_repository()
+    run(users.get_by_user_id("user-123"))
+    db.users.calls.clear()
+
+    cached = run(users.get_by_user_id("user-123", fresh=False))
+
+    assert cached["credits_remaining"] == 2
+    assert db.users.calls == []
+    cached["credits_remaining"] = 99
+    assert run(users.get_by_user_id("user-123", fresh=False))["credits_remaining"] == 2
+
+
+def test_credit_writes_refresh_the_user_cache():
+    db, users = make_cached_user_repository()
+    run(users.get_by_user_id("user-123"))
+
+    run(users.consume_credit("user-123"))
+    assert run(users.get_by_user_id("user-123", fresh=False))["credits_remaining"] == 1
+
+    run(users.restore_credit("user-123"))
+    assert run(users.get_by_user_id("user-123", fresh=False))["credits_remaining"] == 2
+
+
+def test_transactional_credit_charge_drops_the_cached_user():
+    db, users = make_cached_user_repository()
+    run(users.get_by_user_id("user-123"))
+
+    run(users.consume_credit("user-123", session=object()))
+
+    assert users.cache.get("user-123") is None
+
+
+def test_dashboard_and_patterns_are_memoized_per_data_version():
+    db, users, analyses = make_repositories()
+    analyses.view_cache = TTLCache(10, 60)
+    seed_user(db)
+    record_analyses(users, analyses, [("headache", "mild")])
+
+    def data_version():
+        return db.users.documents[0]["data_version"]
+
+    version = data_version()
+    first_dashboard = run(analyses.build_dashboard("user-123", data_version=version))
+    first_patterns = run(
+        analyses.build_pattern_analysis("user-123", "week", data_version=version)
+    )
+    db.user_analysis_stats.calls.clear()
+    db.symptom_analyses.calls.clear()
+
+    cached_dashboard = run(analyses.build_dashboard("user-123", data_version=version))
+    cached_dashboard["risk_factors"].append("mutated by the caller")
+    assert run(analyses.build_dashboard("user-123", data_version=version)) == first_dashboard
+    cached_patterns = run(
+        analyses.build_pattern_analysis("user-123", "week", data_version=version)
+    )
+    assert db.user_analysis_stats.calls == []
+    assert db.symptom_analyses.calls == []
+    assert cached_patterns["patterns"] == first_patterns["patterns"]
+    assert cached_patterns["timestamp"] >= first_patterns["timestamp"]
+
+    # Another worker stores an analysis: nothing is invalidated here, but the
+    # new version is a new key.
+    other_worker = AnalysisRepository(
+        db.symptom_analyses, stats=AnalysisStatsRepository(db.user_analysis_stats)
+    )
+    record_analyses(users, other_worker, [("headache", "severe")])
+    assert data_version() > version
+
+    assert run(analyses.build_dashboard("user-123", data_version=version)) == first_dashboard
+    assert (
+        run(analyses.build_dashboard("user-123", data_version=data_version()))
+        != first_dashboard
+    )
+    patterns = run(
+        analyses.build_pattern_analysis("user-123", "week", data_version=data_version())
+    )
+    assert "2 stored analysis record(s)" in patterns["patterns"]["personalized_insights"][0]
+
+    # Without a version nothing is memoized.
+    db.user_analysis_stats.calls.clear()
+    run(analyses.build_dashboard("user-123"))
+    assert db.user_analysis_stats.calls == ["find_one"]
+
+
+def test_new_analyses_store_native_dates_and_render_iso_strings():
+    db, users, analyses = make_repositories()
+    seed_user(db)
+    record_analyses(users, analyses, [("headache", "mild")])
+
+    stored = db.symptom_analyses.documents[0]["created_at"]
+    assert isinstance(stored, datetime)
+    assert stored.microsecond % 1000 == 0
+
+    recent = run(analyses.get_recent_symptoms("user-123"))
+    assert datetime.fromisoformat(recent[0]["timestamp"]) == stored
+
+
+def test_timestamp_migration_converts_strings_and_is_rerunnable():
+    db, _, analyses = make_repositories()
+    db.symptom_analyses.documents.extend(
+        [
+            {"_id": ObjectId(), "user_id": "a", "created_at": "2026-03-10T10:00:00.123456+00:00"},
+            {"_id": ObjectId(), "user_id": "b", "created_at": "not a date"},
+            {
+                "_id": ObjectId(),
+                "user_id": "c",
+                "created_at": datetime(2026, 3, 11, tzinfo=timezone.utc),
+            },
+        ]
+    )
+
+    first = run(analyses.migrate_timestamps(batch_size=1))
+    second = run(analyses.migrate_timestamps())
+
+    assert first == {"migrated": 1, "unparseable": 1, "user_ids": ["a"]}
+    assert second["migrated"] == 0
+    assert db.symptom_analyses.documents[0]["created_at"] == datetime(
+        2026, 3, 10, 10, 0, 0, 123000, tzinfo=timezone.utc
+    )
+
+
+def test_keyset_pages_continue_from_dates_into_unmigrated_strings():
+    db, _, analyses = make_repositories()
+    for day in range(1, 4):
+        db.symptom_analyses.documents.append(
+            {
+                "_id": ObjectId(),
+                "user_id": "user-123",
+                "symptom": f"date-{day}",
+                "created_at": datetime(2026, 3, day, tzinfo=timezone.utc),
+            }
+        )
+        db.symptom_analyses.documents.append(
+            {
+                "_id": ObjectId(),
+                "user_id": "user-123",
+                "symptom": f"legacy-{day}",
+                "created_at": f"2026-02-{day:02d}T10:00:00+00:00",
+            }
+        )
+
+    seen = []
+    cursor = None
+    while True:
+        page, cursor = run(
+            analyses.list_user_analyses_page("user-123", limit=2, cursor=cursor)
+        )
+        seen.extend(item["symptom"] for item in page)
+        if cursor is None:
+            break
+
+    assert seen == ["date-3", "date-2", "date-1", "legacy-3", "legacy-2", "legacy-1"]
+
+
+def test_resolve_timeframe_windows():
+    now = datetime(2026, 3, 31, tzinfo=timezone.utc)
+
+    assert resolve_timeframe("week", now=now) == (now - timedelta(days=7), now)
+    # Named windows start at UTC midnight, like the daily stats buckets.
+    afternoon = now + timedelta(hours=15)
+    assert resolve_timeframe("week", now=afternoon) == (now - timedelta(days=7), afternoon)
+    assert resolve_timeframe(
+        "custom", start="2026-03-01", end="2026-03-15T00:00:00Z", now=now
+    ) == (datetime(2026, 3, 1, tzinfo=timezone.utc), datetime(2026, 3, 15, tzinfo=timezone.utc))
+
+    for timeframe, bounds in [
+        ("fortnight", {}),
+        ("custom", {}),
+        ("custom", {"start": "2026-03-20", "end": "2026-03-10"}),
+    ]:
+        with pytest.raises(InvalidTimeframeError):
+            resolve_timeframe(timeframe, now=now, **bounds)
+
+
+def test_named_pattern_windows_are_summed_from_daily_buckets():
+    db, users, _ = make_repositories()
+    seed_user(db, credits_remaining=10)
+    analyses = AnalysisRepository(
+        db.symptom_analyses, stats=AnalysisStatsRepository(db.user_analysis_stats, window=2)
+    )
+    record_analyses(
+        users,
+        analyses,
+        [("cough", "mild"), ("fever", "severe"), ("cough", "moderate"), ("cough", "mild")],
+    )
+    now = datetime.now(timezone.utc)
+    for document, days_ago in zip(db.symptom_analyses.documents, [200, 20, 1, 0]):
+        document["created_at"] = now - timedelta(days=days_ago)
+    run(analyses.rebuild_stats("user-123"))
+    db.symptom_analyses.calls.clear()
+
+    week = run(analyses.build_pattern_analysis("user-123", timeframe="week"))
+    month = run(analyses.build_pattern_analysis("user-123", timeframe="month"))
+    year = run(analyses.build_pattern_analysis("user-123", timeframe="year"))
+
+    # The recent entries only reach back one day, yet no window scans history.
+    assert db.symptom_analyses.calls == []
+    assert week["patterns"]["personalized_insights"][0].startswith("You have 2 ")
+    assert month["patterns"]["personalized_insights"][0].startswith("You have 3 ")
+    assert year["patterns"]["personalized_insights"][0].startswith("You have 4 ")
+    assert year["patterns"]["recurring_patterns"][0].startswith("cough appears 3 time(s)")
+    assert year["patterns"]["improvement_trends"][1] == "Average recorded severity score: 4.2/10."
+
+
+def test_pattern_window_uses_range_scan_when_stats_do_not_cover_it():
+    db = FakeDatabase()
+    recent_entry = {
+        "symptom": "cough",
+        "severity_score": 2,
+        "created_at": datetime.now(timezone.utc),
+    }
+    db.user_analysis_stats.documents.append(
+        {
+            "_id": "user-123",
+            "layout": STATS_LAYOUT,
+            "analysis_count": 80,
+            "recent": [recent_entry],
+        }
+    )
+    collection = AggregateOnlyCollection(
+        {
+            "pattern_symptoms": [{"_id": "cough", "count": 70}],
+            "pattern_severity": [{"_id": None, "count": 70, "severity_avg": 2.0}],
+            "recent_severities": [{"severity_score": 2}],
+        }
+    )
+    analyses = AnalysisRepository(
+        collection, stats=AnalysisStatsRepository(db.user_analysis_stats)
+    )
+
+    # A custom window that does not start at midnight cannot use the daily buckets.
+    start = (datetime.now(timezone.utc) - timedelta(days=200)).replace(hour=12, minute=30)
+    patterns = run(
+        analyses.build_pattern_analysis("user-123", timeframe="custom", start=start)
+    )
+
+    match, converted, windowed = collection.pipelines[0][:3]
+    assert match["$match"]["user_id"] == "user-123"
+    # Legacy string timestamps are read too, converted and windowed like dates.
+    date_range, legacy = match["$match"]["$or"]
+    assert set(date_range["created_at"]) == {"$gte", "$lt"}
+    assert legacy == {"created_at": {"$type": "string"}}
+    assert converted["$addFields"]["created_at"]["$convert"]["to"] == "date"
+    assert windowed["$match"]["created_at"] == date_range["created_at"]
+    assert all("$limit" not in stage for stage in collection.pipelines[0][:4])
+    assert patterns["patterns"]["personalized_insights"][0].startswith("You have 70 ")
+
+
+def test_concurrent_reservations_never_exceed_the_balance():
+    db, users, _ = make_repositories()
+    seed_user(db, credits_remaining=2)
+
+    async def reserve_many():
+        return await asyncio.gather(
+            *[users.reserve_credit("user-123", ttl_seconds=60) for _ in range(5)],
+            return_exceptions=True,
+        )
+
+    results = run(reserve_many())
+
+    errors = [result for result in results if isinstance(result, ValueError)]
+    assert len(errors) == 3
+    assert {str(error) for error in errors} == {"No credits remaining"}
+    assert db.users.documents[0]["credits_remaining"] == 0
+    assert len(db.users.documents[0]["credit_leases"]) == 2
+
+
+def test_committed_lease_charges_once_and_release_is_then_a_no_op():
+    db, users, analyses = make_repositories()
+    seed_user(db, credits_remaining=2)
+    lease = run(users.reserve_credit("user-123", ttl_seconds=60))
+    request_payload, response_payload = analysis_request()
+
+    created = run(
+        analyses.create_analysis_with_credit_charge(
+            user_repository=users,
+            user_id="user-123",
+            request_payload=request_payload,
+            response_payload=response_payload,
+            lease_id=lease.lease_id,
+        )
+    )
+
+    assert (created["credits_before"], created["credits_after"]) == (2, 1)
+    assert run(users.release_credit_lease("user-123", lease.lease_id)) is False
+    assert db.users.documents[0]["credits_remaining"] == 1
+    assert db.users.documents[0]["credit_leases"] == []
+
+
+def test_aborted_transaction_keeps_the_lease_for_release():
+    db, _, users, analyses = make_transactional_repositories()
+    seed_user(db, credits_remaining=1)
+    lease = run(users.reserve_credit("user-123", ttl_seconds=60))
+    request_payload, response_payload = analysis_request()
+
+    async def failing_insert(document, session=None):
+        raise OperationFailure("insert failed", code=112)
+
+    analyses.collection.insert_one = failing_insert
+
+    with pytest.raises(AnalysisPersistenceError):
+        run(
+            analyses.create_analysis_with_credit_charge(
+                user_repository=users,
+                user_id="user-123",
+                request_payload=request_payload,
+                response_payload=response_payload,
+                lease_id=lease.lease_id,
+            )
+        )
+
+    assert run(users.release_credit_lease("user-123", lease.lease_id)) is True
+    assert db.users.documents[0]["credits_remaining"] == 1
+
+
+def test_expired_leases_are_reclaimed_when_credits_run_out():
+    db, users, _ = make_repositories()
+    seed_user(db, credits_remaining=1)
+    abandoned = run(users.reserve_credit("user-123", ttl_seconds=60))
+    db.users.documents[0]["credit_leases"][0]["expires_at"] = datetime.now(
+        timezone.utc
+    ) - timedelta(seconds=1)
+
+    lease = run(users.reserve_credit("user-123", ttl_seconds=60))
+
+    assert lease.lease_id != abandoned.lease_id
+    assert [item["lease_id"] for item in db.users.documents[0]["credit_leases"]] == [
+        lease.lease_id
+    ]
+    assert db.users.documents[0]["credits_remaining"] == 0
+
+
+def test_credit_changes_and_stored_analyses_bump_the_data_version():
+    db, users, analyses = make_repositories()
+    seed_user(db, credits_remaining=3)
+
+    def version():
+        return db.users.documents[0].get("data_version", 0)
+
+    lease = run(users.reserve_credit("user-123", ttl_seconds=60))
+    assert version() == 1
+    run(users.release_credit_lease("user-123", lease.lease_id))
+    assert version() == 2
+    run(users.restore_credit("user-123"))
+    assert version() == 3
+
+    record_analyses(users, analyses, [("headache", "moderate")])
+    # One bump for the charge and one once the analysis is stored.
+    assert version() == 5
+
+    run(users.bump_data_version("user-123", "missing-user"))
+    assert version() == 6
+
+
+def test_failed_rollback_asks_for_manual_review():
+    db, users, analyses = make_repositories()
+    seed_user(db)
+    request_payload, response_payload = analysis_request()
+
+    async def failing_insert(document, session=None):
+        raise OperationFailure("insert failed", code=112)
+
+    async def failing_restore(user_id, **kwargs):
+        return False
+
+    analyses.collection.insert_one = failing_insert
+    users.restore_credit = failing_restore
+
+    with pytest.raises(AnalysisPersistenceError, match="Manual account review"):
+        run(
+            analyses.create_analysis_with_credit_charge(
+                user_repository=users,
+                user_id="user-123",
+                request_payload=request_payload,
+                response_payload=response_payload,
+            )
+        )
+    assert db.users.documents[0]["credits_remaining"] == 4
+
+
+def login(users, google_sub="user-123", email=None, name="Test User"):
+    return run(
+        users.create_or_update_google_user(
+            google_sub=google_sub,
+            email=email or f"{google_sub}@example.com",
+            name=name,
+        )
+    )
+
+
+def test_google_login_is_a_single_upsert_that_keeps_credits():
+    db, users, _ = make_repositories()
+
+    created = login(users)
+    assert db.users.calls == ["find_one_and_update"]
+    assert created["credits_remaining"] == 5
+    run(users.consume_credit("user-123"))
+
+    db.users.calls.clear()
+    refreshed = login(users, name="Renamed User")
+
+    assert db.users.calls == ["find_one_and_update"]
+    assert refreshed["name"] == "Renamed User"
+    assert refreshed["credits_remaining"] == 4
+    assert refreshed["created_at"] == created["created_at"]
+    assert len(db.users.documents) == 1
+
+
+def test_concurrent_first_login_retries_after_duplicate_key():
+    db, users, _ = make_repositories()
+    upsert = db.users.find_one_and_update
+    raced = []
+
+    async def racing_upsert(query, update, **kwargs):
+        if not raced:
+            # Another worker inserts the same account between our lookup and write.
+            raced.append(True)
+            await upsert(query, update, **kwargs)
+            raise DuplicateKeyError("E11000 duplicate key on google_sub")
+        return await upsert(query, update, **kwargs)
+
+    db.users.find_one_and_update = racing_upsert
+
+    user = login(users)
+
+    assert user["credits_remaining"] == 5
+    assert len(db.users.documents) == 1
+
+
+def test_login_relinks_an_account_registered_under_another_subject():
+    db, users, _ = make_repositories()
+    seed_user(db, user_id="old-sub", credits_remaining=2)
+
+    user = login(users, google_sub="new-sub", email="old-sub@example.com")
+
+    assert len(db.users.documents) == 1
+    assert user["user_id"] == "new-sub"
+    assert user["credits_remaining"] == 2
+    assert db.users.documents[0]["google_sub"] == "new-sub"
@@ -0,0 +1,61 @@
+import asyncio
+import os
+import time
+
+from backend.metrics import registry
+from backend.stall_watchdog import OTHER_SITE, LoopStallWatchdog
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def blocking_lookup():
+    time.sleep(0.25)
+
+
+async def handler_with_blocking_call():
+    blocking_lookup()
+
+
+def test_blocking_call_is_charged_to_its_call_site():
+    watchdog = LoopStallWatchdog(0.05, check_interval_seconds=0.01, app_roots=(TESTS_DIR,))
+
+    async def scenario():
+        watchdog.start()
+        await asyncio.sleep(0.05)
+        await handler_with_blocking_call()
+        await asyncio.sleep(0.05)
+        await watchdog.stop()
+
+    asyncio.run(scenario())
+
+    [site] = watchdog.report()
+    assert site["site"].endswith("in blocking_lookup")
+    assert "test_stall_watchdog.py" in site["site"]
+    assert site["count"] == 1
+    assert site["max_ms"] >= 150
+    assert any("handler_with_blocking_call" in frame for frame in site["stack"])
+    assert 'event_loop_stalls_total{site="test_stall_watchdog.py:' in registry.render()
+
+
+def test_a_responsive_loop_records_nothing():
+    watchdog = LoopStallWatchdog(0.1, check_interval_seconds=0.01)
+
+    async def scenario():
+        watchdog.start()
+        for _ in range(20):
+            await asyncio.sleep(0.005)
+        await watchdog.stop()
+
+    asyncio.run(scenario())
+
+    assert watchdog.stalls == 0
+    assert watchdog.report() == []
+
+
+def test_sites_beyond_the_limit_are_grouped():
+    watchdog = LoopStallWatchdog(0.05, max_sites=1)
+
+    watchdog._record("a.py:1 in first", ["a.py:1 in first"], 0.1)
+    watchdog._record("b.py:2 in second", ["b.py:2 in second"], 0.2)
+
+    assert [site["site"] for site in watchdog.report()] == [OTHER_SITE, "a.py:1 in first"]
@@ -0,0 +1,170 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from backend.executor import BlockingExecutor
+from backend.tracing import (
+    HttpSpanExporter,
+    InMemorySpanExporter,
+    Span,
+    Trace,
+    TracingMiddleware,
+    span,
+    traced,
+)
+
+
+@traced("rule_engine")
+def build_report():
+    with span("rule_engine.score"):
+        return "report"
+
+
+@traced("pubmed")
+async def fetch_research():
+    await asyncio.sleep(0.01)
+    return "research"
+
+
+def make_app(executor):
+    async def app(scope, receive, send):
+        research, report = await asyncio.gather(
+            asyncio.create_task(fetch_research()), executor.run(build_report)
+        )
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"text/plain")],
+            }
+        )
+        await send({"type": "http.response.body", "body": f"{research} {report}".encode()})
+
+    return app
+
+
+def request(app, headers=None):
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/api/analyze-symptom", headers=headers or {})
+
+    return asyncio.run(scenario())
+
+
+def test_spans_follow_the_request_into_tasks_and_pool_threads():
+    executor = BlockingExecutor(max_workers=1, max_queue_size=1)
+    exporter = InMemorySpanExporter()
+    app = TracingMiddleware(make_app(executor), exporter=exporter)
+
+    response = request(app)
+    executor.shutdown()
+
+    trace = exporter.traces[0]
+    spans = {item.name: item for item in trace.spans}
+    root = spans["http.request"]
+    assert root.parent_id is None
+    assert root.attributes == {"method": "GET", "path": "/api/analyze-symptom"}
+    assert spans["pubmed"].parent_id == root.span_id
+    assert spans["rule_engine"].parent_id == root.span_id
+    assert spans["rule_engine.score"].parent_id == spans["rule_engine"].span_id
+    assert {item.trace_id for item in trace.spans} == {trace.trace_id}
+    assert response.headers["x-trace-id"] == trace.trace_id
+
+    timing = response.headers["server-timing"].split(", ")
+    stages = [entry.split(";")[0] for entry in timing]
+    assert sorted(stages[:-1]) == ["pubmed", "rule_engine", "rule_engine.score"]
+    assert stages[-1] == "total"
+    assert all(";dur=" in entry for entry in timing)
+
+
+def test_incoming_traceparent_is_continued():
+    executor = BlockingExecutor(max_workers=1, max_queue_size=1)
+    exporter = InMemorySpanExporter()
+    app = TracingMiddleware(make_app(executor), exporter=exporter, server_timing=False)
+    traceparent = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+
+    response = request(app, {"traceparent": traceparent})
+    executor.shutdown()
+
+    root = next(item for item in exporter.traces[0].spans if item.name == "http.request")
+    assert root.trace_id == "4bf92f3577b34da6a3ce929d0e0e4736"
+    assert root.parent_id == "00f067aa0ba902b7"
+    assert "server-timing" not in response.headers
+
+
+def test_failed_spans_are_marked_as_errors():
+    exporter = InMemorySpanExporter()
+
+    async def failing_app(scope, receive, send):
+        with span("db.write"):
+            raise RuntimeError("boom")
+
+    app = TracingMiddleware(failing_app, exporter=exporter)
+    try:
+        request(app)
+    except RuntimeError:
+        pass
+
+    spans = {item.name: item for item in exporter.traces[0].spans}
+    assert spans["db.write"].status == "error"
+    assert spans["db.write"].attributes["error"] == "RuntimeError"
+    assert spans["http.request"].status == "error"
+
+
+def test_http_exporter_posts_batches_to_a_collector():
+    received = []
+    delivered = threading.Event()
+
+    class Collector(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            received.extend(json.loads(body))
+            self.send_response(204)
+            self.end_headers()
+            delivered.set()
+
+        def log_message(self, *args):
+            return None
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Collector)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    exporter = HttpSpanExporter(f"http://127.0.0.1:{server.server_address[1]}/traces")
+    try:
+        trace = Trace("a" * 32)
+        trace.add(
+            Span(
+                name="auth",
+                trace_id=trace.trace_id,
+                span_id="b" * 16,
+                parent_id=None,
+                start_time=0.0,
+                duration_ms=1.5,
+            )
+        )
+        exporter.export(trace)
+        assert delivered.wait(5)
+    finally:
+        exporter.shutdown()
+        server.shutdown()
+
+    assert received == [
+        {
+            "trace_id": "a" * 32,
+            "spans": [
+                {
+                    "name": "auth",
+                    "trace_id": "a" * 32,
+                    "span_id": "b" * 16,
+                    "parent_id": None,
+                    "start_time": 0.0,
+                    "duration_ms": 1.5,
+                    "status": "ok",
+                    "attributes": {},
+                }
+            ],
+        }
+    ]
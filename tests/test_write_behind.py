@@ -0,0 +1,211 @@
+import asyncio
+
+from backend.repositories import (
+    AnalysisPayloadStore,
+    AnalysisRepository,
+    AnalysisStatsRepository,
+    PendingAnalysis,
+)
+from backend.write_behind import WriteBehindQueue
+from tests.fakes import FakeDatabase
+from tests.test_repositories import analysis_request, make_repositories, seed_user
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_items_are_flushed_in_batches_by_size_and_time():
+    batches = []
+
+    async def flush(batch):
+        batches.append(list(batch))
+
+    async def scenario():
+        queue = WriteBehindQueue(flush, batch_size=3, flush_interval_seconds=0.05)
+        await queue.start()
+        for item in range(4):
+            await queue.submit(item)
+        await asyncio.sleep(0.15)
+        metrics = queue.metrics()
+        await queue.stop()
+        return metrics
+
+    metrics = run(scenario())
+
+    assert batches == [[0, 1, 2], [3]]
+    assert metrics["flushed_items"] == 4
+    assert metrics["flushed_batches"] == 2
+    assert metrics["queue_depth"] == 0
+
+
+def test_full_queue_applies_backpressure_then_writes_inline():
+    flushed = []
+    release = asyncio.Event()
+
+    async def flush(batch):
+        if 0 in batch:
+            await release.wait()
+        flushed.extend(batch)
+
+    async def scenario():
+        queue = WriteBehindQueue(
+            flush,
+            max_queue_size=1,
+            batch_size=1,
+            flush_interval_seconds=0,
+            enqueue_timeout_seconds=0.02,
+        )
+        await queue.start()
+        await queue.submit(0)  # picked up by the flusher, which then blocks
+        await asyncio.sleep(0.01)
+        await queue.submit(1)  # fills the queue
+        await queue.submit(2)  # times out waiting for space and is written inline
+        assert flushed == [2]
+        release.set()
+        await queue.stop()
+        return queue.metrics()
+
+    metrics = run(scenario())
+
+    assert sorted(flushed) == [0, 1, 2]
+    assert metrics["inline_writes"] == 1
+
+
+def test_stop_drains_queue_and_failed_batches_reach_failure_handler():
+    attempts = []
+    failures = []
+
+    async def flush(batch):
+        attempts.append(list(batch))
+        raise RuntimeError("database down")
+
+    async def on_failure(batch, exc):
+        failures.append((list(batch), str(exc)))
+
+    async def scenario():
+        queue = WriteBehindQueue(
+            flush,
+            on_failure=on_failure,
+            batch_size=10,
+            flush_interval_seconds=1,
+            max_attempts=2,
+            retry_backoff_seconds=0,
+        )
+        await queue.start()
+        await queue.submit("a")
+        await queue.submit("b")
+        await queue.stop()
+        return queue.metrics()
+
+    metrics = run(scenario())
+
+    assert attempts == [["a", "b"], ["a", "b"]]
+    assert failures == [(["a", "b"], "database down")]
+    assert metrics["failed_items"] == 2
+    assert metrics["running"] is False
+
+
+def test_batch_in_flight_when_the_drain_times_out_is_flushed_again():
+    flushed = []
+    calls = []
+
+    async def flush(batch):
+        calls.append(list(batch))
+        if len(calls) == 1:
+            await asyncio.sleep(10)  # a flush that hangs until it is cancelled
+        flushed.extend(batch)
+
+    async def scenario():
+        queue = WriteBehindQueue(flush, batch_size=2, flush_interval_seconds=1)
+        await queue.start()
+        await queue.submit("a")
+        await queue.submit("b")
+        await asyncio.sleep(0.01)
+        await queue.submit("c")
+        await queue.stop(timeout_seconds=0.05)
+
+    run(scenario())
+
+    assert calls[0] == ["a", "b"]
+    assert sorted(flushed) == ["a", "b", "c"]
+
+
+def test_write_behind_charges_synchronously_and_persists_batch_idempotently():
+    db, users, _ = make_repositories()
+    seed_user(db, credits_remaining=3)
+    queued = []
+
+    class CapturingQueue:
+        async def submit(self, item):
+            queued.append(item)
+
+    analyses = AnalysisRepository(
+        db.symptom_analyses,
+        payload_store=AnalysisPayloadStore(db.analysis_payloads),
+        stats=AnalysisStatsRepository(db.user_analysis_stats),
+        write_behind=CapturingQueue(),
+    )
+    run(analyses.rebuild_stats("user-123"))
+
+    created = []
+    for symptom in ("headache", "cough"):
+        request_payload, response_payload = analysis_request(symptom)
+        created.append(
+            run(
+                analyses.create_analysis_with_credit_charge(
+                    user_repository=users,
+                    user_id="user-123",
+                    request_payload=request_payload,
+                    response_payload=response_payload,
+                )
+            )
+        )
+
+    assert db.users.documents[0]["credits_remaining"] == 1
+    assert db.symptom_analyses.documents == []
+    assert all(isinstance(item, PendingAnalysis) for item in queued)
+
+    # An earlier attempt stored the first document and then failed; the retry
+    # must skip it instead of failing or duplicating it.
+    db.symptom_analyses.documents.append(dict(queued[0].document))
+    run(analyses.persist_pending(queued))
+
+    stored_ids = [item["_id"] for item in db.symptom_analyses.documents]
+    assert stored_ids == [item["_id"] for item in created]
+    assert db.symptom_analyses.documents[1]["payload_refs"]
+    assert db.user_analysis_stats.documents[0]["analysis_count"] == 2
+
+
+def test_compensation_refunds_dropped_analyses():
+    db = FakeDatabase()
+    _, users, analyses = make_repositories(db)
+    seed_user(db, credits_remaining=0)
+
+    run(
+        analyses.compensate_pending(
+            [PendingAnalysis({"_id": "a", "user_id": "user-123"})],
+            users,
+        )
+    )
+
+    assert db.users.documents[0]["credits_remaining"] == 1
+
+
+def test_compensation_skips_analyses_stored_before_the_batch_failed():
+    db = FakeDatabase()
+    _, users, analyses = make_repositories(db)
+    seed_user(db, credits_remaining=0)
+    db.symptom_analyses.documents.append({"_id": "stored", "user_id": "user-123"})
+
+    run(
+        analyses.compensate_pending(
+            [
+                PendingAnalysis({"_id": "stored", "user_id": "user-123"}),
+                PendingAnalysis({"_id": "missing", "user_id": "user-123"}),
+            ],
+            users,
+        )
+    )
+
+    assert db.users.documents[0]["credits_remaining"] == 1